@@ -24,7 +24,12 @@ urlpatterns = [
     # Книги
     path('books/', BookViews.BookListView.as_view(), name='book-list'),
     path('books/<int:pk>/', BookViews.BookDetailView.as_view(), name='book-detail'),
+    path('books/<int:pk>/also-viewed/', RecommenderViews.also_viewed_books, name='also-viewed-books'),
     path('books/popular/', BookViews.popular_books, name='popular-books'),
+    path('books/trending/', RecommenderViews.trending_books, name='trending-books'),
+    
+    # Пошук
+    path('search/suggest/', BookViews.search_suggestions, name='search-suggest'),
     
     # Жанри та автори
     path('genres/', BookViews.GenreListView.as_view(), name='genres'),
@@ -50,6 +55,7 @@ urlpatterns = [
     path('cart/items/<int:item_id>/remove/', CartViews.remove_from_cart, name='remove-from-cart'),
     path('cart/clear/', CartViews.clear_cart, name='clear-cart'),
     path('cart/summary/', CartViews.cart_summary, name='cart-summary'),
+    path('cart/suggestions/', CartViews.cart_suggestions, name='cart-suggestions'),
     
     # Замовлення
     path('orders/', OrderViews.UserOrdersView.as_view(), name='user-orders'),
@@ -59,6 +65,7 @@ urlpatterns = [
     
     # Система рекомендацій
     path('recommendations/', RecommenderViews.get_recommendations, name='get-recommendations'),
+    path('hybrid-recommendations/', RecommenderViews.get_hybrid_recommendations, name='hybrid-recommendations'),
     path('track-view/', RecommenderViews.track_book_view, name='track-book-view'),
     
     # User-based рекомендації 
@@ -66,4 +73,5 @@ urlpatterns = [
     path('user-recommendations/stats/', UserBasedViews.get_user_based_stats, name='user-based-stats'),
     path('user-recommendations/refresh/', UserBasedViews.refresh_user_based_recommendations, name='refresh-user-based-recommendations'),
     path('user-recommendations/model-info/', UserBasedViews.get_user_based_model_info, name='user-based-model-info'),
+    path('item-recommendations/', UserBasedViews.get_item_based_recommendations, name='item-based-recommendations'),
 ]
\ No newline at end of file
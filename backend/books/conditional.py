@@ -0,0 +1,105 @@
+"""
+Умовні GET (ETag / Last-Modified) для каталогу і довідників.
+
+Сигнали моделей збільшують лічильник зміни таблиці (bump_table_version) у таблиці
+TableVersion. Лічильник оновлюється після коміту транзакції з даними окремим
+коротким UPDATE, тож рядок версії не блокується на весь час транзакції запису і не
+серіалізує паралельних записувачів; версія стає видимою всім процесам одразу після
+змін. ETag відповіді - хеш URL, версій
+таблиць, від яких вона залежить, і користувача для персональних відповідей. Версії
+читаються одним запитом за первинним ключем, тож запит з If-None-Match, що
+збігається, отримує 304 без запитів каталогу і серіалізації.
+
+Зміни без сигналів (QuerySet.update, сирий SQL) лічильники не бачать.
+"""
+import hashlib
+from functools import wraps
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from .models import TableVersion
+
+
+# Таблиці, від яких залежать відповіді каталогу (книга включає зв'язки з авторами і жанрами)
+CATALOG_TABLES = ('book', 'author', 'genre', 'rating')
+
+
+def _bump(tables):
+    now = timezone.now()
+    for table in tables:
+        if not TableVersion.objects.filter(table=table).update(version=F('version') + 1, modified=now):
+            TableVersion.objects.get_or_create(table=table, defaults={'modified': now})
+
+
+def bump_table_version(*tables):
+    """Нова версія таблиць після коміту поточної транзакції (поза нею - одразу)"""
+    transaction.on_commit(lambda: _bump(tables))
+
+
+def table_versions(*tables):
+    """{таблиця: (версія, час останньої зміни)}; таблиця, що ще не змінювалась, - (0, None)"""
+    versions = dict.fromkeys(tables, (0, None))
+    versions.update(
+        (table, (version, modified)) for table, version, modified in
+        TableVersion.objects.filter(table__in=tables).values_list('table', 'version', 'modified')
+    )
+    return versions
+
+
+def table_version(table):
+    return table_versions(table)[table][0]
+
+
+def conditional_get(request, tables, personal, get_response):
+    """
+    304, якщо ETag/Last-Modified клієнта актуальні, інакше відповідь get_response()
+    з валідаторами; personal - відповідь залежить від користувача
+    """
+    versions = table_versions(*tables)
+    parts = [request.get_full_path()] + [f'{table}:{versions[table][0]}' for table in tables]
+    if personal:
+        parts.append(f'user:{request.user.pk}')
+    etag = quote_etag(hashlib.md5('|'.join(parts).encode()).hexdigest())
+    modified = [modified for _, modified in versions.values()]
+    # Last-Modified лише коли відомі часи змін усіх таблиць
+    last_modified = int(max(modified).timestamp()) if None not in modified else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = get_response()
+        if response.status_code != 200:
+            return response
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Без no-cache браузер може евристично віддавати копію без перевірки
+    if personal:
+        patch_cache_control(response, no_cache=True, private=True)
+        patch_vary_headers(response, ['Authorization'])
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def conditional_on(*tables, personal=False):
+    """Декоратор функції-представлення (під @api_view)"""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            return conditional_get(request, tables, personal, lambda: view(request, *args, **kwargs))
+        return wrapped
+    return decorator
+
+
+class ConditionalGetMixin:
+    """Умовний GET для generic-представлень: version_tables - таблиці відповіді"""
+    version_tables = ()
+    personal_response = False
+
+    def get(self, request, *args, **kwargs):
+        return conditional_get(
+            request, self.version_tables, self.personal_response,
+            lambda: super(ConditionalGetMixin, self).get(request, *args, **kwargs)
+        )
@@ -0,0 +1,248 @@
+"""
+Колонкове сховище ознак книг у пам'яті процесу.
+
+Кожна ознака - NumPy масив, індексований id книги (ті самі id, що в бітових
+множинах і стрічках рекомендацій), тому фільтрація і бусти для масиву кандидатів -
+це векторні операції без запитів до БД:
+
+    exists        bool     - рядок відповідає існуючій книзі
+    available     bool     - книга доступна
+    price         float32  - ціна (NaN, якщо не вказана)
+    year          int32    - рік видання
+    rating_sum    float64  - сума оцінок
+    rating_count  int32    - кількість оцінок
+    genres        {genre_id: Bitset}
+
+Сигнали Book, Book.genres і Rating оновлюють окремі рядки. Зміни з інших процесів
+та queryset.update() виявляються звіркою відбитка (кількості та суми id/оцінок),
+порахованого з масивів, з відбитком БД раз на CONSISTENCY_CHECK_INTERVAL.
+"""
+import threading
+import time
+import numpy as np
+from django.db.models import Count, Sum
+from .models import Book
+from ratings.models import Rating
+
+
+# Як часто (секунди) звіряти сховище з БД
+CONSISTENCY_CHECK_INTERVAL = 60
+
+COLUMNS = {
+    'exists': (np.bool_, False),
+    'available': (np.bool_, False),
+    'price': (np.float32, np.nan),
+    'year': (np.int32, 0),
+    'rating_sum': (np.float64, 0.0),
+    'rating_count': (np.int32, 0),
+}
+
+
+class Bitset:
+    """Бітова множина id (по біту на id в uint8 масиві)"""
+
+    def __init__(self, ids=()):
+        self.bits = np.zeros(0, dtype=np.uint8)
+        self.add(ids)
+
+    def _grow(self, max_id):
+        size = (int(max_id) >> 3) + 1
+        if size > len(self.bits):
+            # Запас, щоб нові книги не копіювали масив щоразу
+            self.bits = np.concatenate([self.bits, np.zeros(max(size - len(self.bits), size // 4), dtype=np.uint8)])
+
+    def add(self, ids):
+        ids = np.asarray(ids, dtype=np.int64).ravel()
+        if len(ids):
+            self._grow(ids.max())
+            np.bitwise_or.at(self.bits, ids >> 3, (1 << (ids & 7)).astype(np.uint8))
+
+    def discard(self, ids):
+        ids = np.asarray(ids, dtype=np.int64).ravel()
+        ids = ids[(ids >> 3) < len(self.bits)]
+        if len(ids):
+            np.bitwise_and.at(self.bits, ids >> 3, (~(1 << (ids & 7))).astype(np.uint8))
+
+    def contains(self, ids):
+        """Булева маска належності для масиву id"""
+        ids = np.asarray(ids, dtype=np.int64)
+        inside = (ids >= 0) & ((ids >> 3) < len(self.bits))
+        result = np.zeros(ids.shape, dtype=bool)
+        safe = ids[inside]
+        result[inside] = (self.bits[safe >> 3] >> (safe & 7)) & 1 == 1
+        return result
+
+    def __len__(self):
+        return int(np.unpackbits(self.bits).sum())
+
+
+class BookFeatureStore:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._checked_at = 0.0
+        self.size = 0
+        self.columns = {name: np.empty(0, dtype=dtype) for name, (dtype, _) in COLUMNS.items()}
+        self.genres = {}
+
+    # --- Повна перебудова ---
+
+    @staticmethod
+    def db_fingerprint():
+        books = Book.objects.aggregate(count=Count('id'), ids=Sum('id'))
+        available = Book.objects.filter(is_available=True).aggregate(count=Count('id'))
+        ratings = Rating.objects.aggregate(count=Count('id'), scores=Sum('score'))
+        genres = Book.genres.through.objects.aggregate(count=Count('id'), ids=Sum('genre_id'))
+        return (
+            books['count'], books['ids'] or 0, available['count'],
+            ratings['count'], ratings['scores'] or 0, genres['count'], genres['ids'] or 0
+        )
+
+    def fingerprint(self):
+        """Той самий відбиток, порахований з масивів сховища"""
+        with self._lock:
+            exists = self.columns['exists'][:self.size]
+            genre_sizes = {genre_id: len(bitset) for genre_id, bitset in self.genres.items()}
+            return (
+                int(exists.sum()), int(np.flatnonzero(exists).sum()), int(self.columns['available'].sum()),
+                int(self.columns['rating_count'].sum()), int(self.columns['rating_sum'].sum()),
+                sum(genre_sizes.values()), sum(genre_id * size for genre_id, size in genre_sizes.items())
+            )
+
+    def rebuild(self):
+        """Повністю перечитує ознаки книг з БД"""
+        with self._lock:
+            rows = list(Book.objects.values_list('id', 'is_available', 'price', 'year'))
+            self.size = 0
+            self.columns = {name: np.empty(0, dtype=dtype) for name, (dtype, _) in COLUMNS.items()}
+            if rows:
+                ids = np.array([row[0] for row in rows], dtype=np.int64)
+                self._grow(ids.max())
+                self.columns['exists'][ids] = True
+                self.columns['available'][ids] = [row[1] for row in rows]
+                self.columns['price'][ids] = [np.nan if row[2] is None else float(row[2]) for row in rows]
+                self.columns['year'][ids] = [row[3] for row in rows]
+
+            for book_id, scores, count in Rating.objects.values('book_id').annotate(
+                scores=Sum('score'), count=Count('id')
+            ).values_list('book_id', 'scores', 'count'):
+                if book_id < self.size:
+                    self.columns['rating_sum'][book_id] = scores
+                    self.columns['rating_count'][book_id] = count
+
+            book_genres = {}
+            for book_id, genre_id in Book.genres.through.objects.values_list('book_id', 'genre_id'):
+                book_genres.setdefault(genre_id, []).append(book_id)
+            self.genres = {genre_id: Bitset(ids) for genre_id, ids in book_genres.items()}
+
+            self._loaded = True
+            self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+
+    def ensure_loaded(self):
+        with self._lock:
+            if not self._loaded:
+                self.rebuild()
+            elif time.monotonic() - self._checked_at > CONSISTENCY_CHECK_INTERVAL:
+                self._checked_at = time.monotonic()
+                if self.db_fingerprint() != self.fingerprint():
+                    print("Book feature store is out of sync with the database")
+                    self.rebuild()
+
+    def _grow(self, max_id):
+        size = int(max_id) + 1
+        if size <= self.size:
+            return
+        # Запас, щоб нові книги не копіювали масиви щоразу
+        capacity = max(size, self.size + self.size // 4)
+        for name, (dtype, default) in COLUMNS.items():
+            column = np.full(capacity, default, dtype=dtype)
+            column[:self.size] = self.columns[name][:self.size]
+            self.columns[name] = column
+        self.size = capacity
+
+    # --- Оновлення з сигналів ---
+
+    def update_book(self, book):
+        with self._lock:
+            if not self._loaded:
+                return
+            self._grow(book.id)
+            self.columns['exists'][book.id] = True
+            self.columns['available'][book.id] = book.is_available
+            self.columns['price'][book.id] = np.nan if book.price is None else float(book.price)
+            self.columns['year'][book.id] = book.year
+
+    def remove_book(self, book_id):
+        with self._lock:
+            if not self._loaded or book_id >= self.size:
+                return
+            for name, (_, default) in COLUMNS.items():
+                self.columns[name][book_id] = default
+            for bitset in self.genres.values():
+                bitset.discard([book_id])
+
+    def update_genres(self, book_id):
+        with self._lock:
+            if not self._loaded:
+                return
+            genre_ids = set(Book.genres.through.objects.filter(book_id=book_id).values_list('genre_id', flat=True))
+            for genre_id, bitset in self.genres.items():
+                if genre_id not in genre_ids:
+                    bitset.discard([book_id])
+            for genre_id in genre_ids:
+                self.genres.setdefault(genre_id, Bitset()).add([book_id])
+
+    def refresh_ratings(self, book_id):
+        with self._lock:
+            if not self._loaded:
+                return
+            stats = Rating.objects.filter(book_id=book_id).aggregate(scores=Sum('score'), count=Count('id'))
+            self._grow(book_id)
+            self.columns['rating_sum'][book_id] = stats['scores'] or 0
+            self.columns['rating_count'][book_id] = stats['count']
+
+    # --- Читання ---
+
+    def get(self, name, book_ids):
+        """Значення колонки для масиву id (значення за замовчуванням для невідомих книг)"""
+        self.ensure_loaded()
+        dtype, default = COLUMNS[name]
+        book_ids = np.asarray(book_ids, dtype=np.int64)
+        with self._lock:
+            inside = (book_ids >= 0) & (book_ids < self.size)
+            result = np.full(book_ids.shape, default, dtype=dtype)
+            result[inside] = self.columns[name][book_ids[inside]]
+        return result
+
+    def available(self, book_ids):
+        return self.get('available', book_ids)
+
+    def average_rating(self, book_ids):
+        """Середня оцінка (NaN для книг без оцінок)"""
+        self.ensure_loaded()
+        with self._lock:
+            counts = self.get('rating_count', book_ids)
+            sums = self.get('rating_sum', book_ids)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+    def has_any_genre(self, book_ids, genre_ids):
+        self.ensure_loaded()
+        book_ids = np.asarray(book_ids, dtype=np.int64)
+        with self._lock:
+            result = np.zeros(book_ids.shape, dtype=bool)
+            for genre_id in genre_ids:
+                if genre_id in self.genres:
+                    result |= self.genres[genre_id].contains(book_ids)
+        return result
+
+
+_store = BookFeatureStore()
+
+
+def get_feature_store():
+    return _store
@@ -0,0 +1,94 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from books.models import Book, Author, Genre
+from books.search import is_supported, search_books, update_search_vectors
+
+
+SYLLABLES = ['ко', 'ба', 'ри', 'ло', 'ве', 'на', 'ти', 'ск', 'пра', 'мі', 'до', 'ле', 'зо', 'гу', 'ча', 'ро']
+
+
+class Command(BaseCommand):
+    help = 'Порівнює пошук каталогу icontains (SearchFilter) з повнотекстовим на синтетичних книгах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--page-size', type=int, default=8)
+        parser.add_argument('--keep', action='store_true', help='Не відкочувати згенеровані книги')
+
+    def generate(self, rng, n_books):
+        words = np.unique([''.join(rng.choice(SYLLABLES, 3)) for _ in range(5000)])
+        phrase = lambda size: ' '.join(rng.choice(words, size))
+
+        genres = Genre.objects.bulk_create([Genre(name=f'Жанр {i} {phrase(1)}') for i in range(30)])
+        authors = Author.objects.bulk_create(
+            [Author(name=f'{phrase(2)} {i}') for i in range(max(n_books // 10, 1))]
+        )
+        books = Book.objects.bulk_create(
+            [Book(title=phrase(3), year=2000, description=phrase(30), is_available=True) for _ in range(n_books)],
+            batch_size=5000
+        )
+        Book.author.through.objects.bulk_create(
+            [Book.author.through(book_id=book.id, author_id=authors[i].id)
+             for book, i in zip(books, rng.integers(0, len(authors), len(books)))],
+            batch_size=5000
+        )
+        Book.genres.through.objects.bulk_create(
+            [Book.genres.through(book_id=book.id, genre_id=genres[i].id)
+             for book, i in zip(books, rng.integers(0, len(genres), len(books)))],
+            batch_size=5000
+        )
+        return words
+
+    def measure(self, queryset_for, queries, page_size):
+        """Час (ms) першої сторінки і COUNT для кожного запиту, як у BookListView"""
+        timings = []
+        for text in queries:
+            start = time.perf_counter()
+            queryset = queryset_for(text)
+            list(queryset[:page_size])
+            queryset.count()
+            timings.append((time.perf_counter() - start) * 1000)
+        return np.percentile(timings, 50), np.percentile(timings, 95)
+
+    def icontains_queryset(self, text):
+        queryset = Book.objects.filter(is_available=True)
+        for term in text.split():
+            queryset = queryset.filter(
+                Q(title__icontains=term) | Q(author__name__icontains=term) | Q(genres__name__icontains=term)
+            )
+        return queryset.distinct()
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(42)
+        with transaction.atomic():
+            self.stdout.write(f"🔧 Генерація {options['books']} книг...")
+            words = self.generate(rng, options['books'])
+            if is_supported():
+                start = time.perf_counter()
+                update_search_vectors()
+                self.stdout.write(f"🔧 search_vector для всіх книг: {time.perf_counter() - start:.1f} s")
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE books_book')
+
+            # Половина запитів - одне слово, половина - два
+            queries = [
+                ' '.join(rng.choice(words, 1 + i % 2)) for i in range(options['queries'])
+            ]
+            p50, p95 = self.measure(self.icontains_queryset, queries, options['page_size'])
+            self.stdout.write(f"📊 icontains: p50 {p50:.2f} ms, p95 {p95:.2f} ms")
+
+            if is_supported():
+                p50, p95 = self.measure(
+                    lambda text: search_books(Book.objects.filter(is_available=True), text).order_by('-search_rank', 'id'),
+                    queries, options['page_size']
+                )
+                self.stdout.write(f"📊 full-text: p50 {p50:.2f} ms, p95 {p95:.2f} ms")
+            else:
+                self.stdout.write("⚠️ Повнотекстовий пошук доступний лише на PostgreSQL")
+
+            if not options['keep']:
+                transaction.set_rollback(True)
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:50
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+SEARCH_INDEX = django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='book_search_vector_gin')
+
+
+def create_search_index(apps, schema_editor):
+    # GIN індекс і tsvector є лише в PostgreSQL; на SQLite колонка лишається порожньою
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Book = apps.get_model('books', 'Book')
+    schema_editor.add_index(Book, SEARCH_INDEX)
+
+    from books.search import search_vector_expression
+    Book.objects.update(search_vector=search_vector_expression(Book))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('books', 'Book'), SEARCH_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0002_alter_book_author_delete_rating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name='book', index=SEARCH_INDEX),
+            ],
+            database_operations=[
+                migrations.RunPython(create_search_index, drop_search_index),
+            ],
+        ),
+    ]
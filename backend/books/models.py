@@ -1,8 +1,11 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from django.db.models import Avg
+from django.db.models import F, Max, Q, Exists, OuterRef, Prefetch
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 
 # Зберігає жанри книг
@@ -17,6 +20,27 @@ class Author(models.Model):
     def __str__(self):
         return self.name
 
+class BookQuerySet(models.QuerySet):
+    def for_catalog(self, user=None):
+        """
+        Книги для серіалізації без N+1: середня оцінка (avg_rating) і кількість оцінок
+        (ratings_count) беруться join з ratings.BookRatingStats без агрегації по оцінках,
+        жанри та автори - prefetch.
+        З user додаються in_wishlist і user_score для детальної сторінки
+        """
+        queryset = self.annotate(
+            avg_rating=F('rating_stats__average'),
+            ratings_count=Coalesce(F('rating_stats__count'), 0),
+        ).defer('search_vector').prefetch_related('genres', 'author')
+
+        if user is not None and user.is_authenticated:
+            queryset = queryset.annotate(
+                in_wishlist=Exists(Wishlist.objects.filter(user=user, book=OuterRef('pk'))),
+                user_score=Max('ratings__score', filter=Q(ratings__user=user)),
+            )
+        return queryset
+
+
 # Основна модель книги з усією інформацією
 class Book(models.Model):
     title = models.CharField(max_length=255)
@@ -34,10 +58,22 @@ class Book(models.Model):
     publisher = models.CharField(max_length=100, blank=True, null=True)
     weight = models.DecimalField(max_digits=5, decimal_places=3, null=True)
     is_available = models.BooleanField(default=True)
+    # tsvector назви, авторів, жанрів і опису (books.search), лише для PostgreSQL
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = BookQuerySet.as_manager()
+
+    class Meta:
+        indexes = [GinIndex(fields=['search_vector'], name='book_search_vector_gin')]
 
     def __str__(self):
         return self.title
 
+
+def catalog_prefetch(lookup='book'):
+    """Prefetch вкладених книг (список бажань, кошик, замовлення) з анотаціями for_catalog"""
+    return Prefetch(lookup, queryset=Book.objects.for_catalog())
+
 # Зберігає список бажань користувача
 class Wishlist(models.Model):
     user = models.ForeignKey('core.User', on_delete=models.CASCADE, related_name='wishlist')
@@ -48,4 +84,13 @@ class Wishlist(models.Model):
         unique_together = ('user', 'book')
 
     def __str__(self):
-        return f'{self.user} wants {self.book}'
\ No newline at end of file
+        return f'{self.user} wants {self.book}'
+
+# Зберігає лічильник змін таблиці для ETag/Last-Modified (books.conditional)
+class TableVersion(models.Model):
+    table = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField(default=1)
+    modified = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'{self.table} v{self.version}'
@@ -0,0 +1,176 @@
+"""
+Пагінація каталогу книг.
+
+Звичайний режим - номери сторінок (?page=). З параметром cursor (порожній - перша
+сторінка) каталог гортається за ключем (keyset): курсор містить значення полів
+сортування останньої книги сторінки, і наступна сторінка - це WHERE "після цього
+ключа" замість OFFSET, тому глибокі сторінки коштують як перша. Ключ будується з
+order_by запиту (рік, рейтинг з NULL в кінці, релевантність пошуку), id завершує
+його, тож порядок стабільний. Дробові значення ключа мають бути double precision
+(search_rank приводиться в search.search_books): json зберігає такий float без
+втрат, і WHERE порівнює з тим самим значенням, що повернула БД.
+
+COUNT для обох режимів кешується за набором фільтрів і версіями таблиць каталогу
+(CATALOG_TABLES: книги, автори, жанри, оцінки - пошук і фільтри залежать від усіх),
+які сигнали збільшують при кожній зміні (conditional.bump_table_version).
+"""
+import base64
+import binascii
+import hashlib
+import json
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import F, OrderBy, Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+from .conditional import CATALOG_TABLES, table_version, table_versions
+
+
+COUNT_CACHE_TIMEOUT = 600
+# Параметри, що не змінюють набір книг
+NON_FILTER_PARAMS = {'page', 'page_size', 'cursor', 'rating_order'}
+
+
+def catalog_version():
+    """Версія таблиці книг: нова версія - нові ключі закешованих кількостей"""
+    return table_version('book')
+
+
+def catalog_tables_version():
+    """Версії всіх таблиць каталогу одним запитом, як у ETag (conditional_on)"""
+    versions = table_versions(*CATALOG_TABLES)
+    return '_'.join(str(versions[table][0]) for table in CATALOG_TABLES)
+
+
+def count_cache_key(request):
+    params = sorted(
+        (name, value) for name, values in request.query_params.lists()
+        if name not in NON_FILTER_PARAMS for value in values
+    )
+    digest = hashlib.md5(json.dumps(params).encode()).hexdigest()
+    return f'book_count_{catalog_tables_version()}_{digest}'
+
+
+def cached_count(queryset, cache_key):
+    count = cache.get(cache_key)
+    if count is None:
+        count = queryset.count()
+        cache.set(cache_key, count, timeout=COUNT_CACHE_TIMEOUT)
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    def __init__(self, *args, count_key, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_key = count_key
+
+    @cached_property
+    def count(self):
+        return cached_count(self.object_list, self.count_key)
+
+
+def ordering_key(queryset):
+    """[(поле, за спаданням, NULL в кінці)] з order_by запиту; id завжди останній"""
+    key = []
+    for field in queryset.query.order_by:
+        if isinstance(field, str):
+            key.append((field.lstrip('-'), field.startswith('-'), False))
+        elif isinstance(field, OrderBy) and isinstance(field.expression, F):
+            key.append((field.expression.name, field.descending, bool(field.nulls_last)))
+        else:
+            raise ValueError(f'Unsupported ordering for keyset pagination: {field}')
+    if not key or key[-1][0] not in ('id', 'pk'):
+        key.append(('id', False, False))
+    return key
+
+
+def after_filter(key, values):
+    """
+    Q для рядків після ключа values: (f1 > v1) OR (f1 = v1 AND f2 > v2) OR ...
+    з урахуванням напрямку і NULL в кінці
+    """
+    condition = Q(pk__in=[])
+    equal = Q()
+    for (name, descending, nulls_last), value in zip(key, values):
+        if value is None:
+            # Після NULL (в кінці) йдуть лише інші NULL - порівнюємо далі
+            equal &= Q(**{f'{name}__isnull': True})
+            continue
+        after = Q(**{f'{name}__lt' if descending else f'{name}__gt': value})
+        if nulls_last:
+            after |= Q(**{f'{name}__isnull': True})
+        condition |= equal & after
+        equal &= Q(**{name: value})
+    return condition
+
+
+class BookPagination(PageNumberPagination):
+    page_size = 8
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_key = count_cache_key(request)
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            self.django_paginator_class = lambda *args, **kwargs: CachedCountPaginator(
+                *args, count_key=self.count_key, **kwargs
+            )
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        key = ordering_key(queryset)
+        signature = ','.join(f"{'-' if descending else ''}{name}" for name, descending, _ in key)
+
+        self.count = cached_count(queryset, self.count_key)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            values = self.decode_cursor(cursor, signature)
+            queryset = queryset.filter(after_filter(key, values))
+
+        rows = list(queryset[:page_size + 1])
+        page = rows[:page_size]
+        self.next_cursor = None
+        if len(rows) > page_size:
+            self.next_cursor = self.encode_cursor(signature, [getattr(page[-1], name) for name, _, _ in key])
+        return page
+
+    def encode_cursor(self, signature, values):
+        raw = json.dumps({'k': signature, 'v': values}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor, signature):
+        """Курсор -> значення ключа; курсор іншого сортування недійсний"""
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+            values = data['v']
+            if data['k'] != signature or len(values) != signature.count(',') + 1 or not all(
+                value is None or type(value) in (int, float) for value in values
+            ):
+                raise ValueError(data)
+            return values
+        except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+            raise NotFound('Invalid cursor')
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if self.next_cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+            'results': data,
+        })
@@ -0,0 +1,82 @@
+"""
+Повнотекстовий пошук книг.
+
+На PostgreSQL Book.search_vector - tsvector з назви і авторів (вага A), жанрів (B)
+та опису (C) з GIN індексом. Запит розбирається websearch_to_tsquery, збіги
+знаходяться по індексу без join з авторами та жанрами і ранжуються ts_rank.
+ts_rank повертає real (float4); ранг приводиться до double precision, щоб значення
+в курсорі пагінації (Python float) точно збігалося з тим, з яким його порівнює БД.
+Колонку підтримують сигнали Book, Book.author, Book.genres, Author і Genre одним
+UPDATE з підзапитами. На інших БД (SQLite у тестах) пошук - звичайний SearchFilter
+(icontains по search_fields view).
+"""
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, FloatField, OuterRef, Subquery
+from django.db.models.functions import Cast
+from rest_framework import filters
+from .models import Book
+
+
+# Без стемінгу: каталог українською, а такої вбудованої конфігурації в PostgreSQL немає
+SEARCH_CONFIG = 'simple'
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def _joined_names(through, field):
+    """Підзапит: імена пов'язаних авторів/жанрів книги через пробіл"""
+    return Subquery(
+        through.objects.filter(book_id=OuterRef('pk')).order_by().values('book_id').annotate(
+            names=StringAgg(field, ' ')
+        ).values('names')
+    )
+
+
+def search_vector_expression(book_model=Book):
+    """Вираз tsvector книги; book_model - для історичної моделі в міграції"""
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(_joined_names(book_model.author.through, 'author__name'), weight='A', config=SEARCH_CONFIG)
+        + SearchVector(_joined_names(book_model.genres.through, 'genre__name'), weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(book_ids=None):
+    """Перераховує search_vector для книг (усіх, якщо book_ids=None); повертає кількість"""
+    if not is_supported():
+        return 0
+    queryset = Book.objects.all() if book_ids is None else Book.objects.filter(pk__in=book_ids)
+    # update() не надсилає post_save, тому сигнали не зациклюються
+    return queryset.update(search_vector=search_vector_expression())
+
+
+def search_books(queryset, text):
+    """Книги, що відповідають запиту, з анотацією search_rank (double precision)"""
+    query = SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+    return queryset.filter(search_vector=query).annotate(
+        search_rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+    )
+
+
+class BookSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter з повнотекстовим пошуком на PostgreSQL. Без явного сортування за
+    рейтингом результати йдуть за релевантністю, далі - за сортуванням view
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if not is_supported():
+            return super().filter_queryset(request, queryset, view)
+
+        text = request.query_params.get(self.search_param, '').strip()
+        if not text:
+            return queryset
+        queryset = search_books(queryset, text)
+        if not request.query_params.get('rating_order'):
+            queryset = queryset.order_by('-search_rank', *queryset.query.order_by)
+        return queryset
@@ -15,8 +15,27 @@ class AuthorSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class CatalogRatingMixin:
+    """
+    Рейтинг з анотацій Book.objects.for_catalog() (avg_rating, ratings_count);
+    для книг, завантажених без них, - окремі запити
+    """
+    
+    def get_average_rating(self, obj):
+        if hasattr(obj, 'avg_rating'):
+            avg = obj.avg_rating
+        else:
+            avg = obj.ratings.aggregate(Avg('score'))['score__avg']
+        return round(avg, 1) if avg else None
+    
+    def get_rating_count(self, obj):
+        if hasattr(obj, 'ratings_count'):
+            return obj.ratings_count
+        return obj.ratings.count()
+
+
 # Легкий серіалайзер для каталогу книг
-class BookCatalogSerializer(serializers.ModelSerializer):
+class BookCatalogSerializer(CatalogRatingMixin, serializers.ModelSerializer):
     genres = GenreSerializer(many=True, read_only=True)
     author = AuthorSerializer(many=True, read_only=True)
     average_rating = serializers.SerializerMethodField()
@@ -24,18 +43,11 @@ class BookCatalogSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Book
-        fields = '__all__'
-    
-    def get_average_rating(self, obj):
-        avg = obj.ratings.aggregate(Avg('score'))['score__avg']
-        return round(avg, 1) if avg else None
-    
-    def get_rating_count(self, obj):
-        return obj.ratings.count()
+        exclude = ['search_vector']
 
 
 # Детальний серіалайзер для індивідуальних сторінок книг
-class BookDetailSerializer(serializers.ModelSerializer):
+class BookDetailSerializer(CatalogRatingMixin, serializers.ModelSerializer):
     genres = GenreSerializer(many=True, read_only=True)
     author = AuthorSerializer(many=True, read_only=True)
     average_rating = serializers.SerializerMethodField()
@@ -45,24 +57,21 @@ class BookDetailSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Book
-        fields = '__all__'
-    
-    def get_average_rating(self, obj):
-        avg = obj.ratings.aggregate(Avg('score'))['score__avg']
-        return round(avg, 1) if avg else None
-    
-    def get_rating_count(self, obj):
-        return obj.ratings.count()
+        exclude = ['search_vector']
     
     def get_is_in_wishlist(self, obj):
         user = self.context['request'].user
         if user.is_authenticated:
+            if hasattr(obj, 'in_wishlist'):
+                return obj.in_wishlist
             return Wishlist.objects.filter(user=user, book=obj).exists()
         return False
     
     def get_user_rating(self, obj):
         user = self.context['request'].user
         if user.is_authenticated:
+            if hasattr(obj, 'user_score'):
+                return obj.user_score
             rating = obj.ratings.filter(user=user).first()
             return rating.score if rating else None
         return None
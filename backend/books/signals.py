@@ -0,0 +1,163 @@
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from ratings.models import Rating
+from .models import Book, Author, Genre, Wishlist
+from .features import get_feature_store
+from .search import is_supported, update_search_vectors
+from .suggest import get_suggest_index
+from .conditional import bump_table_version
+
+
+@receiver(post_save, sender=Book)
+def update_book_features(sender, instance, **kwargs):
+    """Оновлює рядок книги у сховищі ознак"""
+    get_feature_store().update_book(instance)
+
+
+@receiver(post_delete, sender=Book)
+def remove_book_features(sender, instance, **kwargs):
+    get_feature_store().remove_book(instance.id)
+
+
+@receiver(m2m_changed, sender=Book.genres.through)
+def update_book_genres(sender, instance, action, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Book):
+        get_feature_store().update_genres(instance.id)
+    elif pk_set:
+        # Зміна з боку жанру (genre.books.add(...))
+        for book_id in pk_set:
+            get_feature_store().update_genres(book_id)
+    else:
+        get_feature_store().invalidate()
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def update_rating_features(sender, instance, **kwargs):
+    get_feature_store().refresh_ratings(instance.book_id)
+
+
+@receiver(post_save, sender=Book)
+def update_book_search_vector(sender, instance, **kwargs):
+    if is_supported():
+        update_search_vectors([instance.id])
+
+
+def related_book_ids(instance):
+    """id книг автора або жанру"""
+    if isinstance(instance, Author):
+        return list(Book.objects.filter(author=instance).values_list('id', flat=True))
+    return list(Book.objects.filter(genres=instance).values_list('id', flat=True))
+
+
+@receiver(m2m_changed, sender=Book.author.through)
+@receiver(m2m_changed, sender=Book.genres.through)
+def update_search_on_relations(sender, instance, action, pk_set, **kwargs):
+    if not is_supported():
+        return
+    if action == 'pre_clear' and not isinstance(instance, Book):
+        # Після clear() з боку автора/жанру зв'язків уже немає
+        instance._search_book_ids = related_book_ids(instance)
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Book):
+        update_search_vectors([instance.id])
+    elif action == 'post_clear':
+        update_search_vectors(getattr(instance, '_search_book_ids', []))
+    elif pk_set:
+        update_search_vectors(pk_set)
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Genre)
+def update_search_on_rename(sender, instance, created, **kwargs):
+    if is_supported() and not created:
+        update_search_vectors(related_book_ids(instance))
+
+
+@receiver(pre_delete, sender=Author)
+@receiver(pre_delete, sender=Genre)
+def remember_search_books(sender, instance, **kwargs):
+    if is_supported():
+        instance._search_book_ids = related_book_ids(instance)
+
+
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Genre)
+def update_search_on_delete(sender, instance, **kwargs):
+    if is_supported():
+        update_search_vectors(getattr(instance, '_search_book_ids', []))
+
+
+@receiver(post_save, sender=Book)
+def update_book_suggestion(sender, instance, **kwargs):
+    get_suggest_index().update('book', instance.id, instance.title, visible=instance.is_available)
+
+
+@receiver(post_delete, sender=Book)
+def remove_book_suggestion(sender, instance, **kwargs):
+    get_suggest_index().remove('book', instance.id)
+
+
+@receiver(post_save, sender=Author)
+def update_author_suggestion(sender, instance, **kwargs):
+    get_suggest_index().update('author', instance.id, instance.name)
+
+
+@receiver(post_delete, sender=Author)
+def remove_author_suggestion(sender, instance, **kwargs):
+    get_suggest_index().remove('author', instance.id)
+
+
+@receiver(post_save, sender=Rating)
+def count_rating_suggestion(sender, instance, created, **kwargs):
+    """Популярність книги в підказках; популярність авторів оновлюється при перебудові"""
+    if created:
+        get_suggest_index().add_popularity('book', instance.book_id, 1)
+
+
+@receiver(post_delete, sender=Rating)
+def uncount_rating_suggestion(sender, instance, **kwargs):
+    get_suggest_index().add_popularity('book', instance.book_id, -1)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def bump_catalog_on_book_change(sender, **kwargs):
+    """Кількості книг за фільтрами (доступність, ціна) і ETag відповідей каталогу застаріли"""
+    bump_table_version('book')
+
+
+@receiver(m2m_changed, sender=Book.author.through)
+@receiver(m2m_changed, sender=Book.genres.through)
+def bump_catalog_on_relations(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_table_version('book')
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+def bump_authors(sender, **kwargs):
+    bump_table_version('author')
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def bump_genres(sender, **kwargs):
+    bump_table_version('genre')
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def bump_ratings(sender, **kwargs):
+    """Рейтинги книг у каталозі, оцінка користувача на сторінці книги"""
+    bump_table_version('rating')
+
+
+@receiver(post_save, sender=Wishlist)
+@receiver(post_delete, sender=Wishlist)
+def bump_wishlist(sender, **kwargs):
+    bump_table_version('wishlist')
@@ -0,0 +1,293 @@
+"""
+Індекс підказок пошуку (назви книг і імена авторів) у пам'яті процесу.
+
+Тексти розбиваються на нормалізовані слова. Слово запиту шукається:
+    - точно або як префікс - бінарним пошуком у відсортованому словнику слів;
+    - з опечатками - за триграмами: для слова беруться слова словника з подібністю
+      Жаккара триграм не менше FUZZY_THRESHOLD, а для недописаного останнього слова -
+      з часткою його триграм у слові словника не менше PREFIX_FUZZY_THRESHOLD
+      (триграми індексуються по словнику, а не по записах; перша літера має збігатися).
+Записи мають містити всі слова запиту (останнє - як префікс) і ранжуються за
+якістю збігу, збігом з початком тексту та популярністю (кількість оцінок книги).
+Кандидатів для префікса не більше MAX_CANDIDATES, тож час запиту обмежений
+незалежно від розміру каталогу.
+
+Індекс будується у фоновому потоці при старті процесу (warm_up з wsgi/asgi), тож
+перший запит підказок не чекає на побудову; без прогріву - при першому зверненні,
+один раз на процес (ensure_loaded тримає блокування, паралельні запити чекають на
+ту саму побудову). Сигнали Book, Author і Rating оновлюють окремі записи. Зміни з інших процесів підхоплюються фоновою перебудовою, коли
+індекс старший за MAX_AGE секунд; запит при цьому обслуговує старий індекс.
+"""
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from django.db import close_old_connections
+from django.db.models import Count, F
+from django.db.models.functions import Coalesce
+from .models import Book, Author
+
+
+SUGGEST_LIMIT = 10
+MAX_AGE = 600
+FUZZY_THRESHOLD = 0.4
+PREFIX_FUZZY_THRESHOLD = 0.6
+# Межі перебору для коротких префіксів (1-2 літери): слова словника і записи-кандидати
+MAX_PREFIX_TOKENS = 300
+MAX_CANDIDATES = 500
+# Бонуси ранжування: текст починається з введеного, log(1 + кількість оцінок)
+START_WEIGHT = 0.2
+POPULARITY_WEIGHT = 0.05
+
+_word_re = re.compile(r'\w+')
+
+
+def normalize(text):
+    return _word_re.findall((text or '').replace('ʼ', '').replace("'", '').casefold())
+
+
+def trigrams(token):
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SuggestIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._built_at = 0.0
+        self._refreshing = False
+        self._reset()
+
+    def _reset(self):
+        self.entries = {}  # ('book'|'author', id) -> (текст, слова, популярність, бонус популярності)
+        self.postings = defaultdict(set)  # слово -> ключі записів
+        self.vocabulary = []  # відсортовані слова
+        self.token_trigrams = defaultdict(set)  # триграма -> слова
+        self.trigram_sets = {}  # слово -> його триграми
+
+    # --- побудова ---
+
+    def _load(self):
+        """Записи з БД: доступні книги з кількістю оцінок і всі автори"""
+        books = Book.objects.filter(is_available=True).annotate(
+            popularity=Coalesce(F('rating_stats__count'), 0)
+        ).order_by().values_list('id', 'title', 'popularity')
+        authors = Author.objects.order_by().annotate(
+            popularity=Count('book__ratings')
+        ).values_list('id', 'name', 'popularity')
+        return [('book', *row) for row in books.iterator(chunk_size=5000)] + \
+            [('author', *row) for row in authors.iterator(chunk_size=5000)]
+
+    def rebuild(self):
+        rows = self._load()
+        with self._lock:
+            self._reset()
+            for kind, obj_id, text, popularity in rows:
+                self._add((kind, obj_id), text, popularity, keep_sorted=False)
+            self.vocabulary.sort()
+            self._loaded = True
+            self._built_at = time.monotonic()
+        print(f"Suggest index built: {len(self.entries)} entries, {len(self.vocabulary)} words")
+
+    def _refresh(self):
+        try:
+            self.rebuild()
+        except Exception as e:
+            print(f"Error rebuilding suggest index: {str(e)}")
+        finally:
+            self._refreshing = False
+
+    def warm_up(self, background=True):
+        """Будує індекс наперед (у фоновому потоці), щоб запити підказок його не чекали"""
+        if not background:
+            self.ensure_loaded()
+            return
+        threading.Thread(target=self._warm_up, name='suggest-warm-up', daemon=True).start()
+
+    def _warm_up(self):
+        close_old_connections()
+        try:
+            self.ensure_loaded()
+        except Exception as e:
+            print(f"Error warming up suggest index: {str(e)}")
+        finally:
+            close_old_connections()
+
+    def ensure_loaded(self):
+        # Блокування на всю побудову: паралельні запити не будують індекс вдруге
+        with self._lock:
+            if not self._loaded:
+                self.rebuild()
+            elif time.monotonic() - self._built_at > MAX_AGE and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh, daemon=True).start()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+
+    # --- точкові оновлення ---
+
+    def _add(self, key, text, popularity, keep_sorted=True):
+        tokens = tuple(dict.fromkeys(normalize(text)))
+        if not tokens:
+            return
+        self.entries[key] = (text, tokens, popularity, POPULARITY_WEIGHT * math.log1p(popularity))
+        for token in tokens:
+            if token not in self.postings:
+                if keep_sorted:
+                    bisect.insort(self.vocabulary, token)
+                else:
+                    self.vocabulary.append(token)
+                token_trigrams = frozenset(trigrams(token))
+                self.trigram_sets[token] = token_trigrams
+                for trigram in token_trigrams:
+                    self.token_trigrams[trigram].add(token)
+            self.postings[token].add(key)
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return None
+        for token in entry[1]:
+            # Слово лишається у словнику; порожні списки пропускаються при пошуку
+            self.postings[token].discard(key)
+        return entry
+
+    def update(self, kind, obj_id, text, visible=True):
+        """Додає/оновлює запис (популярність зберігається), visible=False прибирає його"""
+        with self._lock:
+            if not self._loaded:
+                return
+            entry = self._remove((kind, obj_id))
+            if visible:
+                self._add((kind, obj_id), text, entry[2] if entry else 0)
+
+    def remove(self, kind, obj_id):
+        with self._lock:
+            if self._loaded:
+                self._remove((kind, obj_id))
+
+    def add_popularity(self, kind, obj_id, delta):
+        with self._lock:
+            entry = self.entries.get((kind, obj_id))
+            if entry is not None:
+                popularity = max(entry[2] + delta, 0)
+                self.entries[(kind, obj_id)] = (entry[0], entry[1], popularity, POPULARITY_WEIGHT * math.log1p(popularity))
+
+    # --- пошук ---
+
+    def _prefix_tokens(self, prefix):
+        tokens = []
+        for i in range(bisect.bisect_left(self.vocabulary, prefix), len(self.vocabulary)):
+            token = self.vocabulary[i]
+            if not token.startswith(prefix) or len(tokens) >= MAX_PREFIX_TOKENS:
+                break
+            if self.postings[token]:
+                tokens.append(token)
+        return tokens
+
+    def _fuzzy_tokens(self, word, prefix, within=None):
+        """{слово словника: подібність} для слів, схожих на word за триграмами"""
+        query = trigrams(word)
+        # Недописане слово порівнюється і без кінцевої триграми (вона ще невідома)
+        end = f'  {word} '[-3:] if prefix and len(query) > 1 else None
+
+        if within is not None:
+            # Кандидати вже звужені попередніми словами - перевіряємо лише їхні слова
+            candidates = {token for key in within for token in self.entries[key][1]}
+        else:
+            # Схоже слово має спільних триграм не менше min_shared, тому містить хоча б
+            # одну з (len(query) - min_shared + 1) найрідкісніших триграм запиту
+            min_shared = math.ceil(FUZZY_THRESHOLD * len(query))
+            if end is not None:
+                min_shared = min(min_shared, math.ceil(PREFIX_FUZZY_THRESHOLD * (len(query) - 1)))
+            rare = sorted(query, key=lambda trigram: len(self.token_trigrams.get(trigram, ())))
+            candidates = set().union(*(
+                self.token_trigrams.get(trigram, ()) for trigram in rare[:len(query) - max(min_shared, 1) + 1]
+            ))
+            # Перша літера вважається правильною - це відсікає більшість кандидатів
+            candidates &= self.token_trigrams.get(f'  {word[0]}', set())
+
+        matches = {}
+        for token in candidates:
+            token_trigrams = self.trigram_sets[token]
+            shared = len(query & token_trigrams)
+            similarity = shared / (len(query) + len(token_trigrams) - shared)
+            if similarity < FUZZY_THRESHOLD:
+                similarity = 0.0
+            if end is not None:
+                prefix_similarity = (shared - (end in token_trigrams)) / (len(query) - 1)
+                if prefix_similarity >= PREFIX_FUZZY_THRESHOLD:
+                    similarity = max(similarity, prefix_similarity)
+            if similarity and self.postings[token]:
+                matches[token] = similarity
+        return matches
+
+    def _match_word(self, word, prefix, within=None):
+        """
+        {ключ запису: якість збігу 0..1} для одного слова запиту; within - записи,
+        що вже відповідають попереднім словам
+        """
+        def candidates(token):
+            return self.postings[token] if within is None else self.postings[token] & within
+
+        scores = {}
+        if prefix:
+            for token in self._prefix_tokens(word):
+                quality = 1.0 if token == word else 0.9
+                for key in candidates(token):
+                    if scores.get(key, 0) < quality:
+                        scores[key] = quality
+                if len(scores) >= MAX_CANDIDATES:
+                    break
+        elif word in self.postings:
+            scores = dict.fromkeys(candidates(word), 1.0)
+
+        # Опечатки шукаємо, лише коли точних/префіксних збігів мало
+        if len(word) >= 3 and len(scores) < SUGGEST_LIMIT:
+            for token, similarity in self._fuzzy_tokens(word, prefix, within).items():
+                for key in candidates(token):
+                    scores[key] = max(scores.get(key, 0), 0.8 * similarity)
+        return scores
+
+    def suggest(self, text, limit=SUGGEST_LIMIT):
+        """Найкращі записи для рядка, що вводиться: [{'type', 'id', 'text'}]"""
+        words = normalize(text)
+        if not words:
+            return []
+        self.ensure_loaded()
+        with self._lock:
+            # Дописані слова звужують кандидатів, останнє ще набирається - шукаємо як префікс
+            matches, within = [], None
+            for i, word in enumerate(words):
+                scores = self._match_word(word, prefix=i == len(words) - 1, within=within)
+                if not scores:
+                    return []
+                matches.append(scores)
+                within = scores.keys()
+
+            head, last, n = tuple(words[:-1]), words[-1], len(words) - 1
+
+            def rank(key):
+                entry_text, tokens, _, popularity_boost = self.entries[key]
+                quality = sum(scores[key] for scores in matches) / len(matches)
+                # Текст починається з введеного
+                starts = len(tokens) > n and tokens[:n] == head and tokens[n].startswith(last)
+                return -(quality + START_WEIGHT * starts + popularity_boost), len(entry_text), key
+
+            return [
+                {'type': key[0], 'id': key[1], 'text': self.entries[key][0]}
+                for *_, key in heapq.nsmallest(limit, map(rank, matches[-1]))
+            ]
+
+
+_index = SuggestIndex()
+
+
+def get_suggest_index():
+    return _index
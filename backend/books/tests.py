@@ -3,7 +3,20 @@ from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
 from .models import Book, Genre, Author, Wishlist
+from .features import get_feature_store
+from .suggest import get_suggest_index
+from .search import search_books
+from .conditional import table_version
+from .pagination import BookPagination, ordering_key
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+import numpy as np
+from ratings.models import Rating
 from django.urls import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from cart.models import Cart, CartItem
+from django.core.cache import cache
 
 User = get_user_model()
 
@@ -48,4 +61,277 @@ class BookTests(APITestCase):
         data = {'book_id': self.book.id}
         response = self.client.post(reverse('wishlist-toggle'), data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertFalse(Wishlist.objects.filter(user=self.user, book=self.book).exists())
\ No newline at end of file
+        self.assertFalse(Wishlist.objects.filter(user=self.user, book=self.book).exists())
+
+    # Пошук за автором і жанром; search_vector не потрапляє у відповідь
+    def test_book_search(self):
+        Book.objects.create(title='Other Book', year=2020, description='Other', is_available=True)
+        for query in ['Test Author', 'fiction']:
+            response = self.client.get(reverse('book-list'), {'search': query})
+            self.assertEqual([book['id'] for book in response.data['results']], [self.book.id])
+        self.assertNotIn('search_vector', response.data['results'][0])
+
+class BookFeatureStoreTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='features@example.com', password='testpass123', name='Features User')
+        self.genre = Genre.objects.create(name='Fantasy')
+        self.books = [
+            Book.objects.create(title=f'Book {i}', year=2000 + i, description='Description', price=10 + i)
+            for i in range(3)
+        ]
+        self.store = get_feature_store()
+        self.store.invalidate()
+
+    def tearDown(self):
+        self.store.invalidate()
+
+    # Сигнали оновлюють колонки без повної перебудови
+    def test_signals_update_columns(self):
+        ids = [book.id for book in self.books]
+        self.assertEqual(self.store.get('year', ids).tolist(), [2000, 2001, 2002])
+
+        self.books[0].is_available = False
+        self.books[0].save()
+        self.books[1].genres.add(self.genre)
+        Rating.objects.create(book=self.books[2], user=self.user, score=4)
+
+        self.assertEqual(self.store.available(ids).tolist(), [False, True, True])
+        self.assertEqual(self.store.has_any_genre(ids, [self.genre.id]).tolist(), [False, True, False])
+        self.assertEqual(self.store.average_rating(ids)[2], 4.0)
+        self.assertEqual(self.store.fingerprint(), self.store.db_fingerprint())
+
+    # Зміни без сигналів виявляються звіркою відбитка
+    def test_out_of_sync_detected(self):
+        self.store.ensure_loaded()
+        Book.objects.filter(id=self.books[0].id).update(is_available=False)
+        self.assertNotEqual(self.store.fingerprint(), self.store.db_fingerprint())
+
+
+class CatalogQueryCountTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='queries@example.com', password='testpass123', name='Queries User')
+        self.other = User.objects.create_user(email='other@example.com', password='testpass123', name='Other User')
+        self.genre = Genre.objects.create(name='Fiction')
+        self.author = Author.objects.create(name='Author')
+        self.books = []
+        for i in range(10):
+            book = Book.objects.create(title=f'Book {i}', year=2000 + i, description='Description', price=10)
+            book.genres.add(self.genre)
+            book.author.add(self.author)
+            Rating.objects.create(book=book, user=self.other, score=1 + i % 5)
+            self.books.append(book)
+        self.client.force_authenticate(user=self.user)
+
+    def count_queries(self, url):
+        # Без закешованих кількостей і цінового діапазону - порівнюємо холодні запити
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries), response
+
+    # Кількість запитів каталогу не залежить від розміру сторінки
+    def test_book_list_constant_queries(self):
+        small, _ = self.count_queries(reverse('book-list') + '?page_size=2')
+        large, response = self.count_queries(reverse('book-list') + '?page_size=10&rating_order=desc')
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(response.data['results'][0]['average_rating'], 5.0)
+        self.assertEqual(response.data['results'][0]['rating_count'], 1)
+
+        popular, _ = self.count_queries(reverse('popular-books'))
+        self.assertLessEqual(popular, small)
+
+    # Вкладені книги списку бажань і кошика серіалізуються сталою кількістю запитів
+    def test_nested_books_constant_queries(self):
+        cart = Cart.objects.create(user=self.user)
+        for book in self.books[:2]:
+            Wishlist.objects.create(user=self.user, book=book)
+            CartItem.objects.create(cart=cart, book=book)
+        wishlist_small, _ = self.count_queries(reverse('wishlist'))
+        cart_small, _ = self.count_queries(reverse('cart'))
+
+        for book in self.books[2:]:
+            Wishlist.objects.create(user=self.user, book=book)
+            CartItem.objects.create(cart=cart, book=book)
+        wishlist_large, response = self.count_queries(reverse('wishlist'))
+        cart_large, _ = self.count_queries(reverse('cart'))
+
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual((wishlist_small, cart_small), (wishlist_large, cart_large))
+
+
+class SearchSuggestTests(APITestCase):
+    def setUp(self):
+        get_suggest_index().invalidate()
+        self.author = Author.objects.create(name='Тарас Шевченко')
+        self.book = Book.objects.create(title='Кобзар', year=1840, description='Poems', is_available=True)
+        self.book.author.add(self.author)
+        Book.objects.create(title='Кобза прихована', year=2000, description='Hidden', is_available=False)
+
+    def suggest(self, query):
+        response = self.client.get(reverse('search-suggest'), {'q': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(item['type'], item['id']) for item in response.data['suggestions']]
+
+    # Префікс, автор і опечатка; недоступні книги не пропонуються
+    def test_suggest_prefix_and_typo(self):
+        self.assertEqual(self.suggest('кобз'), [('book', self.book.id)])
+        self.assertEqual(self.suggest('Шевч'), [('author', self.author.id)])
+        self.assertEqual(self.suggest('тарас шевчинко'), [('author', self.author.id)])
+        self.assertEqual(self.suggest('кабзар'), [('book', self.book.id)])
+        self.assertEqual(self.suggest(''), [])
+
+    # Прогрітий індекс відповідає на перший запит підказок без звернень до БД
+    def test_warm_up_builds_index_before_first_request(self):
+        get_suggest_index().warm_up(background=False)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest('кобз'), [('book', self.book.id)])
+
+    # Сигнали оновлюють завантажений індекс, підказки не звертаються до БД
+    def test_suggest_follows_signals_without_queries(self):
+        self.suggest('кобз')
+        other = Book.objects.create(title='Кобзар. Повне видання', year=2020, description='Full', is_available=True)
+        self.author.name = 'Шевченко Т. Г.'
+        self.author.save()
+        self.book.delete()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest('кобзар'), [('book', other.id)])
+            self.assertEqual(self.suggest('шевченко т'), [('author', self.author.id)])
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='keyset@example.com', password='testpass123', name='Keyset User')
+        self.books = [
+            Book.objects.create(title=f'Book {i}', year=2000 + i % 3, description='Description', is_available=True)
+            for i in range(9)
+        ]
+        # Частина книг без оцінок, з однаковими рейтингами й роками - перевірка стабільності ключа
+        for book, score in zip(self.books, [5, 3, 5, None, 1, None, 3, 4, None]):
+            if score:
+                Rating.objects.create(book=book, user=self.user, score=score)
+
+    def walk(self, params):
+        """id книг, пройдені курсором сторінками по 2"""
+        ids, cursor = [], ''
+        while cursor is not None:
+            response = self.client.get(reverse('book-list'), {**params, 'page_size': 2, 'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['count'], 9)
+            ids += [book['id'] for book in response.data['results']]
+            cursor = response.data['next_cursor']
+        return ids
+
+    # Курсор проходить каталог у тому ж порядку, що й номери сторінок, для всіх сортувань
+    def test_cursor_matches_page_order(self):
+        for params in [{}, {'rating_order': 'desc'}, {'rating_order': 'asc'}]:
+            response = self.client.get(reverse('book-list'), {**params, 'page_size': 100})
+            expected = [book['id'] for book in response.data['results']]
+            self.assertEqual(self.walk(params), expected)
+
+    # Курсор іншого сортування або пошкоджений - 404
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('book-list'), {'page_size': 2, 'cursor': ''})
+        cursor = response.data['next_cursor']
+        for params in [{'cursor': cursor, 'rating_order': 'desc'}, {'cursor': 'broken'}]:
+            response = self.client.get(reverse('book-list'), params)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    # Ранг пошуку - double precision, і курсор повертає його значення без втрат
+    def test_search_rank_cursor_is_exact(self):
+        queryset = search_books(Book.objects.all(), 'book').order_by('-search_rank', 'id')
+        rank = queryset.query.annotations['search_rank']
+        self.assertIsInstance(rank, Cast)
+        self.assertIsInstance(rank.output_field, FloatField)
+
+        key = ordering_key(queryset)
+        self.assertEqual(key, [('search_rank', True, False), ('id', False, False)])
+        pagination = BookPagination()
+        # Значення float4 ts_rank, прочитане як double precision
+        value = float(np.float32(0.0607927))
+        cursor = pagination.encode_cursor('-search_rank,id', [value, 7])
+        self.assertEqual(pagination.decode_cursor(cursor, '-search_rank,id'), [value, 7])
+
+    # Кількість кешується за фільтрами і скидається зміною каталогу
+    def test_count_cached_until_catalog_changes(self):
+        url = reverse('book-list') + '?page=2&page_size=2'
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.data['count'], 9)
+        self.assertFalse(any('COUNT' in query['sql'] for query in context.captured_queries))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(title='New Book', year=2020, description='New', is_available=True)
+        self.assertEqual(self.client.get(url).data['count'], 10)
+        self.assertEqual(self.client.get(reverse('book-list') + '?min_price=1').data['count'], 0)
+
+
+    # Перейменування автора скидає закешовану кількість результатів пошуку
+    def test_count_follows_author_changes(self):
+        author = Author.objects.create(name='Old Name')
+        self.books[0].author.add(author)
+        url = reverse('book-list') + '?search=Renamed'
+        self.assertEqual(self.client.get(url).data['count'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            author.name = 'Renamed'
+            author.save()
+        self.assertEqual(self.client.get(url).data['count'], 1)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='etag@example.com', password='testpass123', name='ETag User')
+        self.other = User.objects.create_user(email='etag2@example.com', password='testpass123', name='Other User')
+        self.genre = Genre.objects.create(name='Fiction')
+        self.book = Book.objects.create(title='ETag Book', year=2023, description='Test', is_available=True)
+        self.book.genres.add(self.genre)
+        Rating.objects.create(book=self.book, user=self.other, score=4)
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('no-cache', response['Cache-Control'])
+        return response['ETag']
+
+    # Актуальний ETag - 304 одним запитом версій таблиць; зміна таблиці робить його застарілим
+    def test_not_modified_without_queries(self):
+        for url in [reverse('genres'), reverse('authors'), reverse('book-list'), reverse('popular-books')]:
+            etag = self.etag(url)
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response['ETag'], etag)
+
+        genres_etag, list_etag = self.etag(reverse('genres')), self.etag(reverse('book-list'))
+        # Версія таблиці збільшується лише після коміту транзакції з даними
+        with self.captureOnCommitCallbacks(execute=True):
+            Genre.objects.create(name='Poetry')
+            self.assertEqual(table_version('genre'), 0)
+        self.assertEqual(self.client.get(reverse('genres'), HTTP_IF_NONE_MATCH=genres_etag).status_code, status.HTTP_200_OK)
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.create(book=self.book, user=self.user, score=5)
+        response = self.client.get(reverse('book-list'), HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['average_rating'], 4.5)
+
+    # Сторінка книги персональна: ETag залежить від користувача і його списку бажань
+    def test_detail_etag_is_personal(self):
+        url = reverse('book-detail', kwargs={'pk': self.book.id})
+        self.client.force_authenticate(user=self.user)
+        etag = self.etag(url)
+        self.client.force_authenticate(user=self.other)
+        self.assertNotEqual(self.etag(url), etag)
+
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('wishlist-toggle'), {'book_id': self.book.id})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['is_in_wishlist'])
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(self.client.get(reverse('book-detail', kwargs={'pk': 0})).status_code, status.HTTP_404_NOT_FOUND)
@@ -2,33 +2,34 @@ from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework import filters
-from rest_framework.pagination import PageNumberPagination
-from django.db.models import Avg, Min, Max, Case, When, F, Value
+from django.db.models import Min, Max, F
 from django.db.models.functions import Coalesce
-from .models import Book, Wishlist, Genre, Author
+from django.core.cache import cache
+from .models import Book, Wishlist, Genre, Author, catalog_prefetch
+from .pagination import BookPagination, catalog_version, COUNT_CACHE_TIMEOUT
+from .conditional import CATALOG_TABLES, ConditionalGetMixin, conditional_on
+from .search import BookSearchFilter
+from .suggest import get_suggest_index, SUGGEST_LIMIT
+from ratings.leaderboards import get_leaderboard
 from .serializers import BookCatalogSerializer, BookDetailSerializer, WishlistSerializer, GenreSerializer, AuthorSerializer
 
 
-class BookPagination(PageNumberPagination):
-    page_size = 8
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+POPULAR_SIZE = 7
 
 
 # Відображає список всіх доступних книг з фільтрацією та пошуком
-class BookListView(generics.ListAPIView):
+class BookListView(ConditionalGetMixin, generics.ListAPIView):
     """Головна сторінка - список всіх книг з основною інформацією"""
+    version_tables = CATALOG_TABLES
     queryset = Book.objects.filter(is_available=True)
     serializer_class = BookCatalogSerializer
-    filter_backends = [filters.SearchFilter]  # Видаляємо OrderingFilter
+    filter_backends = [BookSearchFilter]  # Видаляємо OrderingFilter
     search_fields = ['title', 'author__name', 'genres__name']
     pagination_class = BookPagination
     
     def get_queryset(self):
-        queryset = super().get_queryset().annotate(
-            average_rating=Avg('ratings__score')
-        ).distinct()  # Важливо для ManyToMany полів
+        # Рейтинг анотується, жанри та автори - prefetch (без запитів на кожну книгу)
+        queryset = super().get_queryset().for_catalog().distinct()  # Важливо для ManyToMany полів
         
         # Фільтр за жанрами
         genres = self.request.query_params.get('genres', None)
@@ -57,22 +58,16 @@ class BookListView(generics.ListAPIView):
         if rating_order == 'desc':
             # Книги з рейтингом спочатку (від вищого до нижчого), потім без рейтингу
             queryset = queryset.order_by(
-                Case(
-                    When(average_rating__isnull=True, then=Value(0)),  # NULL в кінець
-                    default=Value(1)  # Книги з рейтингом першими
-                ).desc(),
-                F('average_rating').desc(nulls_last=True),  # Сортування рейтингу
+                # Індексований BookRatingStats.average, NULL в кінець
+                F('avg_rating').desc(nulls_last=True),
                 '-year',  # Додатковий критерій
                 'id'  # Для стабільності сортування
             )
         elif rating_order == 'asc':
             # Книги з рейтингом спочатку (від нижчого до вищого), потім без рейтингу
             queryset = queryset.order_by(
-                Case(
-                    When(average_rating__isnull=True, then=Value(0)),  # NULL в кінець
-                    default=Value(1)  # Книги з рейтингом першими
-                ).desc(),
-                F('average_rating').asc(nulls_last=True),  # Сортування рейтингу
+                # Індексований BookRatingStats.average, NULL в кінець
+                F('avg_rating').asc(nulls_last=True),
                 '-year',  # Додатковий критерій
                 'id'  # Для стабільності сортування
             )
@@ -85,12 +80,16 @@ class BookListView(generics.ListAPIView):
     def list(self, request, *args, **kwargs):
         response = super().list(request, *args, **kwargs)
         
-        # Додаємо інформацію про ціновий діапазон до відповіді
-        all_books = Book.objects.filter(is_available=True, price__isnull=False)
-        price_range = all_books.aggregate(
-            min_price=Min('price'),
-            max_price=Max('price')
-        )
+        # Додаємо інформацію про ціновий діапазон до відповіді (кеш до зміни каталогу)
+        cache_key = f'book_price_range_{catalog_version()}'
+        price_range = cache.get(cache_key)
+        if price_range is None:
+            all_books = Book.objects.filter(is_available=True, price__isnull=False)
+            price_range = all_books.aggregate(
+                min_price=Min('price'),
+                max_price=Max('price')
+            )
+            cache.set(cache_key, price_range, timeout=COUNT_CACHE_TIMEOUT)
         
         response.data['price_range'] = price_range
         return response
@@ -98,33 +97,69 @@ class BookListView(generics.ListAPIView):
 
 # Отримує популярні книги на основі рейтингу
 @api_view(['GET'])
+@conditional_on(*CATALOG_TABLES, 'leaderboard')
 def popular_books(request):
-    """Отримати популярні книги на основі рейтингу"""
-    books = Book.objects.filter(is_available=True).annotate(
-        avg_rating=Avg('ratings__score')
-    ).filter(avg_rating__isnull=False).order_by('-avg_rating', 'id')[:7]
+    """Отримати популярні книги (загалом або в жанрі ?genre=) з байєсівського рейтингу"""
+    genre_id = request.query_params.get('genre')
+    if genre_id is not None and not genre_id.isdigit():
+        return Response({'error': 'Invalid genre'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    top = get_leaderboard(int(genre_id) if genre_id else None, limit=POPULAR_SIZE)
+    books = Book.objects.for_catalog().filter(id__in=[book_id for book_id, _ in top], is_available=True).in_bulk()
+    ordered = [(books[book_id], score) for book_id, score in top if book_id in books]
     
-    serializer = BookCatalogSerializer(books, many=True, context={'request': request})
-    return Response(serializer.data)
+    serializer = BookCatalogSerializer([book for book, _ in ordered], many=True, context={'request': request})
+    results = serializer.data
+    for book_data, (_, score) in zip(results, ordered):
+        book_data['bayesian_rating'] = round(score, 2)
+    return Response(results)
+
+
+# Підказки пошуку для рядка, що вводиться
+@api_view(['GET'])
+def search_suggestions(request):
+    """Назви книг і автори для автодоповнення, з індексу в пам'яті без запитів до БД"""
+    try:
+        try:
+            limit = min(max(int(request.query_params.get('limit', SUGGEST_LIMIT)), 1), SUGGEST_LIMIT)
+        except ValueError:
+            return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+
+        query = request.query_params.get('q', '')[:100]
+        return Response({'query': query, 'suggestions': get_suggest_index().suggest(query, limit)})
+
+    except Exception as e:
+        print(f"Error getting search suggestions: {str(e)}")
+        return Response(
+            {'error': f'Error getting search suggestions: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
 
 
 # Відображає детальну інформацію про книгу
-class BookDetailView(generics.RetrieveAPIView):
+class BookDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     """Сторінка детальної інформації про книгу"""
-    queryset = Book.objects.all()
+    # Список бажань і оцінка користувача - відповідь персональна
+    version_tables = CATALOG_TABLES + ('wishlist',)
+    personal_response = True
     serializer_class = BookDetailSerializer
+    
+    def get_queryset(self):
+        return Book.objects.for_catalog(user=self.request.user)
 
 
 # Отримує список всіх жанрів
-class GenreListView(generics.ListAPIView):
+class GenreListView(ConditionalGetMixin, generics.ListAPIView):
     """Список всіх жанрів"""
+    version_tables = ('genre',)
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
 
 
 # Отримує список всіх авторів
-class AuthorListView(generics.ListAPIView):
+class AuthorListView(ConditionalGetMixin, generics.ListAPIView):
     """Список всіх авторів"""
+    version_tables = ('author',)
     queryset = Author.objects.all()
     serializer_class = AuthorSerializer
 
@@ -136,7 +171,7 @@ class WishlistView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Wishlist.objects.filter(user=self.request.user)
+        return Wishlist.objects.filter(user=self.request.user).prefetch_related(catalog_prefetch())
 
 
 # Видаляє книгу зі списку бажань
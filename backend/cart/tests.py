@@ -5,6 +5,11 @@ from django.contrib.auth import get_user_model
 from books.models import Book
 from .models import Cart, CartItem
 from django.urls import reverse
+from django.core.management import call_command
+from orders.models import Order, OrderItem
+from books.features import get_feature_store
+from user_based.interactions import get_interaction_store
+import io
 
 User = get_user_model()
 
@@ -61,4 +66,51 @@ class CartTests(APITestCase):
         response = self.client.get(reverse('cart-summary'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['total_items'], 2)
-        self.assertEqual(float(response.data['total_price']), 20.00)
\ No newline at end of file
+        self.assertEqual(float(response.data['total_price']), 20.00)
+
+    # Підсумок рахується з prefetch позицій, без запиту на кожну книгу
+    def test_cart_summary_query_count(self):
+        cart = Cart.objects.create(user=self.user)
+        for i in range(3):
+            book = Book.objects.create(title=f'Book {i}', year=2023, description='Test', is_available=True, price=5.00)
+            CartItem.objects.create(cart=cart, book=book, quantity=1)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('cart-summary'))
+        self.assertEqual((response.data['total_items'], response.data['items_count']), (3, 3))
+        self.assertEqual(float(response.data['total_price']), 15.00)
+
+
+class CartSuggestionsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123', name='Test User')
+        self.buyer = User.objects.create_user(email='buyer@example.com', password='testpass123', name='Buyer')
+        self.books = [
+            Book.objects.create(title=f'Book {i}', year=2023, description='Description', is_available=True, price=10.00)
+            for i in range(4)
+        ]
+        baskets = [[0, 1], [0, 1], [0, 2], [3], [2, 3]]
+        for basket in baskets:
+            order = Order.objects.create(
+                user=self.buyer, contact_name='Buyer', contact_email='buyer@example.com',
+                total_amount=10.00, delivery_address='Address', payment_method='cash', is_completed=True
+            )
+            for index in basket:
+                OrderItem.objects.create(order=order, book=self.books[index], quantity=1, unit_price=10.00)
+        get_feature_store().invalidate()
+        get_interaction_store().invalidate()
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        get_interaction_store().invalidate()
+
+    # Доповнення до кошика з передобчислених пар "купують разом"
+    def test_cart_suggestions(self):
+        call_command('compute_copurchases', min_support=1, min_lift=0, stdout=io.StringIO())
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, book=self.books[0], quantity=1)
+
+        response = self.client.get(reverse('cart-suggestions'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # lift(0, 1) = 5 * 2 / (3 * 2), lift(0, 2) = 5 * 1 / (3 * 2)
+        self.assertEqual([b['id'] for b in response.data['suggestions']], [self.books[1].id, self.books[2].id])
+        self.assertAlmostEqual(response.data['suggestions'][0]['score'], 5 / 3, places=3)
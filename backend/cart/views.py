@@ -3,6 +3,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.db.models import Prefetch
 from .models import Cart, CartItem
 from .serializers import (
     CartSerializer, 
@@ -10,7 +11,17 @@ from .serializers import (
     CartItemCreateSerializer, 
     CartItemUpdateSerializer
 )
-from books.models import Book
+from books.models import Book, catalog_prefetch
+from books.serializers import BookCatalogSerializer
+from recommender.models import BookCoPurchase
+from recommender.bitsets import get_exclusion_index
+from recommender.feeds import fetch_available_books
+import numpy as np
+
+
+# Скільки доповнень до кошика пропонувати за замовчуванням і максимум
+CART_SUGGESTIONS_SIZE = 8
+CART_SUGGESTIONS_MAX_SIZE = 50
 
 
 # Отримує кошик користувача з усіма товарами
@@ -19,7 +30,10 @@ class CartView(generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_object(self):
-        cart, created = Cart.objects.get_or_create(user=self.request.user)
+        # Товари і їхні книги одним набором запитів (без N+1 на кожен товар)
+        cart, created = Cart.objects.prefetch_related(
+            Prefetch('items', queryset=CartItem.objects.prefetch_related(catalog_prefetch()))
+        ).get_or_create(user=self.request.user)
         return cart
 
 
@@ -92,15 +106,70 @@ def clear_cart(request):
 @permission_classes([IsAuthenticated])
 def cart_summary(request):
     try:
-        cart = Cart.objects.get(user=request.user)
+        # Усі підсумки рахуються з одного prefetch позицій разом з книгами
+        cart = Cart.objects.prefetch_related(
+            Prefetch('items', queryset=CartItem.objects.select_related('book'))
+        ).get(user=request.user)
         return Response({
             'total_items': cart.total_items,
             'total_price': cart.total_price,
-            'items_count': cart.items.count()
+            'items_count': len(cart.items.all())
         })
     except Cart.DoesNotExist:
         return Response({
             'total_items': 0,
             'total_price': 0,
             'items_count': 0
-        })
\ No newline at end of file
+        })
+
+
+# Пропонує книги, які часто купують разом з товарами в кошику
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def cart_suggestions(request):
+    """
+    Зливає передобчислені списки "купують разом" (compute_copurchases) для книг
+    у кошику: lift сусіда, запропонованого кількома книгами, сумується
+    """
+    try:
+        try:
+            limit = int(request.query_params.get('limit', CART_SUGGESTIONS_SIZE))
+        except ValueError:
+            return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, CART_SUGGESTIONS_MAX_SIZE))
+        
+        cart_book_ids = list(CartItem.objects.filter(cart__user=request.user).values_list('book_id', flat=True))
+        if not cart_book_ids:
+            return Response({'suggestions': [], 'based_on_books': []})
+        
+        pairs = BookCoPurchase.objects.filter(book_id__in=cart_book_ids).values_list('neighbor_id', 'lift')
+        neighbor_ids = np.array([neighbor_id for neighbor_id, _ in pairs], dtype=np.int64)
+        lifts = np.array([lift for _, lift in pairs], dtype=np.float64)
+        
+        book_ids, inverse = np.unique(neighbor_ids, return_inverse=True)
+        scores = np.bincount(inverse, weights=lifts, minlength=len(book_ids))
+        
+        # Без книг з кошика, уже куплених/оцінених і недоступних
+        keep = get_exclusion_index().mask(book_ids, user_id=request.user.id, exclude=cart_book_ids)
+        book_ids, scores = book_ids[keep], scores[keep]
+        order = np.argsort(-scores, kind='stable')[:limit]
+        book_ids, scores = book_ids[order].tolist(), scores[order].tolist()
+        
+        serializer = BookCatalogSerializer(
+            fetch_available_books(book_ids),
+            many=True,
+            context={'request': request}
+        )
+        suggestion_scores = dict(zip(book_ids, scores))
+        suggestions = serializer.data
+        for book in suggestions:
+            book['score'] = round(suggestion_scores[book['id']], 4)
+        
+        return Response({'suggestions': suggestions, 'based_on_books': cart_book_ids})
+        
+    except Exception as e:
+        print(f"Error getting cart suggestions: {str(e)}")
+        return Response(
+            {'error': f'Error getting cart suggestions: {str(e)}'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'diplom_back.settings')
 
 application = get_asgi_application()
+
+# Індекс підказок пошуку будується у фоні при старті процесу, а не на першому запиті
+from books.suggest import get_suggest_index  # noqa: E402
+
+get_suggest_index().warm_up()
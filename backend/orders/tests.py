@@ -4,8 +4,10 @@ from rest_framework import status
 from django.contrib.auth import get_user_model
 from books.models import Book
 from cart.models import Cart, CartItem
-from .models import Order
+from .models import Order, OrderItem
 from django.urls import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 User = get_user_model()
 
@@ -48,4 +50,23 @@ class OrderTests(APITestCase):
         )
         response = self.client.get(reverse('user-orders'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
\ No newline at end of file
+        self.assertEqual(len(response.data), 1)
+
+    # Кількість запитів списку замовлень не залежить від кількості замовлень
+    def test_user_orders_list_query_count(self):
+        def add_order():
+            order = Order.objects.create(
+                user=self.user, contact_name='Test', contact_email='test@example.com',
+                total_amount=20.00, delivery_address='Address', payment_method='cash'
+            )
+            OrderItem.objects.create(order=order, book=self.book, quantity=2, unit_price=10.00)
+
+        add_order()
+        with CaptureQueriesContext(connection) as single:
+            self.client.get(reverse('user-orders'))
+        add_order()
+        add_order()
+        with CaptureQueriesContext(connection) as several:
+            response = self.client.get(reverse('user-orders'))
+        self.assertEqual(len(several), len(single))
+        self.assertEqual([order['total_items'] for order in response.data], [2, 2, 2])
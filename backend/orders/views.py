@@ -3,7 +3,9 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from .models import Order
+from django.db.models import Prefetch
+from books.models import catalog_prefetch
+from .models import Order, OrderItem
 from .serializers import (
     OrderSerializer, 
     OrderCreateSerializer,
@@ -19,6 +21,10 @@ def create_order(request):
     
     if serializer.is_valid():
         order = serializer.save()
+        # Перечитуємо з prefetch, щоб серіалізація позицій не робила запитів на кожну книгу
+        order = Order.objects.prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.prefetch_related(catalog_prefetch()))
+        ).get(pk=order.pk)
         return Response({
             'message': 'Order created successfully',
             'order': OrderSerializer(order).data
@@ -45,7 +51,9 @@ class UserOrdersView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by('-created_at')
+        return Order.objects.filter(user=self.request.user).prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.prefetch_related(catalog_prefetch()))
+        ).order_by('-created_at')
 
 
 # Отримує детальну інформацію про замовлення
@@ -54,4 +62,6 @@ class OrderDetailView(generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
\ No newline at end of file
+        return Order.objects.filter(user=self.request.user).prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.prefetch_related(catalog_prefetch()))
+        )
\ No newline at end of file
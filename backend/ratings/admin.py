@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import Rating
+from .models import Rating, BookRatingStats, LeaderboardEntry
 
 
 admin.site.register(Rating)
-
+admin.site.register(BookRatingStats)
+admin.site.register(LeaderboardEntry)
@@ -0,0 +1,122 @@
+"""
+Materialized рейтинги популярності книг: загальний і по кожному жанру.
+
+Оцінка - байєсівське середнє (C * m + сума оцінок) / (C + кількість оцінок), де m -
+середня оцінка по каталогу, C - середня кількість оцінок на книгу. Книга з однією
+п'ятіркою тягнеться до m і не обганяє книги з багатьма високими оцінками.
+
+Кожен рейтинг тримає LEADERBOARD_SIZE найкращих доступних книг. Запис рейтингу
+оновлює рядки книги з поточним (закешованим) апріорі; refresh_leaderboards - повний
+перерахунок зі свіжим апріорі (команда refresh_leaderboards, періодично).
+"""
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from books.models import Book
+from books.conditional import bump_table_version
+from .models import BookRatingStats, LeaderboardEntry
+
+
+LEADERBOARD_SIZE = 100
+PRIOR_CACHE_KEY = 'leaderboard_prior'
+PRIOR_CACHE_TIMEOUT = 3600
+DEFAULT_PRIOR = (3.0, 1.0)
+
+
+def compute_prior():
+    """(m, C) зі статистики оцінок книг одним агрегатом"""
+    totals = BookRatingStats.objects.aggregate(
+        score_sum=Sum('total'), ratings=Sum('count'), books=Count('pk', filter=Q(count__gt=0))
+    )
+    if not totals['ratings']:
+        return DEFAULT_PRIOR
+    return totals['score_sum'] / totals['ratings'], max(totals['ratings'] / totals['books'], 1.0)
+
+
+def get_prior():
+    prior = cache.get(PRIOR_CACHE_KEY)
+    if prior is None:
+        prior = compute_prior()
+        cache.set(PRIOR_CACHE_KEY, prior, timeout=PRIOR_CACHE_TIMEOUT)
+    return prior
+
+
+def bayesian_score(total, count, prior):
+    mean, weight = prior
+    return (weight * mean + total) / (weight + count)
+
+
+def update_book(book_id):
+    """Оновлює рядки книги в загальному рейтингу і рейтингах її жанрів"""
+    stats = BookRatingStats.objects.filter(
+        book_id=book_id, count__gt=0, book__is_available=True
+    ).values_list('total', 'count').first()
+    genre_ids = list(Book.genres.through.objects.filter(book_id=book_id).values_list('genre_id', flat=True))
+
+    entries = LeaderboardEntry.objects.filter(book_id=book_id)
+    if stats is None:
+        entries.delete()
+        return
+    # Жанри, з яких книгу прибрали
+    entries.exclude(genre__isnull=True).exclude(genre_id__in=genre_ids).delete()
+
+    score = bayesian_score(*stats, get_prior())
+    for genre_id in [None] + genre_ids:
+        # genre_id=None - загальний рейтинг (genre IS NULL)
+        board = LeaderboardEntry.objects.filter(genre_id=genre_id)
+        with transaction.atomic():
+            if board.filter(book_id=book_id).update(score=score):
+                # Книга, що опустилась, лишається до повного перерахунку - неточний лише хвіст
+                continue
+            if board.count() >= LEADERBOARD_SIZE and score <= board.order_by('score').values_list('score', flat=True)[0]:
+                continue
+            LeaderboardEntry.objects.create(genre_id=genre_id, book_id=book_id, score=score)
+            overflow = list(board.order_by('-score', 'book_id').values_list('pk', flat=True)[LEADERBOARD_SIZE:])
+            if overflow:
+                LeaderboardEntry.objects.filter(pk__in=overflow).delete()
+
+
+def refresh_leaderboards(size=LEADERBOARD_SIZE):
+    """Перераховує всі рейтинги з нуля; повертає кількість збережених рядків"""
+    prior = compute_prior()
+    cache.set(PRIOR_CACHE_KEY, prior, timeout=PRIOR_CACHE_TIMEOUT)
+
+    rows = np.array(
+        BookRatingStats.objects.filter(count__gt=0, book__is_available=True).values_list('book_id', 'total', 'count'),
+        dtype=np.float64
+    ).reshape(-1, 3)
+    book_ids = rows[:, 0].astype(np.int64)
+    scores = bayesian_score(rows[:, 1], rows[:, 2], prior)
+    # За спаданням оцінки, при рівності - менший id
+    order = np.lexsort((book_ids, -scores))
+    book_ids, scores = book_ids[order], scores[order]
+
+    entries = [
+        LeaderboardEntry(genre_id=None, book_id=int(book_id), score=float(score))
+        for book_id, score in zip(book_ids[:size], scores[:size])
+    ]
+    position = {int(book_id): i for i, book_id in enumerate(book_ids)}
+    genre_books = {}
+    for book_id, genre_id in Book.genres.through.objects.values_list('book_id', 'genre_id').iterator(chunk_size=20000):
+        if book_id in position:
+            genre_books.setdefault(genre_id, []).append(position[book_id])
+    for genre_id, positions in genre_books.items():
+        for i in sorted(positions)[:size]:
+            entries.append(LeaderboardEntry(genre_id=genre_id, book_id=int(book_ids[i]), score=float(scores[i])))
+
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        LeaderboardEntry.objects.bulk_create(entries, batch_size=5000)
+    # Новий апріорі змінює оцінки без змін рейтингів
+    bump_table_version('leaderboard')
+    return len(entries)
+
+
+def get_leaderboard(genre_id=None, limit=10):
+    """
+    [(book_id, оцінка)] з рейтингу одним запитом. Порожній рейтинг не будується
+    на запиті - його заповнюють сигнали оцінок і команда refresh_leaderboards
+    """
+    board = LeaderboardEntry.objects.filter(genre_id=genre_id)
+    return list(board.order_by('-score', 'book_id').values_list('book_id', 'score')[:limit])
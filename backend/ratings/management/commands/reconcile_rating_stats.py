@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum, Q
+from ratings.models import Rating, BookRatingStats
+from books.conditional import bump_table_version
+
+
+FIELDS = ['count', 'total', 'score_1', 'score_2', 'score_3', 'score_4', 'score_5']
+
+
+class Command(BaseCommand):
+    help = 'Перераховує з нуля статистику оцінок книг (BookRatingStats) з таблиці рейтингів'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Лише показати розбіжності')
+
+    def collect_stats(self):
+        """book_id -> BookRatingStats, агрегований з рейтингів одним запитом"""
+        rows = Rating.objects.order_by().values('book_id').annotate(
+            count=Count('id'),
+            total=Sum('score'),
+            **{f'score_{score}': Count('id', filter=Q(score=score)) for score in range(1, 6)}
+        )
+        return {
+            row['book_id']: BookRatingStats(
+                book_id=row['book_id'], average=row['total'] / row['count'],
+                **{field: row[field] for field in FIELDS}
+            )
+            for row in rows
+        }
+
+    def handle(self, *args, **options):
+        self.stdout.write("🚀 Звірка статистики оцінок книг...")
+
+        with transaction.atomic():
+            expected = self.collect_stats()
+            current = {
+                stats.book_id: stats for stats in BookRatingStats.objects.select_for_update()
+            }
+            mismatched = [
+                book_id for book_id in expected.keys() | current.keys()
+                if book_id not in expected or book_id not in current
+                or any(getattr(expected[book_id], field) != getattr(current[book_id], field) for field in FIELDS)
+            ]
+            for book_id in sorted(mismatched)[:20]:
+                self.stdout.write(f"  Книга {book_id}: розбіжність статистики")
+
+            if not options['dry_run']:
+                BookRatingStats.objects.all().delete()
+                BookRatingStats.objects.bulk_create(expected.values(), batch_size=5000)
+                # Статистика змінена без сигналів рейтингів
+                bump_table_version('rating')
+
+        action = "знайдено" if options['dry_run'] else "виправлено"
+        self.stdout.write(f"✅ Статистика для {len(expected)} книг, {action} розбіжностей: {len(mismatched)}")
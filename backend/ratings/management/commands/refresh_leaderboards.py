@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from ratings.leaderboards import LEADERBOARD_SIZE, get_prior, refresh_leaderboards
+
+
+class Command(BaseCommand):
+    help = 'Перераховує рейтинги популярності книг (загальний і по жанрах) за байєсівським середнім'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=LEADERBOARD_SIZE, help='Книг у кожному рейтингу')
+
+    def handle(self, *args, **options):
+        self.stdout.write("🚀 Перерахунок рейтингів популярності...")
+        saved = refresh_leaderboards(size=options['size'])
+        mean, weight = get_prior()
+        self.stdout.write(f"✅ Збережено {saved} рядків рейтингів (апріорі: середня {mean:.2f}, вага {weight:.1f})")
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum, Q
+
+
+def backfill_stats(apps, schema_editor):
+    Rating = apps.get_model('ratings', 'Rating')
+    BookRatingStats = apps.get_model('ratings', 'BookRatingStats')
+    rows = Rating.objects.order_by().values('book_id').annotate(
+        count=Count('id'),
+        total=Sum('score'),
+        **{f'score_{score}': Count('id', filter=Q(score=score)) for score in range(1, 6)}
+    )
+    BookRatingStats.objects.bulk_create(
+        [BookRatingStats(average=row['total'] / row['count'], **row) for row in rows],
+        batch_size=5000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0002_alter_book_author_delete_rating'),
+        ('ratings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookRatingStats',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_stats', serialize=False, to='books.book')),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+                ('score_1', models.IntegerField(default=0)),
+                ('score_2', models.IntegerField(default=0)),
+                ('score_3', models.IntegerField(default=0)),
+                ('score_4', models.IntegerField(default=0)),
+                ('score_5', models.IntegerField(default=0)),
+                ('average', models.FloatField(db_index=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
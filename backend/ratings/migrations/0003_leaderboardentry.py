@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+LEADERBOARD_SIZE = 100
+
+
+def backfill_leaderboards(apps, schema_editor):
+    """Початкові рейтинги з BookRatingStats - як ratings.leaderboards.refresh_leaderboards"""
+    Book = apps.get_model('books', 'Book')
+    BookRatingStats = apps.get_model('ratings', 'BookRatingStats')
+    LeaderboardEntry = apps.get_model('ratings', 'LeaderboardEntry')
+
+    totals = BookRatingStats.objects.aggregate(
+        score_sum=Sum('total'), ratings=Sum('count'), books=Count('pk', filter=Q(count__gt=0))
+    )
+    if not totals['ratings']:
+        return
+    mean = totals['score_sum'] / totals['ratings']
+    weight = max(totals['ratings'] / totals['books'], 1.0)
+
+    scored = [
+        ((weight * mean + total) / (weight + count), book_id)
+        for book_id, total, count in BookRatingStats.objects.filter(
+            count__gt=0, book__is_available=True
+        ).values_list('book_id', 'total', 'count')
+    ]
+    # За спаданням оцінки, при рівності - менший id
+    scored.sort(key=lambda row: (-row[0], row[1]))
+    position = {book_id: i for i, (_, book_id) in enumerate(scored)}
+
+    entries = [
+        LeaderboardEntry(genre_id=None, book_id=book_id, score=score)
+        for score, book_id in scored[:LEADERBOARD_SIZE]
+    ]
+    genre_books = {}
+    for book_id, genre_id in Book.genres.through.objects.values_list('book_id', 'genre_id').iterator(chunk_size=20000):
+        if book_id in position:
+            genre_books.setdefault(genre_id, []).append(position[book_id])
+    for genre_id, positions in genre_books.items():
+        for i in sorted(positions)[:LEADERBOARD_SIZE]:
+            score, book_id = scored[i]
+            entries.append(LeaderboardEntry(genre_id=genre_id, book_id=book_id, score=score))
+    LeaderboardEntry.objects.bulk_create(entries, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0003_book_search_vector'),
+        ('ratings', '0002_bookratingstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='books.book')),
+                ('genre', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard', to='books.genre')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['genre', '-score'], name='leaderboard_genre_score')],
+                'constraints': [models.UniqueConstraint(fields=('genre', 'book'), name='leaderboard_genre_book'), models.UniqueConstraint(condition=models.Q(('genre__isnull', True)), fields=('book',), name='leaderboard_overall_book')],
+            },
+        ),
+        migrations.RunPython(backfill_leaderboards, migrations.RunPython.noop),
+    ]
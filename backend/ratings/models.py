@@ -1,7 +1,9 @@
 from django.db import models
 from django.contrib.auth import get_user_model
-from books.models import Book
+from books.models import Book, Genre
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models import F, Q, Case, When, Value, FloatField, ExpressionWrapper
+from django.db.models.functions import Cast
 
 # Зберігає рейтинги та відгуки користувачів про книги
 class Rating(models.Model):
@@ -18,4 +20,71 @@ class Rating(models.Model):
         unique_together = ('book', 'user')
 
     def __str__(self):
-        return f'{self.user} - {self.book} ({self.score})'
\ No newline at end of file
+        return f'{self.user} - {self.book} ({self.score})'
+
+# Зберігає денормалізовану статистику оцінок книги (кількість, сума, гістограма 1-5)
+class BookRatingStats(models.Model):
+    book = models.OneToOneField(Book, primary_key=True, on_delete=models.CASCADE, related_name='rating_stats')
+    count = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+    score_1 = models.IntegerField(default=0)
+    score_2 = models.IntegerField(default=0)
+    score_3 = models.IntegerField(default=0)
+    score_4 = models.IntegerField(default=0)
+    score_5 = models.IntegerField(default=0)
+    # total / count, NULL без оцінок; індекс для сортування каталогу за рейтингом
+    average = models.FloatField(null=True, db_index=True)
+
+    def __str__(self):
+        return f'Rating stats for book {self.book_id}: {self.average} ({self.count})'
+
+    @property
+    def histogram(self):
+        return {score: getattr(self, f'score_{score}') for score in range(1, 6)}
+
+    @classmethod
+    def apply(cls, book_id, added=None, removed=None):
+        """
+        Атомарно оновлює статистику F() виразами в одному UPDATE: added - нова оцінка,
+        removed - прибрана (зміна оцінки - обидві). Рядок створюється з першою оцінкою
+        """
+        count_delta = (added is not None) - (removed is not None)
+        total_delta = (added or 0) - (removed or 0)
+        updates = {
+            'count': F('count') + count_delta,
+            'total': F('total') + total_delta,
+            # Праві частини UPDATE читають старі значення рядка
+            'average': Case(
+                When(count=-count_delta, then=Value(None)),
+                default=ExpressionWrapper(
+                    Cast(F('total') + total_delta, FloatField()) / (F('count') + count_delta),
+                    output_field=FloatField()
+                ),
+            ),
+        }
+        if added is not None:
+            updates[f'score_{added}'] = F(f'score_{added}') + 1
+        if removed is not None:
+            updates[f'score_{removed}'] = F(f'score_{removed}') - 1 + (1 if removed == added else 0)
+
+        queryset = cls.objects.filter(book_id=book_id)
+        if not queryset.update(**updates) and added is not None:
+            cls.objects.get_or_create(book_id=book_id)
+            queryset.update(**updates)
+
+# Зберігає materialized топ книг за байєсівським рейтингом: загальний (genre=NULL) і по жанрах
+class LeaderboardEntry(models.Model):
+    genre = models.ForeignKey(Genre, null=True, blank=True, on_delete=models.CASCADE, related_name='leaderboard')
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['genre', 'book'], name='leaderboard_genre_book'),
+            # NULL жанри не порівнюються в unique - окреме обмеження для загального топу
+            models.UniqueConstraint(fields=['book'], condition=Q(genre__isnull=True), name='leaderboard_overall_book'),
+        ]
+        indexes = [models.Index(fields=['genre', '-score'], name='leaderboard_genre_score')]
+
+    def __str__(self):
+        return f'{self.genre or "All"}: {self.book_id} ({self.score:.3f})'
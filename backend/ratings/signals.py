@@ -0,0 +1,50 @@
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from books.models import Book
+from .models import Rating, BookRatingStats
+from .leaderboards import update_book
+
+
+@receiver(pre_save, sender=Rating)
+def remember_previous_score(sender, instance, **kwargs):
+    """Попередня оцінка для обробників post_save (статистика, смакові вектори)"""
+    instance._previous_score = (
+        Rating.objects.filter(pk=instance.pk).values_list('score', flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Rating)
+def update_stats_on_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_score', None)
+    if created or previous is None:
+        BookRatingStats.apply(instance.book_id, added=instance.score)
+    elif previous != instance.score:
+        BookRatingStats.apply(instance.book_id, added=instance.score, removed=previous)
+    else:
+        return
+    update_book(instance.book_id)
+
+
+@receiver(post_delete, sender=Rating)
+def update_stats_on_delete(sender, instance, origin=None, **kwargs):
+    BookRatingStats.apply(instance.book_id, removed=instance.score)
+    # При видаленні самої книги її рядки рейтингів видаляються каскадом
+    if not isinstance(origin, Book) and getattr(origin, 'model', None) is not Book:
+        update_book(instance.book_id)
+
+
+@receiver(post_save, sender=Book)
+def update_leaderboards_on_availability(sender, instance, created, **kwargs):
+    if not created:
+        update_book(instance.id)
+
+
+@receiver(m2m_changed, sender=Book.genres.through)
+def update_leaderboards_on_genres(sender, instance, action, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Book):
+        update_book(instance.id)
+    elif pk_set:
+        for book_id in pk_set:
+            update_book(book_id)
@@ -2,9 +2,15 @@ from django.test import TestCase
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from books.models import Book
-from .models import Rating
+from books.models import Book, Genre
+from .models import Rating, BookRatingStats, LeaderboardEntry
+from .leaderboards import get_leaderboard, refresh_leaderboards
 from django.urls import reverse
+from django.apps import apps as django_apps
+import importlib
+from django.core.management import call_command
+from django.core.cache import cache
+from io import StringIO
 
 User = get_user_model()
 
@@ -41,4 +47,146 @@ class RatingTests(APITestCase):
         rating = Rating.objects.create(book=self.book, user=self.user, score=3, review='OK')
         response = self.client.delete(reverse('delete-rating', kwargs={'pk': rating.id}))
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
-        self.assertEqual(Rating.objects.count(), 0)
\ No newline at end of file
+        self.assertEqual(Rating.objects.count(), 0)
+
+
+class BookRatingStatsTests(APITestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(email=f'stats{i}@example.com', password='testpass123', name=f'User {i}')
+            for i in range(3)
+        ]
+        self.book = Book.objects.create(title='Stats Book', year=2023, description='Test', is_available=True)
+        self.client.force_authenticate(user=self.users[0])
+
+    def stats(self):
+        return BookRatingStats.objects.get(book=self.book)
+
+    # Статистика слідує за створенням, зміною і видаленням оцінок
+    def test_stats_follow_rating_writes(self):
+        response = self.client.post(reverse('create-rating'), {'book': self.book.id, 'score': 5})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        Rating.objects.create(book=self.book, user=self.users[1], score=2)
+        stats = self.stats()
+        self.assertEqual((stats.count, stats.total, stats.average), (2, 7, 3.5))
+        self.assertEqual(stats.histogram, {1: 0, 2: 1, 3: 0, 4: 0, 5: 1})
+
+        rating = Rating.objects.get(user=self.users[0])
+        self.client.patch(reverse('update-rating', kwargs={'pk': rating.id}), {'score': 3})
+        stats = self.stats()
+        self.assertEqual((stats.count, stats.total, stats.average), (2, 5, 2.5))
+        self.assertEqual(stats.histogram, {1: 0, 2: 1, 3: 1, 4: 0, 5: 0})
+
+        self.client.delete(reverse('delete-rating', kwargs={'pk': rating.id}))
+        Rating.objects.get(user=self.users[1]).delete()
+        stats = self.stats()
+        self.assertEqual((stats.count, stats.total, stats.average), (0, 0, None))
+        self.assertEqual(sum(stats.histogram.values()), 0)
+
+    # Каталог сортує і показує рейтинг зі статистики
+    def test_catalog_uses_stats(self):
+        other = Book.objects.create(title='Other Book', year=2023, description='Test', is_available=True)
+        Rating.objects.create(book=self.book, user=self.users[0], score=2)
+        Rating.objects.create(book=other, user=self.users[0], score=5)
+        Rating.objects.create(book=other, user=self.users[1], score=4)
+
+        response = self.client.get(reverse('book-list'), {'rating_order': 'desc'})
+        results = response.data['results']
+        self.assertEqual([book['id'] for book in results], [other.id, self.book.id])
+        self.assertEqual((results[0]['average_rating'], results[0]['rating_count']), (4.5, 2))
+
+    # Звірка перераховує зіпсовану статистику з рейтингів
+    def test_reconcile_fixes_drift(self):
+        for user, score in zip(self.users, [5, 4, 4]):
+            Rating.objects.create(book=self.book, user=user, score=score)
+        BookRatingStats.objects.filter(book=self.book).update(count=10, score_4=0, average=1.0)
+
+        out = StringIO()
+        call_command('reconcile_rating_stats', stdout=out)
+        self.assertIn('розбіжностей: 1', out.getvalue())
+        stats = self.stats()
+        self.assertEqual((stats.count, stats.total), (3, 13))
+        self.assertAlmostEqual(stats.average, 13 / 3)
+        self.assertEqual(stats.histogram, {1: 0, 2: 0, 3: 0, 4: 2, 5: 1})
+
+
+class LeaderboardTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [
+            User.objects.create_user(email=f'board{i}@example.com', password='testpass123', name=f'User {i}')
+            for i in range(6)
+        ]
+        self.genre = Genre.objects.create(name='Poetry')
+        self.single = Book.objects.create(title='Single Five', year=2023, description='Test', is_available=True)
+        self.established = Book.objects.create(title='Established', year=2023, description='Test', is_available=True)
+        self.average = Book.objects.create(title='Average', year=2023, description='Test', is_available=True)
+        self.established.genres.add(self.genre)
+        self.average.genres.add(self.genre)
+
+        Rating.objects.create(book=self.single, user=self.users[0], score=5)
+        for user in self.users[1:]:
+            Rating.objects.create(book=self.established, user=user, score=5)
+            Rating.objects.create(book=self.average, user=user, score=3)
+        Rating.objects.create(book=self.established, user=self.users[0], score=4)
+        # Апріорі, закешоване при першій оцінці, застаріле - як після періодичного перерахунку
+        refresh_leaderboards()
+
+    def board(self, genre_id=None):
+        return [book_id for book_id, _ in get_leaderboard(genre_id, limit=10)]
+
+    # Книга з однією п'ятіркою не обганяє книгу з багатьма високими оцінками
+    def test_bayesian_order(self):
+        self.assertEqual(self.board(), [self.established.id, self.single.id, self.average.id])
+        self.assertEqual(self.board(self.genre.id), [self.established.id, self.average.id])
+
+    # Міграція заповнює рейтинги з наявної статистики так само, як повний перерахунок
+    def test_migration_backfill_matches_refresh(self):
+        refreshed = set(LeaderboardEntry.objects.values_list('genre_id', 'book_id'))
+        LeaderboardEntry.objects.all().delete()
+        migration = importlib.import_module('ratings.migrations.0003_leaderboardentry')
+        migration.backfill_leaderboards(django_apps, None)
+        self.assertEqual(set(LeaderboardEntry.objects.values_list('genre_id', 'book_id')), refreshed)
+        self.assertEqual(self.board(), [self.established.id, self.single.id, self.average.id])
+
+    # Порожній рейтинг не перераховується на запиті, лише командою
+    def test_empty_board_not_rebuilt_on_request(self):
+        LeaderboardEntry.objects.all().delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.board(), [])
+        call_command('refresh_leaderboards', stdout=StringIO())
+        self.assertEqual(self.board(), [self.established.id, self.single.id, self.average.id])
+
+    # Інкрементні оновлення збігаються з повним перерахунком
+    def test_incremental_matches_refresh(self):
+        Rating.objects.create(book=self.single, user=self.users[1], score=4)
+        Rating.objects.filter(book=self.average, user=self.users[1]).delete()
+        self.average.genres.remove(self.genre)
+        self.single.genres.add(self.genre)
+        fresh = Book.objects.create(title='Fresh', year=2023, description='Test', is_available=True)
+        Rating.objects.create(book=fresh, user=self.users[2], score=5)
+        self.established.is_available = False
+        self.established.save()
+        incremental = {(genre_id, book_id): round(score, 6) for genre_id, book_id, score
+                       in LeaderboardEntry.objects.values_list('genre_id', 'book_id', 'score')}
+
+        out = StringIO()
+        call_command('refresh_leaderboards', stdout=out)
+        self.assertIn('Збережено 4', out.getvalue())
+        refreshed = {(genre_id, book_id): round(score, 6) for genre_id, book_id, score
+                     in LeaderboardEntry.objects.values_list('genre_id', 'book_id', 'score')}
+        self.assertEqual(incremental.keys(), refreshed.keys())
+        self.assertEqual(self.board(self.genre.id), [self.single.id])
+
+    # Популярні книги - з рейтингу, з фільтром за жанром; недоступні книги прибираються
+    def test_popular_endpoint(self):
+        response = self.client.get(reverse('popular-books'), {'genre': self.genre.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([book['id'] for book in response.data], [self.established.id, self.average.id])
+        self.assertIn('bayesian_rating', response.data[0])
+
+        self.established.is_available = False
+        self.established.save()
+        response = self.client.get(reverse('popular-books'))
+        self.assertEqual([book['id'] for book in response.data], [self.single.id, self.average.id])
+        self.assertEqual(self.client.get(reverse('popular-books'), {'genre': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import BookVector
+from .models import BookVector, BookView, BookTrending, BookCoView, BookCoPurchase, UserTasteVector
 
 admin.site.register(BookVector)
-
+admin.site.register(BookView)
+admin.site.register(BookTrending)
+admin.site.register(BookCoView)
+admin.site.register(BookCoPurchase)
+admin.site.register(UserTasteVector)
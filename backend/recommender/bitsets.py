@@ -0,0 +1,74 @@
+"""
+Бітові множини для відсіювання книг перед top-k.
+
+Bitset (books.features) зберігає по біту на id книги (uint8 масив, 125 КБ на мільйон
+книг), тому перевірка цілого масиву кандидатів - одна векторна операція без запитів до БД.
+
+ExclusionIndex поєднує:
+    - доступність книг з колонкового сховища ознак (books.features);
+    - множини книг, з якими взаємодіяв користувач (рейтинги та покупки), в LRU
+      на MAX_USER_BITSETS користувачів; будуються з InteractionStore, а сигнали
+      взаємодій викидають користувача з LRU.
+"""
+import threading
+from collections import OrderedDict
+import numpy as np
+from books.features import Bitset, get_feature_store
+from user_based.interactions import get_interaction_store
+
+
+MAX_USER_BITSETS = 10000
+
+
+class ExclusionIndex:
+    def __init__(self, max_users=MAX_USER_BITSETS):
+        self._lock = threading.RLock()
+        self.max_users = max_users
+        self.user_bitsets = OrderedDict()  # user_id -> (generation сховища, Bitset)
+
+    def invalidate(self):
+        with self._lock:
+            self.user_bitsets.clear()
+
+    # --- Взаємодії користувача ---
+
+    def interacted(self, user_id):
+        """Bitset книг, які користувач оцінив або купив (LRU)"""
+        store = get_interaction_store()
+        store.ensure_loaded()
+        with self._lock:
+            entry = self.user_bitsets.get(user_id)
+            if entry is not None and entry[0] == store.generation:
+                self.user_bitsets.move_to_end(user_id)
+                return entry[1]
+
+            bitset = Bitset(store.user_book_ids(user_id))
+            self.user_bitsets[user_id] = (store.generation, bitset)
+            self.user_bitsets.move_to_end(user_id)
+            while len(self.user_bitsets) > self.max_users:
+                self.user_bitsets.popitem(last=False)
+            return bitset
+
+    def evict_user(self, user_id):
+        with self._lock:
+            self.user_bitsets.pop(user_id, None)
+
+    # --- Маска ---
+
+    def mask(self, book_ids, user_id=None, exclude=None):
+        """True для книг, які можна рекомендувати: доступні, без взаємодій, не в exclude"""
+        book_ids = np.asarray(book_ids, dtype=np.int64)
+        keep = get_feature_store().available(book_ids)
+        if user_id is not None:
+            keep &= ~self.interacted(user_id).contains(book_ids)
+        if exclude is not None and len(exclude):
+            # exclude приходить від клієнта - без бітової множини, розмір якої задає найбільший id
+            keep &= ~np.isin(book_ids, np.asarray(exclude, dtype=np.int64))
+        return keep
+
+
+_index = ExclusionIndex()
+
+
+def get_exclusion_index():
+    return _index
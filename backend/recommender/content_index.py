@@ -0,0 +1,154 @@
+"""
+Індекс контентних векторів книг у пам'яті процесу.
+
+Усі BookVector завантажуються один раз у матрицю одиничних векторів (float32),
+тому косинусна подібність з запитом - скалярний добуток. Для великих каталогів
+(від MIPS_MIN_ITEMS книг) пошук іде через MIPSIndex з user_based.mips, інакше
+brute force однією матричною операцією. Сигнали BookVector скидають індекс,
+він перебудовується при наступному зверненні.
+"""
+import pickle
+import threading
+import numpy as np
+from user_based.mips import MIPSIndex
+from .feeds import CANDIDATE_OVERFETCH, FEED_SIZE
+from .models import BookVector
+
+
+MIPS_MIN_ITEMS = 5000
+MIPS_TARGET_RECALL = 0.95
+MIPS_CALIBRATION_QUERIES = 200
+# recall калібрується для тієї кількості книг, яку просить TasteCandidates
+MIPS_CALIBRATION_TOP_N = FEED_SIZE * CANDIDATE_OVERFETCH
+
+
+def decode_vector(blob):
+    return np.asarray(pickle.loads(blob), dtype=np.float32).ravel()
+
+
+def read_unit_vectors(book_ids):
+    """
+    (маска книг з вектором, одиничні вектори) прямо з BookVector - для кількох
+    книг без побудови індексу (ContentIndex ще не завантажений)
+    """
+    book_ids = np.asarray(book_ids, dtype=np.int64)
+    stored = {}
+    for book_id, blob in BookVector.objects.filter(book_id__in=set(book_ids.tolist())).values_list('book_id', 'vector'):
+        try:
+            stored[book_id] = decode_vector(blob)
+        except Exception:
+            continue
+    found = np.array([book_id in stored for book_id in book_ids.tolist()], dtype=bool)
+    if not found.any():
+        return found, np.empty((0, 0), dtype=np.float32)
+    matrix = np.vstack([stored[book_id] for book_id in book_ids[found].tolist()])
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    return found, matrix
+
+
+class ContentIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self.version = 0  # лічильник перебудов
+        self.book_ids = np.empty(0, dtype=np.int64)
+        self.vectors = np.empty((0, 0), dtype=np.float32)
+        self.norms = np.empty(0, dtype=np.float32)  # довжини вихідних векторів
+        self.rows = np.empty(0, dtype=np.int64)  # book_id -> рядок (-1, якщо вектора немає)
+        self.mips = None
+
+    def rebuild(self):
+        with self._lock:
+            book_ids, vectors = [], []
+            for book_id, blob in BookVector.objects.values_list('book_id', 'vector').iterator(chunk_size=2000):
+                try:
+                    vectors.append(decode_vector(blob))
+                    book_ids.append(book_id)
+                except Exception:
+                    continue
+
+            self.book_ids = np.array(book_ids, dtype=np.int64)
+            if vectors:
+                matrix = np.vstack(vectors)
+                self.norms = np.linalg.norm(matrix, axis=1)
+                matrix /= np.maximum(self.norms[:, None], 1e-12)
+            else:
+                matrix = np.empty((0, 0), dtype=np.float32)
+                self.norms = np.empty(0, dtype=np.float32)
+            self.vectors = matrix
+            self.rows = np.full(int(self.book_ids.max(initial=-1)) + 1, -1, dtype=np.int64)
+            self.rows[self.book_ids] = np.arange(len(self.book_ids))
+
+            self.mips = None
+            if len(self.book_ids) >= MIPS_MIN_ITEMS:
+                self.mips = MIPSIndex(matrix)
+                sample = matrix[np.random.default_rng(42).choice(len(matrix), MIPS_CALIBRATION_QUERIES, replace=False)]
+                n_probe, recall = self.mips.calibrate(
+                    sample, top_n=MIPS_CALIBRATION_TOP_N, target_recall=MIPS_TARGET_RECALL
+                )
+                print(f"Content MIPS index built: {self.mips.n_clusters} clusters, n_probe={n_probe}, recall={recall:.3f}")
+
+            self._loaded = True
+            self.version += 1
+            print(f"Content index built: {len(self.book_ids)} book vectors")
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+
+    def ensure_loaded(self):
+        with self._lock:
+            if not self._loaded:
+                self.rebuild()
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    @property
+    def dims(self):
+        self.ensure_loaded()
+        return self.vectors.shape[1]
+
+    def unit_vectors(self, book_ids):
+        """(маска книг з вектором, одиничні вектори цих книг)"""
+        self.ensure_loaded()
+        book_ids = np.asarray(book_ids, dtype=np.int64)
+        with self._lock:
+            inside = (book_ids >= 0) & (book_ids < len(self.rows))
+            rows = np.full(len(book_ids), -1, dtype=np.int64)
+            rows[inside] = self.rows[book_ids[inside]]
+            found = rows >= 0
+            return found, self.vectors[rows[found]]
+
+    def raw_vectors(self):
+        """(версія індексу, id книг, вектори у вихідному масштабі)"""
+        self.ensure_loaded()
+        with self._lock:
+            return self.version, self.book_ids, self.vectors * self.norms[:, None]
+
+    def search(self, query, top_n):
+        """Top-N книг за косинусною подібністю з query: (id книг, скори)"""
+        self.ensure_loaded()
+        query = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        with self._lock:
+            if not len(self.book_ids) or norm == 0 or query.shape[0] != self.vectors.shape[1]:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            query = query / norm
+            if self.mips is not None:
+                rows, scores = self.mips.search(query, top_n)
+            else:
+                scores = self.vectors @ query
+                top_n = min(top_n, len(scores))
+                rows = np.argpartition(-scores, top_n - 1)[:top_n]
+                rows = rows[np.argsort(-scores[rows], kind='stable')]
+                scores = scores[rows]
+            return self.book_ids[rows], scores
+
+
+_index = ContentIndex()
+
+
+def get_content_index():
+    return _index
@@ -0,0 +1,113 @@
+"""
+Індекс "також переглядали" (co-view).
+
+Сесія - перегляди одного власника (користувач або анонімна сесія) у вікні
+SESSION_WINDOW. Пара книг рахується один раз на сесію: коли друга з книг уперше
+з'являється у вікні. Кожен записаний пакет переглядів (сигнал views_flushed)
+оновлює лічильники пар у BookCoView, після чого у рядку книги лишається лише
+top TOP_K сусідів - компактний масив, який ендпоінт читає одним запитом за ключем.
+
+Обрізання робить інкрементні лічильники наближеними (пара, що випала з top,
+починає рахунок з нуля); команда rebuild_coviews перераховує індекс з нуля
+через добуток розріджених матриць сесії x книги.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from books.features import get_feature_store
+from .models import BookView, BookCoView
+
+
+SESSION_WINDOW = timedelta(hours=24)
+# Скільки останніх різних книг сесії враховувати для нового перегляду
+MAX_SESSION_BOOKS = 50
+TOP_K = 50
+
+
+def view_owner(user_id, session_key):
+    return ('u', user_id) if user_id is not None else ('s', session_key)
+
+
+def top_neighbors(book_ids, counts, top_k=TOP_K):
+    """Сортує сусідів за спаданням кількості (за id при рівності) і обрізає до top_k"""
+    book_ids = np.asarray(book_ids, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    order = np.lexsort((book_ids, -counts))[:top_k]
+    return book_ids[order], counts[order]
+
+
+def session_pairs(views):
+    """Пари (книга, сусід), які додає пакет переглядів, з урахуванням історії сесій"""
+    owners = {view_owner(view.user_id, view.session_key) for view in views}
+    user_ids = [key for kind, key in owners if kind == 'u']
+    session_keys = [key for kind, key in owners if kind == 's' and key]
+    new_views = {
+        (view_owner(view.user_id, view.session_key), view.book_id, view.viewed_at) for view in views
+    }
+
+    history = defaultdict(list)
+    rows = BookView.objects.filter(
+        Q(user_id__in=user_ids) | Q(user__isnull=True, session_key__in=session_keys),
+        viewed_at__gte=min(view.viewed_at for view in views) - SESSION_WINDOW
+    ).order_by('viewed_at', 'id').values_list('user_id', 'session_key', 'book_id', 'viewed_at')
+    for user_id, session_key, book_id, viewed_at in rows:
+        history[view_owner(user_id, session_key)].append((book_id, viewed_at))
+
+    pairs = Counter()
+    for owner, owner_views in history.items():
+        for i, (book_id, viewed_at) in enumerate(owner_views):
+            if (owner, book_id, viewed_at) not in new_views:
+                continue
+            window_start = viewed_at - SESSION_WINDOW
+            recent = list(dict.fromkeys(
+                other for other, other_at in reversed(owner_views[:i]) if other_at >= window_start
+            ))[:MAX_SESSION_BOOKS]
+            # Повторний перегляд у межах сесії не додає пар
+            if book_id in recent:
+                continue
+            for other in recent:
+                pairs[(book_id, other)] += 1
+                pairs[(other, book_id)] += 1
+    return pairs
+
+
+def update_coviews(views):
+    """Інкрементно оновлює індекс з пакета записаних переглядів"""
+    if not views:
+        return 0
+    increments = defaultdict(Counter)
+    for (book_id, other), count in session_pairs(views).items():
+        increments[book_id][other] += count
+    if not increments:
+        return 0
+
+    book_ids = np.array(sorted(increments), dtype=np.int64)
+    book_ids = book_ids[get_feature_store().get('exists', book_ids)].tolist()
+    with transaction.atomic():
+        stored = {
+            book_id: BookCoView.unpack(blob) for book_id, blob in
+            BookCoView.objects.select_for_update().filter(book_id__in=book_ids).values_list('book_id', 'neighbors')
+        }
+        objects = []
+        for book_id in book_ids:
+            counts = Counter(increments[book_id])
+            if book_id in stored:
+                for neighbor_id, count in stored[book_id].tolist():
+                    counts[neighbor_id] += count
+            neighbor_ids, neighbor_counts = top_neighbors(list(counts), list(counts.values()))
+            objects.append(BookCoView(book_id=book_id, neighbors=BookCoView.pack(neighbor_ids, neighbor_counts)))
+
+        BookCoView.objects.bulk_create(
+            objects, update_conflicts=True, unique_fields=['book'], update_fields=['neighbors', 'updated_at']
+        )
+    return len(objects)
+
+
+def get_also_viewed(book_id, limit):
+    """(id доступних книг, кількості спільних переглядів) - один запит за первинним ключем"""
+    blob = BookCoView.objects.filter(book_id=book_id).values_list('neighbors', flat=True).first()
+    neighbors = BookCoView.unpack(blob)
+    neighbors = neighbors[get_feature_store().available(neighbors['book_id'])][:limit]
+    return neighbors['book_id'].tolist(), neighbors['count'].tolist()
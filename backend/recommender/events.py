@@ -0,0 +1,123 @@
+"""
+Буферизований журнал переглядів книг.
+
+track_book_view лише додає BookView у буфер процесу і одразу відповідає.
+Фоновий потік записує буфер одним bulk_create, коли в ньому FLUSH_SIZE подій
+або раз на FLUSH_INTERVAL_MS, тож запит ніколи не чекає на INSERT.
+Ще не записані перегляди теж видно в get_recent_book_ids (читання власних записів).
+Після кожного записаного пакета надсилається сигнал views_flushed (тренди тощо).
+"""
+import atexit
+import threading
+from django.db import close_old_connections
+from django.dispatch import Signal
+from django.utils import timezone
+from .models import BookView
+
+
+FLUSH_SIZE = 200
+FLUSH_INTERVAL_MS = 500
+# Скільки подій тримати в буфері, якщо БД недоступна (старіші відкидаються)
+MAX_PENDING = 10000
+RECENT_VIEWS_LIMIT = 5
+
+# Надсилається з views=[BookView, ...] після кожного записаного пакета
+views_flushed = Signal()
+
+
+class ViewBuffer:
+    def __init__(self, flush_size=FLUSH_SIZE, flush_interval_ms=FLUSH_INTERVAL_MS, background=True):
+        self.flush_size = flush_size
+        self.flush_interval_ms = flush_interval_ms
+        self.background = background
+        self._lock = threading.Lock()
+        self._pending = []
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, book_id, user_id=None, session_key=''):
+        view = BookView(book_id=book_id, user_id=user_id, session_key=session_key, viewed_at=timezone.now())
+        with self._lock:
+            self._pending.append(view)
+            full = len(self._pending) >= self.flush_size
+
+        if not self.background:
+            if full:
+                self.flush()
+            return
+        self._ensure_thread()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Записує накопичені перегляди одним bulk_create, повертає їх кількість"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+
+        try:
+            BookView.objects.bulk_create(batch, batch_size=1000)
+        except Exception as e:
+            print(f"Error flushing {len(batch)} book views: {e}")
+            with self._lock:
+                self._pending = (batch + self._pending)[-MAX_PENDING:]
+            return 0
+
+        views_flushed.send(sender=ViewBuffer, views=batch)
+        return len(batch)
+
+    def pending(self, user_id=None, session_key=None):
+        """Ще не записані перегляди користувача або сесії (від старіших до новіших)"""
+        with self._lock:
+            return [
+                view for view in self._pending
+                if (user_id is not None and view.user_id == user_id)
+                or (user_id is None and session_key and view.session_key == session_key)
+            ]
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='book-view-buffer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval_ms / 1000)
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception as e:
+                # Помилка обробника views_flushed не повинна зупиняти потік
+                print(f"Error in book view buffer: {e}")
+
+
+_buffer = ViewBuffer()
+atexit.register(lambda: _buffer.flush())
+
+
+def get_view_buffer():
+    return _buffer
+
+
+def get_recent_book_ids(user_id=None, session_key=None, limit=RECENT_VIEWS_LIMIT):
+    """
+    Останні limit унікальних переглянутих книг користувача (або сесії, якщо
+    user_id не задано) у порядку від старіших до новіших, як viewed_books клієнта
+    """
+    if user_id is not None:
+        queryset = BookView.objects.filter(user_id=user_id)
+    elif session_key:
+        queryset = BookView.objects.filter(session_key=session_key)
+    else:
+        return []
+
+    pending = [view.book_id for view in reversed(get_view_buffer().pending(user_id, session_key))]
+    # Повтори переглядів однієї книги - з запасом, щоб після дедуплікації лишилось limit
+    stored = queryset.order_by('-viewed_at').values_list('book_id', flat=True)[:limit * 10]
+    recent = list(dict.fromkeys(pending + list(stored)))[:limit]
+    return recent[::-1]
@@ -0,0 +1,76 @@
+"""
+Ранжовані стрічки рекомендацій з курсорною пагінацією.
+
+Пайплайн рахує повний рейтинг один раз і кешує top FEED_SIZE у компактному вигляді
+(int32 масив id книг + float32 масив скорів). Наступні сторінки - це зріз масиву
+за курсором і один пакетний запит книг, без повторного скорингу.
+Курсор - непрозорий base64 рядок зі зміщенням у стрічці.
+"""
+import base64
+import binascii
+import numpy as np
+from books.models import Book
+
+
+FEED_SIZE = 200
+FEED_PAGE_SIZE = 8
+FEED_MAX_PAGE_SIZE = 50
+# У скільки разів більше кандидатів читати до відсіювання маскою
+CANDIDATE_OVERFETCH = 2
+
+
+class InvalidCursor(ValueError):
+    """Курсор пошкоджений або не з цієї стрічки"""
+
+
+def build_feed(book_ids, scores, **extra):
+    """Компактна стрічка з top FEED_SIZE (вхід уже відсортований за спаданням)"""
+    feed = {
+        'book_ids': np.asarray(book_ids[:FEED_SIZE], dtype=np.int32),
+        'scores': np.asarray(scores[:FEED_SIZE], dtype=np.float32),
+    }
+    feed.update(extra)
+    return feed
+
+
+def encode_cursor(offset):
+    return base64.urlsafe_b64encode(f'o{offset}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Курсор -> зміщення (порожній курсор - перша сторінка)"""
+    if not cursor:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        if not raw.startswith('o'):
+            raise ValueError(raw)
+        offset = int(raw[1:])
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(f'Invalid cursor: {cursor}')
+    if offset < 0:
+        raise InvalidCursor(f'Invalid cursor: {cursor}')
+    return offset
+
+
+def parse_page_size(value):
+    try:
+        page_size = int(value) if value not in (None, '') else FEED_PAGE_SIZE
+    except (TypeError, ValueError):
+        raise InvalidCursor(f'Invalid page_size: {value}')
+    return max(1, min(page_size, FEED_MAX_PAGE_SIZE))
+
+
+def get_feed_page(feed, offset, page_size):
+    """Повертає (id книг, скори, next_cursor) для сторінки стрічки"""
+    end = offset + page_size
+    book_ids = feed['book_ids'][offset:end].tolist()
+    scores = feed['scores'][offset:end].tolist()
+    next_cursor = encode_cursor(end) if end < len(feed['book_ids']) else None
+    return book_ids, scores, next_cursor
+
+
+def fetch_available_books(book_ids):
+    """Доступні книги (з анотаціями каталогу) у порядку book_ids"""
+    books = Book.objects.for_catalog().filter(id__in=book_ids, is_available=True).in_bulk()
+    return [books[book_id] for book_id in book_ids if book_id in books]
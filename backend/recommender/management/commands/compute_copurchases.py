@@ -0,0 +1,62 @@
+import numpy as np
+import scipy.sparse as sp
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from orders.models import OrderItem
+from recommender.models import BookCoPurchase
+from user_based.extraction import extract_columns
+
+
+class Command(BaseCommand):
+    help = 'Обчислює top-K книг, які купують разом (lift) із завершених замовлень'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=20)
+        parser.add_argument('--min-support', type=int, default=2, help='Мінімум спільних замовлень для пари')
+        parser.add_argument('--min-lift', type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        top_k = options['top_k']
+        self.stdout.write(f"🚀 Обчислення пар \"купують разом\" (top-{top_k}, support >= {options['min_support']})...")
+
+        order_ids, book_ids = extract_columns(
+            OrderItem.objects.filter(order__is_completed=True).order_by().values_list('order_id', 'book_id').distinct(),
+            [np.int32, np.int32]
+        )
+        if not len(order_ids):
+            self.stdout.write("❌ Немає завершених замовлень!")
+            return
+
+        _, rows = np.unique(order_ids, return_inverse=True)
+        books, cols = np.unique(book_ids, return_inverse=True)
+        n_orders = rows.max() + 1
+        incidence = sp.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(n_orders, len(books))
+        )
+        incidence.data[:] = 1
+
+        # X^T X: кількість замовлень з обома книгами (на діагоналі - з однією)
+        support = (incidence.T @ incidence).tocsr()
+        book_orders = support.diagonal().astype(np.float64)
+
+        pairs = []
+        for row in range(support.shape[0]):
+            neighbors = support.indices[support.indptr[row]:support.indptr[row + 1]]
+            counts = support.data[support.indptr[row]:support.indptr[row + 1]]
+            # lift = P(a, b) / (P(a) P(b))
+            lifts = n_orders * counts / (book_orders[row] * book_orders[neighbors])
+            mask = (neighbors != row) & (counts >= options['min_support']) & (lifts >= options['min_lift'])
+            neighbors, counts, lifts = neighbors[mask], counts[mask], lifts[mask]
+
+            # За спаданням lift, при рівності - більше спільних замовлень
+            order = np.lexsort((-counts, -lifts))[:top_k]
+            pairs.extend(
+                BookCoPurchase(book_id=int(books[row]), neighbor_id=int(books[n]), lift=float(l), support=int(c))
+                for n, l, c in zip(neighbors[order], lifts[order], counts[order])
+            )
+
+        with transaction.atomic():
+            BookCoPurchase.objects.all().delete()
+            BookCoPurchase.objects.bulk_create(pairs, batch_size=5000)
+
+        self.stdout.write(f"✅ Збережено {len(pairs)} пар для {n_orders} замовлень і {len(books)} книг")
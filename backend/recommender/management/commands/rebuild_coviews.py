@@ -0,0 +1,75 @@
+import numpy as np
+import scipy.sparse as sp
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from recommender.coviews import SESSION_WINDOW, TOP_K, top_neighbors
+from recommender.models import BookView, BookCoView
+
+
+class Command(BaseCommand):
+    help = 'Перераховує з нуля індекс "також переглядали" з журналу переглядів'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='Скільки днів журналу переглядів враховувати')
+        parser.add_argument('--top-k', type=int, default=TOP_K)
+        parser.add_argument('--block-size', type=int, default=1000)
+
+    def build_session_matrix(self, since):
+        """
+        Бінарна розріджена матриця сесії x книги. Сесія - власник і вікно
+        SESSION_WINDOW (фіксовані вікна наближають ковзне вікно інкрементного оновлення)
+        """
+        window = SESSION_WINDOW.total_seconds()
+        sessions = {}
+        rows, cols = [], []
+        views = BookView.objects.filter(viewed_at__gte=since).order_by().values_list(
+            'user_id', 'session_key', 'book_id', 'viewed_at'
+        )
+        for user_id, session_key, book_id, viewed_at in views.iterator(chunk_size=20000):
+            owner = ('u', user_id) if user_id is not None else ('s', session_key)
+            key = (owner, int(viewed_at.timestamp() // window))
+            rows.append(sessions.setdefault(key, len(sessions)))
+            cols.append(book_id)
+        if not rows:
+            return None
+
+        rows = np.array(rows, dtype=np.int64)
+        cols = np.array(cols, dtype=np.int64)
+        matrix = sp.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(len(sessions), int(cols.max()) + 1)
+        )
+        # Повторні перегляди книги в сесії рахуються один раз
+        matrix.data[:] = 1
+        return matrix
+
+    def handle(self, *args, **options):
+        top_k = options['top_k']
+        since = timezone.now() - timezone.timedelta(days=options['days'])
+        self.stdout.write(f"🚀 Перебудова індексу \"також переглядали\" за {options['days']} днів (top-{top_k})...")
+
+        matrix = self.build_session_matrix(since)
+        objects = []
+        if matrix is not None:
+            matrix_t = matrix.T.tocsr()
+            book_ids = np.flatnonzero(np.diff(matrix_t.indptr))
+            for start in range(0, len(book_ids), options['block_size']):
+                block_ids = book_ids[start:start + options['block_size']]
+                # X^T X: кількість сесій, у яких переглядали обидві книги
+                block = (matrix_t[block_ids] @ matrix).tocsr()
+                for row, book_id in enumerate(block_ids):
+                    neighbors = block.indices[block.indptr[row]:block.indptr[row + 1]]
+                    counts = block.data[block.indptr[row]:block.indptr[row + 1]]
+                    mask = neighbors != book_id
+                    if not mask.any():
+                        continue
+                    neighbor_ids, neighbor_counts = top_neighbors(neighbors[mask], counts[mask], top_k)
+                    objects.append(BookCoView(
+                        book_id=int(book_id), neighbors=BookCoView.pack(neighbor_ids, neighbor_counts)
+                    ))
+
+        with transaction.atomic():
+            BookCoView.objects.all().delete()
+            BookCoView.objects.bulk_create(objects, batch_size=5000)
+
+        self.stdout.write(f"✅ Збережено сусідів для {len(objects)} книг")
@@ -0,0 +1,71 @@
+import numpy as np
+import scipy.sparse as sp
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from orders.models import OrderItem
+from recommender.content_index import get_content_index
+from recommender.models import BookView, UserTasteVector
+from recommender.taste import VIEW_WEIGHT, PURCHASE_WEIGHT
+from user_based.extraction import extract_columns, extract_ratings
+
+
+class Command(BaseCommand):
+    help = 'Перераховує смакові вектори всіх користувачів з рейтингів, покупок і переглядів'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def collect_events(self):
+        """(user_ids, book_ids, ваги) усіх подій - ті самі ваги, що й при інкрементному оновленні"""
+        rating_users, rating_books, scores = extract_ratings()
+        # Позиція замовлення - окрема покупка, як у сигналі завершення замовлення
+        purchase_users, purchase_books = extract_columns(
+            OrderItem.objects.filter(order__is_completed=True).order_by().values_list('order__user_id', 'book_id'),
+            [np.int32, np.int32]
+        )
+        view_users, view_books = extract_columns(
+            BookView.objects.filter(user__isnull=False).order_by().values_list('user_id', 'book_id'),
+            [np.int32, np.int32]
+        )
+        user_ids = np.concatenate([rating_users, purchase_users, view_users]).astype(np.int64)
+        book_ids = np.concatenate([rating_books, purchase_books, view_books]).astype(np.int64)
+        weights = np.concatenate([
+            np.maximum(scores.astype(np.float64) - 2, 0),
+            np.full(len(purchase_users), PURCHASE_WEIGHT),
+            np.full(len(view_users), VIEW_WEIGHT),
+        ])
+        return user_ids, book_ids, weights
+
+    def handle(self, *args, **options):
+        self.stdout.write("🚀 Перерахунок смакових векторів користувачів...")
+        index = get_content_index()
+        index.rebuild()
+
+        user_ids, book_ids, weights = self.collect_events()
+        found, vectors = index.unit_vectors(book_ids)
+        # Події книг без контентного вектора не враховуються, як і при інкрементному оновленні
+        users = np.unique(user_ids[found])
+        rows = np.searchsorted(users, user_ids[found])
+
+        objects = []
+        if len(users):
+            # Ваги користувачі x події @ вектори книг подій - усі суми одним добутком
+            weight_matrix = sp.csr_matrix(
+                (weights[found], (rows, np.arange(len(rows)))), shape=(len(users), len(rows))
+            )
+            sums = np.asarray(weight_matrix @ vectors.astype(np.float64))
+            weight_sums = np.asarray(weight_matrix.sum(axis=1)).ravel()
+            counts = np.bincount(rows, minlength=len(users))
+            objects = [
+                UserTasteVector(
+                    user_id=int(user_id), vector_sum=sums[i].tobytes(),
+                    weight_sum=float(weight_sums[i]), count=int(counts[i])
+                )
+                for i, user_id in enumerate(users)
+            ]
+
+        with transaction.atomic():
+            UserTasteVector.objects.all().delete()
+            UserTasteVector.objects.bulk_create(objects, batch_size=options['batch_size'])
+
+        self.stdout.write(f"✅ Збережено смакові вектори для {len(objects)} користувачів ({len(user_ids)} подій)")
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0002_alter_book_author_delete_rating'),
+        ('recommender', '0011_bookview'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookTrending',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='books.book')),
+                ('log_score', models.FloatField(db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0002_alter_book_author_delete_rating'),
+        ('recommender', '0012_booktrending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookCoView',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='coviews', serialize=False, to='books.book')),
+                ('neighbors', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
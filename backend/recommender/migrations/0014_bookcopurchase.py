@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0002_alter_book_author_delete_rating'),
+        ('recommender', '0013_bookcoview'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookCoPurchase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lift', models.FloatField()),
+                ('support', models.PositiveIntegerField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='copurchases', to='books.book')),
+                ('neighbor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='books.book')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['book', '-lift'], name='recommender_book_id_5b4617_idx')],
+                'unique_together': {('book', 'neighbor')},
+            },
+        ),
+    ]
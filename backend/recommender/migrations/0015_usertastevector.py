@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_user_phone_number'),
+        ('recommender', '0014_bookcopurchase'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTasteVector',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='taste_vector', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('vector_sum', models.BinaryField()),
+                ('weight_sum', models.FloatField(default=0)),
+                ('count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
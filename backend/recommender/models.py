@@ -37,4 +37,87 @@ class BookVector(models.Model):
         """Очищає кеш при видаленні"""
         cache_key = f'book_vector_{self.book_id}'
         cache.delete(cache_key)
-        super().delete(*args, **kwargs)
\ No newline at end of file
+        super().delete(*args, **kwargs)
+
+# Зберігає журнал переглядів книг (користувач або анонімна сесія)
+class BookView(models.Model):
+    user = models.ForeignKey(get_user_model(), null=True, blank=True, on_delete=models.CASCADE, related_name='book_views')
+    session_key = models.CharField(max_length=40, blank=True, default='')
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='views')
+    viewed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-viewed_at'], name='bookview_user_recent'),
+            models.Index(fields=['session_key', '-viewed_at'], name='bookview_session_recent'),
+        ]
+
+    def __str__(self):
+        return f"View of book {self.book_id} by {self.user_id or self.session_key}"
+
+
+# Зберігає знімок трендовості книги (логарифм лічильника зі згасанням, див. recommender.trending)
+class BookTrending(models.Model):
+    book = models.OneToOneField(Book, primary_key=True, on_delete=models.CASCADE, related_name='trending')
+    log_score = models.FloatField(db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Trending score for book {self.book_id}"
+
+
+# Зберігає top-K книг, які переглядали в одних сесіях з книгою ("також переглядали")
+class BookCoView(models.Model):
+    # Упакований масив пар (book_id int32, count int32), відсортований за спаданням count
+    COVIEW_DTYPE = np.dtype([('book_id', '<i4'), ('count', '<i4')])
+
+    book = models.OneToOneField(Book, primary_key=True, on_delete=models.CASCADE, related_name='coviews')
+    neighbors = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Also viewed for book {self.book_id}"
+
+    @classmethod
+    def pack(cls, book_ids, counts):
+        neighbors = np.empty(len(book_ids), dtype=cls.COVIEW_DTYPE)
+        neighbors['book_id'] = book_ids
+        neighbors['count'] = counts
+        return neighbors.tobytes()
+
+    @classmethod
+    def unpack(cls, blob):
+        return np.frombuffer(bytes(blob), dtype=cls.COVIEW_DTYPE) if blob else np.empty(0, dtype=cls.COVIEW_DTYPE)
+
+    def get_neighbors(self):
+        return self.unpack(self.neighbors)
+
+
+# Зберігає top-K книг, які купують разом з книгою (lift за завершеними замовленнями)
+class BookCoPurchase(models.Model):
+    book = models.ForeignKey(Book, related_name='copurchases', on_delete=models.CASCADE)
+    neighbor = models.ForeignKey(Book, related_name='+', on_delete=models.CASCADE)
+    lift = models.FloatField()
+    support = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('book', 'neighbor')
+        indexes = [models.Index(fields=['book', '-lift'])]
+
+    def __str__(self):
+        return f'{self.book_id} + {self.neighbor_id} (lift {self.lift:.2f})'
+
+
+# Зберігає смаковий вектор користувача: зважена сума одиничних векторів книг (float64) і лічильники
+class UserTasteVector(models.Model):
+    user = models.OneToOneField(get_user_model(), primary_key=True, on_delete=models.CASCADE, related_name='taste_vector')
+    vector_sum = models.BinaryField()
+    weight_sum = models.FloatField(default=0)
+    count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Taste vector for user {self.user_id} ({self.count} events)"
+
+    def get_vector(self):
+        return np.frombuffer(bytes(self.vector_sum), dtype=np.float64) if self.vector_sum else np.empty(0)
@@ -0,0 +1,221 @@
+"""
+Багатоетапний пайплайн рекомендацій.
+
+Пайплайн - це послідовність етапів над Candidates (NumPy масиви id книг і скорів):
+
+    CandidateGenerator - додає кандидатів (об'єднання з уже знайденими, перший скор виграє)
+    Scorer             - пакетно рахує скори для всіх кандидатів (NaN = кандидат відкидається)
+    Filter             - відкидає кандидатів за булевою маскою
+    Reranker           - переставляє/обрізає кандидатів (наприклад TopN)
+
+Кожен етап замірюється (context.timings, мс) і може кешувати свій результат,
+повернувши ключ з get_cache_key(context). Етап може перервати пайплайн через
+PipelineAbort з готовою відповіддю (new_user, no_data тощо).
+Результат run() - стрічка з feeds.build_feed, доповнена context.meta.
+"""
+import time
+import numpy as np
+from django.core.cache import cache
+from .feeds import FEED_SIZE, build_feed
+from .bitsets import get_exclusion_index
+from books.features import get_feature_store
+
+
+class PipelineAbort(Exception):
+    """Зупиняє пайплайн; view повертає payload як відповідь"""
+
+    def __init__(self, payload, status_code=200):
+        super().__init__(payload.get('message') or payload.get('error') or payload.get('type'))
+        self.payload = payload
+        self.status_code = status_code
+
+
+class Candidates:
+    def __init__(self, book_ids=(), scores=None):
+        self.book_ids = np.asarray(book_ids, dtype=np.int64)
+        self.scores = (
+            np.zeros(len(self.book_ids), dtype=np.float64) if scores is None
+            else np.asarray(scores, dtype=np.float64)
+        )
+
+    def __len__(self):
+        return len(self.book_ids)
+
+    def take(self, index):
+        return Candidates(self.book_ids[index], self.scores[index])
+
+    def union(self, other):
+        """Об'єднання зі збереженням порядку; для дублікатів лишається перший скор"""
+        book_ids = np.concatenate([self.book_ids, other.book_ids])
+        scores = np.concatenate([self.scores, other.scores])
+        _, first = np.unique(book_ids, return_index=True)
+        first.sort()
+        return Candidates(book_ids[first], scores[first])
+
+
+class PipelineContext:
+    def __init__(self, **params):
+        self.params = params   # вхідні параметри запиту
+        self.state = {}        # проміжні дані між етапами
+        self.meta = {}         # потрапляє у стрічку (type, based_on_books, ...)
+        self.timings = {}
+
+
+class Stage:
+    name = None
+    cache_timeout = 3600
+
+    def get_cache_key(self, context):
+        """Ключ кешу результату етапу (None - без кешування)"""
+        return None
+
+    def compute(self, context, candidates):
+        raise NotImplementedError
+
+    def apply(self, candidates, result):
+        return result
+
+    def run(self, context, candidates):
+        cache_key = self.get_cache_key(context)
+        result = cache.get(cache_key) if cache_key else None
+        if result is None:
+            result = self.compute(context, candidates)
+            if cache_key:
+                cache.set(cache_key, result, timeout=self.cache_timeout)
+        return self.apply(candidates, result)
+
+
+class CandidateGenerator(Stage):
+    def generate(self, context):
+        raise NotImplementedError
+
+    def compute(self, context, candidates):
+        return self.generate(context)
+
+    def apply(self, candidates, result):
+        return candidates.union(result)
+
+
+class Scorer(Stage):
+    def score(self, context, book_ids):
+        raise NotImplementedError
+
+    def compute(self, context, candidates):
+        return self.score(context, candidates.book_ids)
+
+    def apply(self, candidates, result):
+        scored = Candidates(candidates.book_ids, result)
+        return scored.take(~np.isnan(scored.scores))
+
+
+class Filter(Stage):
+    def mask(self, context, book_ids):
+        raise NotImplementedError
+
+    def compute(self, context, candidates):
+        return self.mask(context, candidates.book_ids)
+
+    def apply(self, candidates, result):
+        return candidates.take(result)
+
+
+class Reranker(Stage):
+    def rerank(self, context, candidates):
+        raise NotImplementedError
+
+    def compute(self, context, candidates):
+        return self.rerank(context, candidates)
+
+
+class ExcludeBooks(Filter):
+    """Відкидає книги зі списку context.params[param] (наприклад переглянуті)"""
+    name = 'exclude_books'
+
+    def __init__(self, param):
+        self.param = param
+
+    def mask(self, context, book_ids):
+        return ~np.isin(book_ids, list(context.params.get(self.param) or []))
+
+
+class ExclusionFilter(Filter):
+    """
+    Одна бітова маска: доступні книги без взаємодій користувача (context.params['user_id'])
+    і без context.params['viewed_ids']
+    """
+    name = 'exclusion'
+
+    def mask(self, context, book_ids):
+        return get_exclusion_index().mask(
+            book_ids, user_id=context.params.get('user_id'), exclude=context.params.get('viewed_ids')
+        )
+
+
+class FeatureFilter(Filter):
+    """
+    Фільтр за колонками сховища ознак книг (context.params['filters']):
+    genres (будь-який з), min_price, max_price, min_year, max_year
+    """
+    name = 'features'
+
+    def mask(self, context, book_ids):
+        filters = context.params.get('filters') or {}
+        keep = np.ones(len(book_ids), dtype=bool)
+        if not filters:
+            return keep
+        
+        store = get_feature_store()
+        if filters.get('genres'):
+            keep &= store.has_any_genre(book_ids, filters['genres'])
+        if 'min_price' in filters or 'max_price' in filters:
+            # Книги без ціни (NaN) не проходять ціновий фільтр
+            price = store.get('price', book_ids)
+            keep &= price >= filters.get('min_price', -np.inf)
+            keep &= price <= filters.get('max_price', np.inf)
+        if 'min_year' in filters or 'max_year' in filters:
+            year = store.get('year', book_ids)
+            keep &= year >= filters.get('min_year', np.iinfo(np.int32).min)
+            keep &= year <= filters.get('max_year', np.iinfo(np.int32).max)
+        return keep
+
+
+class TopN(Reranker):
+    """Стабільне сортування за спаданням скору і обрізання до n"""
+    name = 'top_n'
+
+    def __init__(self, n=FEED_SIZE):
+        self.n = n
+
+    def rerank(self, context, candidates):
+        context.meta['total_candidates'] = len(candidates)
+        order = np.argsort(-candidates.scores, kind='stable')[:self.n]
+        return candidates.take(order)
+
+
+class Pipeline:
+    def __init__(self, name, stages):
+        self.name = name
+        self.stages = stages
+
+    def run(self, context, cache_key=None, timeout=3600):
+        """Виконує етапи і повертає стрічку; з cache_key кешує готову стрічку"""
+        if cache_key:
+            feed = cache.get(cache_key)
+            if feed is not None:
+                context.meta['cache_used'] = True
+                return feed
+
+        candidates = Candidates()
+        for stage in self.stages:
+            start = time.perf_counter()
+            candidates = stage.run(context, candidates)
+            context.timings[stage.name or type(stage).__name__] = (time.perf_counter() - start) * 1000
+
+        print(f"Pipeline {self.name}: {len(candidates)} candidates, " + ', '.join(
+            f'{name}={elapsed:.1f}ms' for name, elapsed in context.timings.items()
+        ))
+
+        feed = build_feed(candidates.book_ids, candidates.scores, **context.meta)
+        if cache_key:
+            cache.set(cache_key, feed, timeout=timeout)
+        return feed
@@ -1,8 +1,15 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.core.cache import cache
 from .models import BookVector
+from .events import views_flushed
+from .trending import get_trending_counters
+from .coviews import update_coviews
+from .content_index import get_content_index
+from .taste import VIEW_WEIGHT, PURCHASE_WEIGHT, rating_weight, update_taste
 from books.models import Book
+from orders.models import Order, OrderItem
+from ratings.models import Rating
 
 
 @receiver(post_save, sender=BookVector)
@@ -10,6 +17,7 @@ def clear_vector_cache_on_save(sender, instance, **kwargs):
     """Очищає кеш вектора при збереженні"""
     cache_key = f'book_vector_{instance.book_id}'
     cache.delete(cache_key)
+    get_content_index().invalidate()
     
     # Очищаємо кеш рекомендацій
     clear_recommendations_cache()
@@ -21,6 +29,7 @@ def clear_vector_cache_on_delete(sender, instance, **kwargs):
     """Очищає кеш вектора при видаленні"""
     cache_key = f'book_vector_{instance.book_id}'
     cache.delete(cache_key)
+    get_content_index().invalidate()
     
     # Очищаємо кеш рекомендацій
     clear_recommendations_cache()
@@ -36,6 +45,71 @@ def clear_cache_on_book_update(sender, instance, **kwargs):
         print(f"Cleared recommendations cache due to book {instance.id} update")
 
 
+@receiver(views_flushed)
+def count_trending_views(sender, views, **kwargs):
+    """Додає записані перегляди до трендових лічильників (фоновий потік буфера)"""
+    counters = get_trending_counters()
+    counters.record_views(views)
+    counters.maybe_snapshot()
+
+
+@receiver(views_flushed)
+def update_coview_index(sender, views, **kwargs):
+    """Оновлює пари "також переглядали" з записаного пакета (фоновий потік буфера)"""
+    update_coviews(views)
+
+
+@receiver(views_flushed)
+def update_taste_from_views(sender, views, **kwargs):
+    """Перегляди авторизованих користувачів додаються до їхніх смакових векторів (фоновий потік буфера)"""
+    user_views = {}
+    for view in views:
+        if view.user_id is not None:
+            user_views.setdefault(view.user_id, []).append(view.book_id)
+    for user_id, book_ids in user_views.items():
+        update_taste(user_id, book_ids, [VIEW_WEIGHT] * len(book_ids), [1] * len(book_ids), load_index=True)
+
+
+@receiver(post_save, sender=Rating)
+def update_taste_from_rating(sender, instance, created, **kwargs):
+    """Зміна оцінки замінює внесок книги в смаковий вектор (_previous_score - з ratings.signals)"""
+    previous = getattr(instance, '_previous_score', None)
+    weight = rating_weight(instance.score) - (rating_weight(previous) if previous is not None else 0.0)
+    if weight or created:
+        update_taste(instance.user_id, [instance.book_id], [weight], [1 if created else 0])
+
+
+@receiver(post_delete, sender=Rating)
+def remove_rating_from_taste(sender, instance, **kwargs):
+    update_taste(instance.user_id, [instance.book_id], [-rating_weight(instance.score)], [-1], create=False)
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_completion(sender, instance, **kwargs):
+    instance._was_completed = bool(
+        instance.pk and Order.objects.filter(pk=instance.pk, is_completed=True).exists()
+    )
+
+
+@receiver(post_save, sender=Order)
+def record_completed_order(sender, instance, **kwargs):
+    """Покупки рахуються один раз - коли замовлення стає завершеним (тренди і смак)"""
+    if instance.is_completed and not getattr(instance, '_was_completed', False):
+        items = list(instance.items.values_list('book_id', 'quantity'))
+        book_ids = [book_id for book_id, _ in items]
+        get_trending_counters().record_purchases(book_ids, [quantity for _, quantity in items])
+        if book_ids:
+            update_taste(instance.user_id, book_ids, [PURCHASE_WEIGHT] * len(book_ids), [1] * len(book_ids))
+
+
+@receiver(post_save, sender=OrderItem)
+def record_completed_order_item(sender, instance, created, **kwargs):
+    # Позиція, додана до вже завершеного замовлення
+    if created and instance.order.is_completed:
+        get_trending_counters().record_purchases([instance.book_id], [instance.quantity])
+        update_taste(instance.order.user_id, [instance.book_id], [PURCHASE_WEIGHT], [1])
+
+
 def clear_recommendations_cache():
     """Очищає всі кеші рекомендацій"""
     # Отримуємо всі ключі кешу, що починаються з 'content_rec_'
@@ -43,10 +117,14 @@ def clear_recommendations_cache():
     try:
         # Для локального кешу Django
         if hasattr(cache, '_cache'):
-            cache_keys = [key for key in cache._cache.keys() if key.startswith('content_rec_')]
+            cache_keys = [
+                key for key in cache._cache.keys()
+                # LocMemCache зберігає ключі з префіксом версії (":1:")
+                if key.split(':', 2)[-1].startswith(('content_rec_', 'hybrid_rec_'))
+            ]
         
         for key in cache_keys:
-            cache.delete(key)
+            cache.delete(key.split(':', 2)[-1])
             
         print(f"Cleared {len(cache_keys)} recommendation cache entries")
     except Exception as e:
@@ -0,0 +1,78 @@
+"""
+Смакові вектори користувачів для контентних рекомендацій.
+
+UserTasteVector зберігає зважену суму одиничних векторів книг, суму ваг і кількість
+подій. Кожна подія (рейтинг, покупка, перегляд) змінює рядок за O(dims): вектор
+книги береться з ContentIndex, рядок блокується select_for_update і до суми
+додається w * v - без перечитування історії користувача. Напрям суми і є профілем,
+тому рекомендації для авторизованого користувача - один запит до ContentIndex.
+Сигнали запитів (рейтинги, замовлення) не перебудовують скинутий індекс: поки він
+не завантажений, вектори книг події читаються з BookVector напряму, тож жодна
+подія не пропускається і суми не розходяться з історією.
+"""
+import logging
+import numpy as np
+from django.db import transaction
+from .content_index import get_content_index, read_unit_vectors
+from .models import UserTasteVector
+
+
+logger = logging.getLogger(__name__)
+
+VIEW_WEIGHT = 0.5
+PURCHASE_WEIGHT = 2.0
+
+
+def rating_weight(score):
+    """Оцінки 1-2 не додають смаку, 3-5 дають вагу 1-3"""
+    return float(max(score - 2, 0))
+
+
+def update_taste(user_id, book_ids, weights, counts, create=True, load_index=False):
+    """
+    Додає до смакового вектора sum(weights[i] * v(book_ids[i])) і counts.
+    Від'ємні ваги прибирають внесок (видалений рейтинг тощо); create=False не
+    створює рядок (видалення, в тому числі каскадне разом з користувачем).
+    load_index=False - не будувати ContentIndex, якщо його ще немає (шлях запиту):
+    тоді вектори цих книг читаються з BookVector
+    """
+    index = get_content_index()
+    if load_index or index.loaded:
+        found, vectors = index.unit_vectors(book_ids)
+    else:
+        found, vectors = read_unit_vectors(book_ids)
+    if not found.any():
+        return None
+    weights = np.asarray(weights, dtype=np.float64)[found]
+    counts = np.asarray(counts, dtype=np.int64)[found]
+    delta = weights @ vectors.astype(np.float64)
+
+    with transaction.atomic():
+        queryset = UserTasteVector.objects.select_for_update().filter(user_id=user_id)
+        taste = queryset.first()
+        if taste is None:
+            if not create:
+                return None
+            taste = UserTasteVector(user_id=user_id)
+
+        current = taste.get_vector()
+        if current.shape != delta.shape:
+            if len(current):
+                logger.warning("Taste vector of user %s has stale dimensions, resetting", user_id)
+            current = np.zeros_like(delta)
+            taste.weight_sum = 0.0
+            taste.count = 0
+
+        taste.vector_sum = (current + delta).tobytes()
+        taste.weight_sum += float(weights.sum())
+        taste.count += int(counts.sum())
+        taste.save()
+    return taste
+
+
+def get_taste(user_id):
+    """UserTasteVector користувача або None, якщо смак ще порожній"""
+    taste = UserTasteVector.objects.filter(user_id=user_id).first()
+    if taste is None or taste.weight_sum <= 0 or not np.any(taste.get_vector()):
+        return None
+    return taste
@@ -2,10 +2,25 @@ from django.test import TestCase
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from books.models import Book
-from .models import BookVector
+from books.models import Book, Genre
+from .models import BookVector, BookView
+from . import events, trending
+from .models import BookCoView, UserTasteVector
+from .content_index import get_content_index
+from django.core.management import call_command
+from orders.models import Order, OrderItem
+from .pipeline import (
+    Pipeline, PipelineContext, Candidates, CandidateGenerator, ExcludeBooks, ExclusionFilter, TopN
+)
+from django.core.cache import cache
+from .bitsets import get_exclusion_index
+from books.features import Bitset, get_feature_store
+from ratings.models import Rating
+from user_based.interactions import get_interaction_store
 from django.urls import reverse
+import io
 import pickle
+import time
 import numpy as np
 
 User = get_user_model()
@@ -37,4 +52,419 @@ class RecommenderTests(APITestCase):
         data = {'viewed_books': [self.book1.id]}
         response = self.client.post(reverse('get-recommendations'), data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIn('recommendations', response.data)
\ No newline at end of file
+        self.assertIn('recommendations', response.data)
+
+    # Анонімний запит з величезним і від'ємним id у переглядах - звичайна відповідь
+    def test_recommendations_with_out_of_range_viewed_ids(self):
+        self.client.force_authenticate(user=None)
+        data = {'viewed_books': [self.book1.id, 4000000000, -1]}
+        response = self.client.post(reverse('get-recommendations'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn(self.book1.id, [b['id'] for b in response.data['recommendations']])
+
+    # Курсорна пагінація стрічки рекомендацій
+    def test_get_recommendations_pagination(self):
+        genre = Genre.objects.create(name='Fiction')
+        books = [self.book1, self.book2]
+        for i in range(3, 6):
+            book = Book.objects.create(title=f'Book {i}', year=2023, description=f'Description {i}', is_available=True)
+            BookVector.objects.create(book=book, vector=pickle.dumps(np.random.rand(100)))
+            books.append(book)
+        for book in books:
+            book.genres.add(genre)
+
+        received_ids = []
+        data = {'viewed_books': [self.book1.id], 'page_size': 2}
+        while True:
+            response = self.client.post(reverse('get-recommendations'), data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            received_ids.extend(b['id'] for b in response.data['recommendations'])
+            if response.data['next_cursor'] is None:
+                break
+            data['cursor'] = response.data['next_cursor']
+        self.assertEqual(sorted(received_ids), sorted(b.id for b in books[1:]))
+        self.assertTrue(response.data['cache_used'])
+
+    # Фільтр стрічки за ознаками книг
+    def test_get_recommendations_feature_filters(self):
+        fiction = Genre.objects.create(name='Fiction')
+        poetry = Genre.objects.create(name='Poetry')
+        book3 = Book.objects.create(title='Book 3', year=2023, description='Description 3', is_available=True)
+        BookVector.objects.create(book=book3, vector=pickle.dumps(np.random.rand(100)))
+        self.book1.genres.add(fiction)
+        self.book2.genres.add(fiction)
+        book3.genres.add(fiction, poetry)
+
+        data = {'viewed_books': [self.book1.id], 'filters': {'genres': [poetry.id]}}
+        response = self.client.post(reverse('get-recommendations'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([b['id'] for b in response.data['recommendations']], [book3.id])
+
+        data['filters'] = {'color': 'red'}
+        response = self.client.post(reverse('get-recommendations'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    # Некоректний курсор
+    def test_get_recommendations_invalid_cursor(self):
+        data = {'viewed_books': [self.book1.id], 'cursor': '!!!'}
+        response = self.client.post(reverse('get-recommendations'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    # Гібридні рекомендації для гостя (лише контентна частина)
+    def test_get_hybrid_recommendations_success(self):
+        genre = Genre.objects.create(name='Fiction')
+        self.book1.genres.add(genre)
+        self.book2.genres.add(genre)
+        data = {'viewed_books': [self.book1.id], 'weights': {'content': 0.7, 'collaborative': 0.3}}
+        response = self.client.post(reverse('hybrid-recommendations'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['type'], 'hybrid')
+        self.assertEqual([b['id'] for b in response.data['recommendations']], [self.book2.id])
+        self.assertIn('hybrid_score', response.data['recommendations'][0])
+
+    # Оцінка користувача скидає його закешовану гібридну стрічку, оцінені книги відкидаються
+    def test_hybrid_recommendations_follow_user_ratings(self):
+        genre = Genre.objects.create(name='Fiction')
+        self.book1.genres.add(genre)
+        self.book2.genres.add(genre)
+        data = {'viewed_books': [self.book1.id]}
+        url = reverse('hybrid-recommendations')
+        self.assertEqual([b['id'] for b in self.client.post(url, data, format='json').data['recommendations']], [self.book2.id])
+
+        Rating.objects.create(book=self.book2, user=self.user, score=5)
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['recommendations'], [])
+
+    # Некоректні ваги
+    def test_get_hybrid_recommendations_invalid_weights(self):
+        data = {'viewed_books': [self.book1.id], 'weights': {'content': -1}}
+        response = self.client.post(reverse('hybrid-recommendations'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+    # viewed_books не списком цілих id - 400 замість 500
+    def test_invalid_viewed_books(self):
+        for viewed_books in [None, 5, 'abc', {'id': 1}, [self.book1.id, 'x'], [None], [True], [2 ** 70]]:
+            response = self.client.post(
+                reverse('hybrid-recommendations'), {'viewed_books': viewed_books}, format='json'
+            )
+            expected = status.HTTP_200_OK if viewed_books is None else status.HTTP_400_BAD_REQUEST
+            self.assertEqual(response.status_code, expected, viewed_books)
+        response = self.client.post(reverse('get-recommendations'), {'viewed_books': 5}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class StaticCandidates(CandidateGenerator):
+    name = 'static'
+
+    def __init__(self, book_ids, scores, cache_key=None):
+        self.book_ids, self.scores, self.cache_key = book_ids, scores, cache_key
+        self.calls = 0
+
+    def get_cache_key(self, context):
+        return self.cache_key
+
+    def generate(self, context):
+        self.calls += 1
+        return Candidates(self.book_ids, self.scores)
+
+
+class PipelineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.books = [
+            Book.objects.create(title=f'Book {i}', year=2023, description='Description', is_available=i != 2)
+            for i in range(4)
+        ]
+
+    # Об'єднання генераторів, фільтри та TopN
+    def test_pipeline_stages(self):
+        ids = [book.id for book in self.books]
+        pipeline = Pipeline('test', [
+            StaticCandidates(ids[:3], [0.1, 0.9, 0.8]),
+            StaticCandidates(ids[1:], [0.0, 0.0, 0.5]),
+            ExcludeBooks('viewed_ids'),
+            ExclusionFilter(),
+            TopN(2),
+        ])
+        context = PipelineContext(viewed_ids=[ids[0]])
+        feed = pipeline.run(context)
+        self.assertEqual(feed['book_ids'].tolist(), [ids[1], ids[3]])
+        self.assertEqual(feed['total_candidates'], 2)
+        self.assertEqual(set(context.timings), {'static', 'exclude_books', 'exclusion', 'top_n'})
+
+    # Кешування результату етапу
+    def test_stage_cache(self):
+        generator = StaticCandidates([self.books[0].id], [1.0], cache_key='pipeline_test_stage')
+        pipeline = Pipeline('test', [generator, TopN()])
+        pipeline.run(PipelineContext())
+        feed = pipeline.run(PipelineContext())
+        self.assertEqual(generator.calls, 1)
+        self.assertEqual(feed['book_ids'].tolist(), [self.books[0].id])
+
+
+class ExclusionBitsetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='bitset@example.com', password='testpass123', name='Bitset User')
+        self.books = [
+            Book.objects.create(title=f'Book {i}', year=2023, description='Description', is_available=True)
+            for i in range(3)
+        ]
+        get_interaction_store().invalidate()
+        get_exclusion_index().invalidate()
+        get_feature_store().invalidate()
+
+    def tearDown(self):
+        get_interaction_store().invalidate()
+
+    # Операції над бітовою множиною
+    def test_bitset(self):
+        bitset = Bitset([1, 9, 1000])
+        self.assertEqual(bitset.contains([0, 1, 9, 1000, 5000, -1]).tolist(), [False, True, True, True, False, False])
+        bitset.discard([9, 7000])
+        self.assertEqual(len(bitset), 2)
+
+    # Маска оновлюється сигналами книг і взаємодій
+    def test_mask_follows_signals(self):
+        index = get_exclusion_index()
+        ids = [book.id for book in self.books]
+        self.assertEqual(index.mask(ids, user_id=self.user.id).tolist(), [True, True, True])
+
+        self.books[0].is_available = False
+        self.books[0].save()
+        Rating.objects.create(book=self.books[1], user=self.user, score=5)
+        self.assertEqual(index.mask(ids, user_id=self.user.id).tolist(), [False, False, True])
+        self.assertEqual(index.mask(ids, exclude=[ids[2]]).tolist(), [False, True, False])
+
+    # Величезні та від'ємні id клієнта не роздувають пам'ять і не дають помилки
+    def test_mask_with_out_of_range_exclude(self):
+        ids = [book.id for book in self.books]
+        mask = get_exclusion_index().mask(ids, exclude=[ids[0], 4000000000, -5])
+        self.assertEqual(mask.tolist(), [False, True, True])
+
+
+class BookViewLogTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='views@example.com', password='testpass123', name='Views User')
+        self.books = [
+            Book.objects.create(title=f'Book {i}', year=2023, description='Description', is_available=True)
+            for i in range(3)
+        ]
+        for book in self.books:
+            BookVector.objects.create(book=book, vector=pickle.dumps(np.random.rand(100)))
+        get_feature_store().invalidate()
+        # Синхронний буфер без фонового потоку - запис лише через flush()
+        self.original_buffer = events._buffer
+        events._buffer = events.ViewBuffer(background=False)
+
+    def tearDown(self):
+        events._buffer = self.original_buffer
+
+    # Перегляди буферизуються і пишуться пакетно, але одразу видні в останніх переглядах
+    def test_track_view_is_buffered(self):
+        for book in [self.books[0], self.books[1], self.books[0]]:
+            response = self.client.post(reverse('track-book-view'), {'book_id': book.id, 'session_id': 'abc'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(BookView.objects.count(), 0)
+        self.assertEqual(events.get_recent_book_ids(session_key='abc'), [self.books[1].id, self.books[0].id])
+
+        self.assertEqual(events.get_view_buffer().flush(), 3)
+        self.assertEqual(BookView.objects.filter(session_key='abc').count(), 3)
+        self.assertEqual(events.get_recent_book_ids(session_key='abc'), [self.books[1].id, self.books[0].id])
+
+        response = self.client.post(reverse('track-book-view'), {'book_id': 99999})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    # Без viewed_books рекомендації анонімної сесії будуються за переглядами з журналу
+    def test_recommendations_use_server_side_views(self):
+        self.client.post(reverse('track-book-view'), {'book_id': self.books[0].id, 'session_id': 'abc'})
+        events.get_view_buffer().flush()
+
+        response = self.client.post(reverse('get-recommendations'), {'session_id': 'abc'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['based_on_books'], [self.books[0].id])
+        self.assertEqual(BookView.objects.get().session_key, 'abc')
+
+
+class TrendingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='trending@example.com', password='testpass123', name='Trending User')
+        self.books = [
+            Book.objects.create(title=f'Book {i}', year=2023, description='Description', is_available=True)
+            for i in range(3)
+        ]
+        get_feature_store().invalidate()
+        cache.delete(trending.TRENDING_CACHE_KEY)
+        self.original_buffer, self.original_counters = events._buffer, trending._counters
+        events._buffer = events.ViewBuffer(background=False)
+        trending._counters = trending.TrendingCounters(background=False)
+
+    def tearDown(self):
+        events._buffer, trending._counters = self.original_buffer, self.original_counters
+        cache.delete(trending.TRENDING_CACHE_KEY)
+
+    # Покупки без жодного перегляду зливаються у знімок за розкладом лічильників
+    def test_purchases_snapshot_without_views(self):
+        counters = trending.get_trending_counters()
+        counters.record_purchases([self.books[1].id], [2])
+        counters.maybe_snapshot()
+        self.assertFalse(trending.BookTrending.objects.exists())
+
+        counters.snapshot_at -= trending.SNAPSHOT_INTERVAL
+        counters.maybe_snapshot()
+        self.assertEqual(list(trending.BookTrending.objects.values_list('book_id', flat=True)), [self.books[1].id])
+        self.assertFalse(counters.has_pending())
+
+    # Перегляди і завершені замовлення потрапляють у знімок і стрічку трендів
+    def test_trending_from_views_and_orders(self):
+        for book in [self.books[0]] * 3 + [self.books[1]]:
+            self.client.post(reverse('track-book-view'), {'book_id': book.id, 'session_id': 'abc'})
+        events.get_view_buffer().flush()
+
+        order = Order.objects.create(
+            user=self.user, contact_name='Trending', contact_email='trending@example.com',
+            total_amount=10.00, delivery_address='Address', payment_method='cash'
+        )
+        OrderItem.objects.create(order=order, book=self.books[2], quantity=1, unit_price=10.00)
+        order.is_completed = True
+        order.save()
+        # Повторне збереження завершеного замовлення не рахує покупку вдруге
+        order.save()
+        trending.get_trending_counters().snapshot()
+
+        response = self.client.get(reverse('trending-books'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([b['id'] for b in results], [self.books[2].id, self.books[0].id, self.books[1].id])
+        self.assertAlmostEqual(results[0]['trending_score'], trending.PURCHASE_WEIGHT, places=2)
+        self.assertAlmostEqual(results[1]['trending_score'], 3 * trending.VIEW_WEIGHT, places=2)
+
+    # Вага згасає вдвічі за період напіврозпаду, знімки додаються
+    def test_decay_and_merge(self):
+        counters = trending.get_trending_counters()
+        now = time.time()
+        counters.record([self.books[0].id], [now - trending.HALF_LIFE], 2.0)
+        counters.snapshot()
+        counters.record([self.books[0].id], [now], 1.0)
+        counters.snapshot()
+
+        log_score = trending.BookTrending.objects.get(book=self.books[0]).log_score
+        self.assertAlmostEqual(float(trending.current_score([log_score])[0]), 2.0, places=2)
+
+
+class CoViewTests(APITestCase):
+    def setUp(self):
+        self.books = [
+            Book.objects.create(title=f'Book {i}', year=2023, description='Description', is_available=True)
+            for i in range(3)
+        ]
+        get_feature_store().invalidate()
+        self.original_buffer = events._buffer
+        events._buffer = events.ViewBuffer(background=False)
+
+    def tearDown(self):
+        events._buffer = self.original_buffer
+
+    def view(self, session_id, *books):
+        for book in books:
+            self.client.post(reverse('track-book-view'), {'book_id': book.id, 'session_id': session_id})
+        events.get_view_buffer().flush()
+
+    def neighbors(self, book):
+        return BookCoView.objects.get(book=book).get_neighbors().tolist()
+
+    # Пари рахуються один раз на сесію і оновлюються з кожного пакета
+    def test_incremental_coviews(self):
+        self.view('a', self.books[0], self.books[1])
+        self.view('a', self.books[1])
+        self.view('b', self.books[0], self.books[1], self.books[2])
+        self.assertEqual(self.neighbors(self.books[0]), [(self.books[1].id, 2), (self.books[2].id, 1)])
+        self.assertEqual(self.neighbors(self.books[2]), [(self.books[0].id, 1), (self.books[1].id, 1)])
+
+        response = self.client.get(reverse('also-viewed-books', args=[self.books[0].id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([b['id'] for b in response.data['results']], [self.books[1].id, self.books[2].id])
+        self.assertEqual(response.data['results'][0]['coview_count'], 2)
+
+    # Перебудова з нуля дає ті самі лічильники, що й інкрементне оновлення
+    def test_rebuild_matches_incremental(self):
+        self.view('a', self.books[0], self.books[1])
+        self.view('b', self.books[0], self.books[1], self.books[2])
+        incremental = {book.id: self.neighbors(book) for book in self.books}
+
+        # Усі перегляди в межах одного вікна сесії, щоб не залежати від поточного часу
+        BookView.objects.update(viewed_at=BookView.objects.earliest('viewed_at').viewed_at)
+        BookCoView.objects.all().delete()
+        call_command('rebuild_coviews', stdout=io.StringIO())
+        self.assertEqual({book.id: self.neighbors(book) for book in self.books}, incremental)
+
+
+class TasteVectorTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='taste@example.com', password='testpass123', name='Taste User')
+        self.books = [
+            Book.objects.create(title=f'Book {i}', year=2023, description='Description', is_available=True)
+            for i in range(3)
+        ]
+        # b0 і b1 майже співнапрямлені, b2 ортогональна b0
+        vectors = [np.array([1.0, 0.0, 0.0]), np.array([1.0, 0.2, 0.0]), np.array([0.0, 1.0, 0.0])]
+        for book, vector in zip(self.books, vectors):
+            BookVector.objects.create(book=book, vector=pickle.dumps(vector))
+        get_content_index().invalidate()
+        get_content_index().ensure_loaded()
+        get_feature_store().invalidate()
+        get_interaction_store().invalidate()
+        get_exclusion_index().invalidate()
+
+    def tearDown(self):
+        get_interaction_store().invalidate()
+
+    # Оцінка, додана з завантаженим індексом і видалена без нього, повністю прибирається зі смаку
+    def test_taste_without_loaded_index(self):
+        rating = Rating.objects.create(book=self.books[0], user=self.user, score=5)
+        self.assertTrue(np.allclose(UserTasteVector.objects.get(user=self.user).get_vector(), [3.0, 0.0, 0.0]))
+
+        get_content_index().invalidate()
+        rating.delete()
+        taste = UserTasteVector.objects.get(user=self.user)
+        self.assertTrue(np.allclose(taste.get_vector(), 0.0))
+        self.assertEqual((taste.weight_sum, taste.count), (0.0, 0))
+        # Вектор книги прочитано з БД, індекс не перебудовувався
+        self.assertFalse(get_content_index().loaded)
+
+        Rating.objects.create(book=self.books[1], user=self.user, score=4)
+        expected = 2 * np.array([1.0, 0.2, 0.0]) / np.linalg.norm([1.0, 0.2, 0.0])
+        self.assertTrue(np.allclose(UserTasteVector.objects.get(user=self.user).get_vector(), expected))
+
+    # Рейтинг додає, змінює і прибирає внесок книги за O(dims)
+    def test_taste_follows_ratings(self):
+        rating = Rating.objects.create(book=self.books[0], user=self.user, score=5)
+        taste = UserTasteVector.objects.get(user=self.user)
+        self.assertTrue(np.allclose(taste.get_vector(), [3.0, 0.0, 0.0]))
+        self.assertEqual(taste.count, 1)
+
+        rating.score = 4
+        rating.save()
+        self.assertTrue(np.allclose(UserTasteVector.objects.get(user=self.user).get_vector(), [2.0, 0.0, 0.0]))
+
+        rating.delete()
+        taste = UserTasteVector.objects.get(user=self.user)
+        self.assertTrue(np.allclose(taste.get_vector(), 0.0))
+        self.assertEqual((taste.weight_sum, taste.count), (0.0, 0))
+
+        # Перерахунок з нуля дає той самий вектор, що й інкрементні оновлення
+        Rating.objects.create(book=self.books[1], user=self.user, score=3)
+        incremental = UserTasteVector.objects.get(user=self.user).get_vector().copy()
+        call_command('rebuild_taste_vectors', stdout=io.StringIO())
+        self.assertTrue(np.allclose(UserTasteVector.objects.get(user=self.user).get_vector(), incremental))
+
+    # Авторизований користувач отримує рекомендації за смаковим вектором
+    def test_recommendations_from_taste(self):
+        Rating.objects.create(book=self.books[0], user=self.user, score=5)
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.post(reverse('get-recommendations'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['type'], 'taste')
+        # Оцінена книга виключається, найближча до смаку - перша
+        self.assertEqual([b['id'] for b in response.data['recommendations']], [self.books[1].id, self.books[2].id])
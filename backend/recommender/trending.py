@@ -0,0 +1,195 @@
+"""
+Трендові книги: перегляди і покупки з експоненційним згасанням.
+
+Кожна подія додає вагу (VIEW_WEIGHT за перегляд, PURCHASE_WEIGHT за примірник
+у завершеному замовленні), яка згасає вдвічі за HALF_LIFE. Замість множення всіх
+лічильників на коефіцієнт згасання (forward decay) зберігається
+    log_score = ln(sum(w * exp(DECAY_RATE * (t - EPOCH))))
+відносно фіксованої епохи. Поточна трендовість exp(log_score - DECAY_RATE * (now - EPOCH))
+для всіх книг ділиться на той самий множник, тож порядок за log_score (індекс у БД) -
+це поточний рейтинг, а злиття лічильників - logaddexp.
+
+Процес накопичує свої події в NumPy масиві delta без запитів до БД і раз на
+SNAPSHOT_INTERVAL зливає їх у BookTrending (знімки з усіх процесів додаються).
+Знімок робить власний фоновий потік лічильників, тож покупки і оцінки без
+переглядів теж потрапляють у БД; при зупинці процесу залишок зливається в atexit.
+Після знімка top книг перечитується одним індексованим запитом і кладеться
+в кеш як стрічка (feeds.build_feed) - ендпоінт лише ріже її за курсором.
+"""
+import atexit
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+import numpy as np
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from books.features import get_feature_store
+from .events import get_view_buffer
+from .feeds import FEED_SIZE, build_feed
+from .models import BookTrending
+
+
+HALF_LIFE = 24 * 3600
+DECAY_RATE = math.log(2) / HALF_LIFE
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc).timestamp()
+
+VIEW_WEIGHT = 1.0
+PURCHASE_WEIGHT = 5.0
+
+SNAPSHOT_INTERVAL = 300
+# Книги, чия трендовість згасла нижче порогу, видаляються зі знімка
+MIN_SCORE = 0.01
+TRENDING_CACHE_KEY = 'trending_books'
+
+
+def current_score(log_scores, now=None):
+    """log_score -> поточна трендовість (сума ваг зі згасанням)"""
+    now = time.time() if now is None else now
+    return np.exp(np.asarray(log_scores, dtype=np.float64) - DECAY_RATE * (now - EPOCH))
+
+
+class TrendingCounters:
+    def __init__(self, background=True):
+        self.background = background
+        self._thread = None
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        # delta[book_id] - сума ваг подій, приведених до base_time
+        self.delta = np.zeros(0, dtype=np.float64)
+        self.base_time = time.time()
+        self.snapshot_at = time.monotonic()
+
+    def record(self, book_ids, timestamps, weights):
+        book_ids = np.asarray(book_ids, dtype=np.int64)
+        if not len(book_ids):
+            return
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        weights = np.broadcast_to(np.asarray(weights, dtype=np.float64), book_ids.shape)
+        with self._lock:
+            if book_ids.max() >= len(self.delta):
+                grown = np.zeros(max(int(book_ids.max()) + 1, len(self.delta) + len(self.delta) // 4), dtype=np.float64)
+                grown[:len(self.delta)] = self.delta
+                self.delta = grown
+            np.add.at(self.delta, book_ids, weights * np.exp(DECAY_RATE * (timestamps - self.base_time)))
+        if self.background:
+            self._ensure_thread()
+
+    def record_views(self, views):
+        self.record(
+            [view.book_id for view in views], [view.viewed_at.timestamp() for view in views], VIEW_WEIGHT
+        )
+
+    def record_purchases(self, book_ids, quantities, at=None):
+        at = time.time() if at is None else at
+        self.record(book_ids, np.full(len(book_ids), at), PURCHASE_WEIGHT * np.asarray(quantities, dtype=np.float64))
+
+    # --- Знімок у БД ---
+
+    def has_pending(self):
+        with self._lock:
+            return bool(self.delta.any())
+
+    def maybe_snapshot(self):
+        if self.has_pending() and time.monotonic() - self.snapshot_at >= SNAPSHOT_INTERVAL:
+            self.snapshot()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='trending-snapshot', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            # Прокидаємось до наступного знімка (maybe_snapshot з потоку переглядів міг його зрушити)
+            time.sleep(max(SNAPSHOT_INTERVAL - (time.monotonic() - self.snapshot_at), 1))
+            close_old_connections()
+            try:
+                self.maybe_snapshot()
+            except Exception as e:
+                print(f"Error in trending snapshot thread: {e}")
+
+    def snapshot(self):
+        """Зливає накопичені події в BookTrending і оновлює закешований top"""
+        if not self._snapshot_lock.acquire(blocking=False):
+            return None
+        try:
+            with self._lock:
+                delta, base_time = self.delta, self.base_time
+                self.delta = np.zeros(len(delta), dtype=np.float64)
+                self.base_time = time.time()
+                self.snapshot_at = time.monotonic()
+
+            book_ids = np.flatnonzero(delta)
+            # Книги, видалені після події, пропускаємо
+            book_ids = book_ids[get_feature_store().get('exists', book_ids)]
+            try:
+                if len(book_ids):
+                    self.merge(book_ids, np.log(delta[book_ids]) + DECAY_RATE * (base_time - EPOCH))
+                BookTrending.objects.filter(
+                    log_score__lt=math.log(MIN_SCORE) + DECAY_RATE * (time.time() - EPOCH)
+                ).delete()
+            except Exception as e:
+                print(f"Error saving trending snapshot: {e}")
+                # Повертаємо події, щоб злити їх наступним знімком
+                self.record(book_ids, np.full(len(book_ids), base_time), delta[book_ids])
+                return None
+            return refresh_trending_feed()
+        finally:
+            self._snapshot_lock.release()
+
+    @staticmethod
+    def merge(book_ids, log_scores):
+        with transaction.atomic():
+            existing = dict(
+                BookTrending.objects.select_for_update()
+                .filter(book_id__in=book_ids.tolist()).values_list('book_id', 'log_score')
+            )
+            BookTrending.objects.bulk_create(
+                [
+                    BookTrending(book_id=int(book_id), log_score=float(np.logaddexp(log_score, existing.get(book_id, -np.inf))))
+                    for book_id, log_score in zip(book_ids.tolist(), log_scores)
+                ],
+                update_conflicts=True,
+                unique_fields=['book'],
+                update_fields=['log_score', 'updated_at'],
+            )
+
+
+_counters = TrendingCounters()
+
+
+def _snapshot_at_exit():
+    # Спершу дописуємо буфер переглядів, щоб його події теж потрапили в знімок
+    get_view_buffer().flush()
+    if _counters.has_pending():
+        _counters.snapshot()
+
+
+atexit.register(_snapshot_at_exit)
+
+
+def get_trending_counters():
+    return _counters
+
+
+def refresh_trending_feed():
+    """Перечитує top FEED_SIZE доступних книг зі знімка і кешує стрічку"""
+    rows = list(
+        BookTrending.objects.filter(book__is_available=True)
+        .order_by('-log_score').values_list('book_id', 'log_score')[:FEED_SIZE]
+    )
+    book_ids = [book_id for book_id, _ in rows]
+    feed = build_feed(np.array(book_ids, dtype=np.int64), current_score([score for _, score in rows]))
+    cache.set(TRENDING_CACHE_KEY, feed, timeout=SNAPSHOT_INTERVAL * 2)
+    return feed
+
+
+def get_trending_feed():
+    feed = cache.get(TRENDING_CACHE_KEY)
+    if feed is None:
+        feed = refresh_trending_feed()
+    return feed
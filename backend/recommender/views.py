@@ -5,12 +5,34 @@ from rest_framework import status
 from books.models import Book
 from books.serializers import BookCatalogSerializer
 from .models import BookVector
+from user_based.views import get_collaborative_scores, get_user_feed_generation
+from .feeds import CANDIDATE_OVERFETCH, FEED_SIZE, FEED_PAGE_SIZE, InvalidCursor, decode_cursor, parse_page_size, get_feed_page, fetch_available_books
+from .pipeline import (
+    Pipeline, PipelineContext, PipelineAbort, Candidates, CandidateGenerator, Scorer,
+    ExclusionFilter, FeatureFilter, TopN
+)
+from .bitsets import get_exclusion_index
+from .events import get_view_buffer, get_recent_book_ids
+from .trending import get_trending_feed
+from .coviews import get_also_viewed
+from .content_index import get_content_index
+from .taste import get_taste
+from books.features import get_feature_store
 import numpy as np
 import pickle
 from django.db.models import Q
 from sklearn.metrics.pairwise import cosine_similarity
 from django.core.cache import cache
 import hashlib
+import json
+
+
+# Скільки книг "також переглядали" віддавати за замовчуванням і максимум
+ALSO_VIEWED_SIZE = 8
+ALSO_VIEWED_MAX_SIZE = 50
+
+# Ваги змішування за замовчуванням для гібридних рекомендацій
+DEFAULT_HYBRID_WEIGHTS = {'content': 0.5, 'collaborative': 0.5}
 
 
 def get_cached_vectors(book_ids):
@@ -49,15 +71,223 @@ def get_books_genres(book_ids):
     ).prefetch_related('genres').values_list('genres', flat=True).distinct()
 
 
+def build_user_profile(viewed_vectors_dict):
+    """Створює профіль користувача з векторів переглянутих книг"""
+    viewed_vectors = list(viewed_vectors_dict.values())
+    if len(viewed_vectors) == 1:
+        # Якщо тільки одна книга переглянута
+        print(f"Created user profile from single book vector")
+        return viewed_vectors[0]
+    
+    # Усереднюємо вектори кількох книг
+    print(f"Created user profile from {len(viewed_vectors)} book vectors")
+    return np.mean(viewed_vectors, axis=0)
+
+
+def get_candidate_book_ids(viewed_book_ids):
+    """
+    Відбирає id кандидатів за жанрами переглянутих книг. Недоступні та переглянуті
+    книги відсіюються бітовою маскою замість JOIN/NOT IN, тому беремо із запасом
+    """
+    viewed_genres = get_books_genres(viewed_book_ids)
+    
+    if viewed_genres:
+        print(f"Filtering by genres: {list(viewed_genres)}")
+        queryset = BookVector.objects.filter(book__genres__in=viewed_genres).distinct()
+        limit = 150
+    else:
+        # Якщо жанри не знайдені, беремо всі книги
+        print("No genres found, using all available books")
+        queryset = BookVector.objects.all()
+        limit = 100
+    
+    book_ids = np.array(
+        list(queryset.values_list('book_id', flat=True)[:limit * CANDIDATE_OVERFETCH]), dtype=np.int64
+    )
+    keep = get_exclusion_index().mask(book_ids, exclude=viewed_book_ids)
+    return book_ids[keep][:limit]
+
+
+class GenreCandidates(CandidateGenerator):
+    """Кандидати за жанрами переглянутих книг (кешуються для набору переглядів)"""
+    name = 'genre_candidates'
+
+    def get_cache_key(self, context):
+        viewed_key = '_'.join(sorted(map(str, context.params['viewed_ids'])))
+        return f'content_rec_candidates_{hashlib.md5(viewed_key.encode()).hexdigest()}'
+
+    def generate(self, context):
+        candidate_ids = get_candidate_book_ids(context.params['viewed_ids'])
+        print(f"Found {len(candidate_ids)} candidate books after genre filtering")
+        return Candidates(candidate_ids)
+
+
+class ContentSimilarityScorer(Scorer):
+    """Косинусна подібність кандидатів до профілю переглядів однією матричною операцією"""
+    name = 'content_similarity'
+
+    def score(self, context, book_ids):
+        # Отримуємо вектори переглянутих книг з кешу
+        viewed_vectors_dict = get_cached_vectors(context.params['viewed_ids'])
+        if not viewed_vectors_dict:
+            print("No vectors found for viewed books")
+            raise PipelineAbort({'recommendations': []})
+        context.meta['based_on_books'] = list(viewed_vectors_dict.keys())
+        
+        # Створюємо профіль користувача
+        user_profile = build_user_profile(viewed_vectors_dict)
+        
+        # Кандидати без вектора відкидаються (NaN)
+        scores = np.full(len(book_ids), np.nan)
+        candidate_vectors_dict = get_cached_vectors(book_ids.tolist())
+        rows = [i for i, book_id in enumerate(book_ids.tolist()) if book_id in candidate_vectors_dict]
+        if rows:
+            matrix = np.array([candidate_vectors_dict[int(book_ids[i])] for i in rows])
+            scores[rows] = cosine_similarity([user_profile], matrix)[0]
+        return scores
+
+
+# Кандидати кешуються, тому доступність перевіряється маскою після генератора
+CONTENT_PIPELINE = Pipeline('content', [
+    GenreCandidates(), ExclusionFilter(), FeatureFilter(), ContentSimilarityScorer(), TopN(FEED_SIZE)
+])
+
+
+class TasteCandidates(CandidateGenerator):
+    """Найближчі до смакового вектора користувача книги - один запит до індексу векторів"""
+    name = 'taste_candidates'
+
+    def generate(self, context):
+        book_ids, scores = get_content_index().search(
+            context.params['taste'].get_vector(), FEED_SIZE * CANDIDATE_OVERFETCH
+        )
+        return Candidates(book_ids, scores)
+
+
+TASTE_PIPELINE = Pipeline('taste', [TasteCandidates(), ExclusionFilter(), FeatureFilter(), TopN(FEED_SIZE)])
+
+
+def parse_viewed_books(data):
+    """
+    viewed_books з тіла запиту -> список унікальних id книг; None, якщо поле не
+    передано. Не список або не цілі id - ValueError
+    """
+    if 'viewed_books' not in data:
+        return None
+    raw = data.getlist('viewed_books') if hasattr(data, 'getlist') else data['viewed_books']
+    if raw is None:
+        return None
+    if not isinstance(raw, list):
+        raise ValueError('expected a list of book ids')
+    book_ids = []
+    for value in raw:
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError(f'{value!r} is not a book id')
+        book_id = int(value)
+        # id поза int64 не вміщуються в масиви id книг
+        if not -2 ** 63 <= book_id < 2 ** 63:
+            raise ValueError(f'{value!r} is not a book id')
+        book_ids.append(book_id)
+    return list(dict.fromkeys(book_ids))
+
+
+def parse_feature_filters(raw_filters):
+    """Перевіряє фільтри за ознаками книг: genres, min_price, max_price, min_year, max_year"""
+    if not raw_filters:
+        return {}
+    if not isinstance(raw_filters, dict):
+        raise ValueError('filters must be an object')
+    
+    filters = {}
+    for key, value in raw_filters.items():
+        if key == 'genres':
+            filters['genres'] = sorted(int(genre_id) for genre_id in value)
+        elif key in ('min_price', 'max_price'):
+            filters[key] = float(value)
+        elif key in ('min_year', 'max_year'):
+            filters[key] = int(value)
+        else:
+            raise ValueError(f'Unknown filter "{key}"')
+    return filters
+
+
+def get_view_owner(request, create_session=False):
+    """
+    (user_id, session_key) для журналу переглядів: авторизований користувач або
+    анонімна сесія (session_id з тіла запиту, інакше cookie-сесія Django)
+    """
+    if request.user.is_authenticated:
+        return request.user.id, ''
+    
+    session_key = request.data.get('session_id') or request.session.session_key
+    if not session_key and create_session:
+        request.session.save()
+        session_key = request.session.session_key
+    return None, str(session_key or '')[:40]
+
+
+def get_taste_recommendations(request, taste, viewed_ids, offset, page_size, filters):
+    """
+    Стрічка за смаковим вектором користувача. Ключ кешу містить updated_at вектора,
+    тож кожна нова подія користувача дає нову стрічку
+    """
+    taste_key = json.dumps([taste.user_id, taste.updated_at.isoformat(), sorted(viewed_ids), filters], sort_keys=True)
+    cache_key = f'content_rec_taste_{hashlib.md5(taste_key.encode()).hexdigest()}'
+    
+    context = PipelineContext(taste=taste, user_id=taste.user_id, viewed_ids=viewed_ids, filters=filters)
+    feed = TASTE_PIPELINE.run(context, cache_key=cache_key)
+    page_ids, _, next_cursor = get_feed_page(feed, offset, page_size)
+    
+    serializer = BookCatalogSerializer(
+        fetch_available_books(page_ids),
+        many=True,
+        context={'request': request}
+    )
+    return Response({
+        'recommendations': serializer.data,
+        'total_candidates': feed['total_candidates'],
+        'taste_events': taste.count,
+        'type': 'taste',
+        'cache_used': context.meta.get('cache_used', False),
+        'next_cursor': next_cursor
+    })
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def get_recommendations(request):
     """
     Генерує рекомендації на основі переглянутих книг з оптимізаціями
-    Працює з першої переглянутої книги
+    Працює з першої переглянутої книги. Без viewed_books бере останні перегляди
+    користувача або сесії з журналу переглядів. Для авторизованих користувачів
+    з рейтингами, покупками чи переглядами - за смаковим вектором
     """
     try:
-        viewed_book_ids = request.data.get('viewed_books', [])
+        try:
+            offset = decode_cursor(request.data.get('cursor'))
+            page_size = parse_page_size(request.data.get('page_size'))
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            filters = parse_feature_filters(request.data.get('filters'))
+        except (TypeError, ValueError) as e:
+            return Response({'error': f'Invalid filters: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            viewed_book_ids = parse_viewed_books(request.data)
+        except ValueError as e:
+            return Response({'error': f'Invalid viewed_books: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Авторизовані користувачі з накопиченим смаком - за смаковим вектором
+        if request.user.is_authenticated:
+            taste = get_taste(request.user.id)
+            if taste is not None:
+                return get_taste_recommendations(request, taste, viewed_book_ids or [], offset, page_size, filters)
+        
+        if viewed_book_ids is None:
+            user_id, session_key = get_view_owner(request)
+            viewed_book_ids = get_recent_book_ids(user_id, session_key)
         
         # Перевіряємо чи є хоча б одна переглянута книга
         if not viewed_book_ids:
@@ -66,95 +296,26 @@ def get_recommendations(request):
         # Видаляємо дублікати і беремо останні 5 (або менше)
         unique_viewed_ids = list(dict.fromkeys(viewed_book_ids))[-5:]
         
-        # Створюємо ключ кешу для результатів рекомендацій
+        # Створюємо ключ кешу для ранжованої стрічки рекомендацій
         viewed_key = '_'.join(sorted(map(str, unique_viewed_ids)))
+        if filters:
+            viewed_key += '_' + json.dumps(filters, sort_keys=True)
         cache_key = f'content_rec_{hashlib.md5(viewed_key.encode()).hexdigest()}'
         
-        # Перевіряємо кеш рекомендацій
-        cached_recommendations = cache.get(cache_key)
-        if cached_recommendations:
+        # Стрічка кешується цілком - наступні сторінки не перераховують подібності
+        context = PipelineContext(viewed_ids=unique_viewed_ids, filters=filters)
+        try:
+            feed = CONTENT_PIPELINE.run(context, cache_key=cache_key)
+        except PipelineAbort as e:
+            return Response(e.payload, status=e.status_code)
+        cache_used = context.meta.get('cache_used', False)
+        if cache_used:
             print(f"Returning cached recommendations for books: {unique_viewed_ids}")
-            return Response(cached_recommendations)
-        
-        print(f"Generating new recommendations for {len(unique_viewed_ids)} viewed books: {unique_viewed_ids}")
-        
-        # Отримуємо вектори переглянутих книг з кешу
-        viewed_vectors_dict = get_cached_vectors(unique_viewed_ids)
         
-        if not viewed_vectors_dict:
-            print("No vectors found for viewed books")
-            return Response({'recommendations': []})
+        page_ids, _, next_cursor = get_feed_page(feed, offset, page_size)
         
-        # Створюємо профіль користувача
-        viewed_vectors = list(viewed_vectors_dict.values())
-        if len(viewed_vectors) == 1:
-            # Якщо тільки одна книга переглянута
-            user_profile = viewed_vectors[0]
-            print(f"Created user profile from single book vector")
-        else:
-            # Усереднюємо вектори кількох книг
-            user_profile = np.mean(viewed_vectors, axis=0)
-            print(f"Created user profile from {len(viewed_vectors)} book vectors")
-        
-        # Отримуємо жанри переглянутих книг для фільтрації
-        viewed_genres = get_books_genres(unique_viewed_ids)
-        
-        # Фільтруємо кандидатів за жанрами та обмежуємо кількість
-        if viewed_genres:
-            candidate_books = BookVector.objects.filter(
-                book__genres__in=viewed_genres,
-                book__is_available=True
-            ).exclude(
-                book_id__in=unique_viewed_ids
-            ).select_related('book').distinct()[:150]
-            print(f"Filtering by genres: {list(viewed_genres)}")
-        else:
-            # Якщо жанри не знайдені, беремо всі доступні книги
-            candidate_books = BookVector.objects.filter(
-                book__is_available=True
-            ).exclude(
-                book_id__in=unique_viewed_ids
-            ).select_related('book')[:100]
-            print("No genres found, using all available books")
-        
-        print(f"Found {len(candidate_books)} candidate books after genre filtering")
-        
-        # Отримуємо вектори кандидатів
-        candidate_ids = [bv.book_id for bv in candidate_books]
-        candidate_vectors_dict = get_cached_vectors(candidate_ids)
-        
-        recommendations = []
-        
-        # Обчислюємо косинусну подібність
-        for book_vector in candidate_books:
-            book_id = book_vector.book_id
-            if book_id in candidate_vectors_dict:
-                try:
-                    candidate_vector = candidate_vectors_dict[book_id]
-                    
-                    # Обчислюємо косинусну подібність
-                    similarity = cosine_similarity(
-                        [user_profile], 
-                        [candidate_vector]
-                    )[0][0]
-                    
-                    recommendations.append({
-                        'book': book_vector.book,
-                        'similarity': similarity
-                    })
-                    
-                except Exception as e:
-                    print(f"Error calculating similarity for book {book_id}: {e}")
-                    continue
-        
-        # Сортуємо за подібністю і беремо топ-8
-        recommendations.sort(key=lambda x: x['similarity'], reverse=True)
-        top_recommendations = recommendations[:8]
-        
-        print(f"Generated {len(top_recommendations)} recommendations from {len(recommendations)} candidates")
-        
-        # Серіалізуємо книги
-        recommended_books = [rec['book'] for rec in top_recommendations]
+        # Серіалізуємо книги сторінки одним запитом
+        recommended_books = fetch_available_books(page_ids)
         serializer = BookCatalogSerializer(
             recommended_books, 
             many=True, 
@@ -163,15 +324,14 @@ def get_recommendations(request):
         
         response_data = {
             'recommendations': serializer.data,
-            'based_on_books': list(viewed_vectors_dict.keys()),
-            'total_candidates': len(recommendations),
+            'based_on_books': feed['based_on_books'],
+            'total_candidates': feed['total_candidates'],
             'viewed_books_count': len(unique_viewed_ids),
-            'cache_used': False
+            'type': 'viewed_books',
+            'cache_used': cache_used,
+            'next_cursor': next_cursor
         }
         
-        # Кешуємо результат на 1 годину
-        cache.set(cache_key, response_data, timeout=3600)
-        
         return Response(response_data)
         
     except Exception as e:
@@ -182,11 +342,155 @@ def get_recommendations(request):
         )
 
 
+def parse_hybrid_weights(raw_weights):
+    """Перевіряє та нормалізує ваги змішування (сума = 1)"""
+    weights = dict(DEFAULT_HYBRID_WEIGHTS)
+    if raw_weights:
+        for key in weights:
+            if key in raw_weights:
+                value = float(raw_weights[key])
+                if value < 0:
+                    raise ValueError(f'Weight "{key}" must be non-negative')
+                weights[key] = value
+    
+    total = sum(weights.values())
+    if total == 0:
+        raise ValueError('At least one weight must be positive')
+    return {key: value / total for key, value in weights.items()}
+
+
+class HybridContentCandidates(GenreCandidates):
+    """Кандидати за жанрами переглядів; без переглядів або з нульовою вагою контенту - жодних"""
+    name = 'hybrid_content_candidates'
+
+    def enabled(self, context):
+        return bool(context.params['viewed_ids']) and context.params['weights']['content'] > 0
+
+    def get_cache_key(self, context):
+        return super().get_cache_key(context) if self.enabled(context) else None
+
+    def generate(self, context):
+        return super().generate(context) if self.enabled(context) else Candidates()
+
+
+class CollaborativeCandidates(CandidateGenerator):
+    """Top SVD прогнозів авторизованого користувача; усі прогнози - для змішування"""
+    name = 'collaborative_candidates'
+    top_n = 50
+
+    def generate(self, context):
+        user_id = context.params['user_id']
+        scores = {}
+        if user_id is not None and context.params['weights']['collaborative'] > 0:
+            scores = get_collaborative_scores(user_id)
+        context.state['collaborative_scores'] = scores
+        context.meta['collaborative_used'] = bool(scores)
+        top = sorted(scores, key=scores.get, reverse=True)[:self.top_n]
+        return Candidates(top)
+
+
+class HybridBlendScorer(Scorer):
+    """
+    Зважена сума косинусної подібності до профілю переглядів і SVD прогнозу,
+    переведеного з 1-5 у 0-1. Складові зберігаються у стрічці для відповіді
+    """
+    name = 'hybrid_blend'
+
+    def score(self, context, book_ids):
+        weights = context.params['weights']
+        viewed_vectors_dict = get_cached_vectors(context.params['viewed_ids']) if context.params['viewed_ids'] else {}
+        context.meta['based_on_books'] = list(viewed_vectors_dict.keys())
+        
+        content = np.zeros(len(book_ids))
+        if viewed_vectors_dict:
+            user_profile = build_user_profile(viewed_vectors_dict)
+            candidate_vectors = get_cached_vectors(book_ids.tolist())
+            rows = [i for i, book_id in enumerate(book_ids.tolist()) if book_id in candidate_vectors]
+            if rows:
+                matrix = np.array([candidate_vectors[int(book_ids[i])] for i in rows])
+                content[rows] = cosine_similarity([user_profile], matrix)[0]
+        
+        collaborative_scores = context.state.get('collaborative_scores', {})
+        collaborative = np.array([
+            (collaborative_scores[book_id] - 1) / 4 if book_id in collaborative_scores else 0.0
+            for book_id in book_ids.tolist()
+        ])
+        
+        context.meta['components'] = {
+            book_id: (round(float(c), 4), round(float(l), 4))
+            for book_id, c, l in zip(book_ids.tolist(), content, collaborative)
+        }
+        return weights['content'] * content + weights['collaborative'] * collaborative
+
+
+HYBRID_PIPELINE = Pipeline('hybrid', [
+    HybridContentCandidates(), CollaborativeCandidates(), HybridBlendScorer(), ExclusionFilter(), TopN(FEED_SIZE)
+])
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def get_hybrid_recommendations(request):
+    """
+    Гібридні рекомендації: контентна подібність (BookVector) та SVD прогнози
+    рахуються на спільному наборі кандидатів, книги серіалізуються один раз
+    """
+    try:
+        try:
+            unique_viewed_ids = (parse_viewed_books(request.data) or [])[-5:]
+        except ValueError as e:
+            return Response({'error': f'Invalid viewed_books: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            weights = parse_hybrid_weights(request.data.get('weights'))
+        except (TypeError, ValueError) as e:
+            return Response({'error': f'Invalid weights: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        user_id = request.user.id if request.user.is_authenticated else None
+        
+        # Покоління стрічок користувача змінюється з кожною його взаємодією - старі ключі не читаються
+        generation = get_user_feed_generation(user_id) if user_id is not None else 0
+        cache_payload = json.dumps([sorted(unique_viewed_ids), weights, generation], sort_keys=True)
+        cache_key = f'hybrid_rec_{user_id}_{hashlib.md5(cache_payload.encode()).hexdigest()}'
+        
+        context = PipelineContext(user_id=user_id, viewed_ids=unique_viewed_ids, weights=weights)
+        context.meta.update(based_on_books=[], collaborative_used=False, components={})
+        feed = HYBRID_PIPELINE.run(context, cache_key=cache_key)
+        
+        page_ids, page_scores, _ = get_feed_page(feed, 0, FEED_PAGE_SIZE)
+        books = fetch_available_books(page_ids)
+        scores = dict(zip(page_ids, page_scores))
+        
+        serializer = BookCatalogSerializer(books, many=True, context={'request': request})
+        results = serializer.data
+        for book_data, book in zip(results, books):
+            content_score, collaborative_score = feed['components'][book.id]
+            book_data['hybrid_score'] = round(float(scores[book.id]), 4)
+            book_data['content_score'] = content_score
+            book_data['collaborative_score'] = collaborative_score
+        
+        return Response({
+            'recommendations': results,
+            'type': 'hybrid',
+            'weights': weights,
+            'based_on_books': feed['based_on_books'],
+            'total_candidates': feed.get('total_candidates', 0),
+            'collaborative_used': feed['collaborative_used']
+        })
+        
+    except Exception as e:
+        print(f"Error generating hybrid recommendations: {str(e)}")
+        return Response(
+            {'error': f'Error generating hybrid recommendations: {str(e)}'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def track_book_view(request):
     """
-    Відстежує перегляд книги 
+    Відстежує перегляд книги: записує подію в журнал переглядів користувача або сесії
     """
     try:
         book_id = request.data.get('book_id')
@@ -194,16 +498,94 @@ def track_book_view(request):
         if not book_id:
             return Response({'error': 'book_id is required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Перевіряємо, що книга існує
         try:
-            book = Book.objects.get(id=book_id, is_available=True)
-        except Book.DoesNotExist:
+            book_id = int(book_id)
+        except (TypeError, ValueError):
+            return Response({'error': 'Invalid book_id'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Перевіряємо, що книга існує, за сховищем ознак - без запиту до БД
+        if not get_feature_store().available([book_id])[0]:
             return Response({'error': 'Book not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        return Response({'message': 'Book view tracked successfully'})
+        # Подія потрапляє в буфер, запис у БД - пакетно у фоновому потоці
+        user_id, session_key = get_view_owner(request, create_session=True)
+        get_view_buffer().add(book_id, user_id=user_id, session_key=session_key)
+        
+        return Response({'message': 'Book view tracked successfully', 'session_id': session_key or None})
         
     except Exception as e:
         return Response(
             {'error': f'Error tracking book view: {str(e)}'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def trending_books(request):
+    """
+    Трендові книги за переглядами та покупками зі згасанням.
+    Віддається із закешованої стрічки знімка, з курсорною пагінацією
+    """
+    try:
+        try:
+            offset = decode_cursor(request.query_params.get('cursor'))
+            page_size = parse_page_size(request.query_params.get('page_size'))
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        feed = get_trending_feed()
+        page_ids, scores, next_cursor = get_feed_page(feed, offset, page_size)
+        
+        serializer = BookCatalogSerializer(
+            fetch_available_books(page_ids),
+            many=True,
+            context={'request': request}
+        )
+        trending_scores = dict(zip(page_ids, scores))
+        results = serializer.data
+        for book in results:
+            book['trending_score'] = round(trending_scores[book['id']], 4)
+        
+        return Response({'results': results, 'next_cursor': next_cursor})
+        
+    except Exception as e:
+        print(f"Error getting trending books: {str(e)}")
+        return Response(
+            {'error': f'Error getting trending books: {str(e)}'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def also_viewed_books(request, pk):
+    """
+    Книги, які переглядали в одних сесіях з цією ("також переглядали")
+    """
+    try:
+        try:
+            limit = int(request.query_params.get('limit', ALSO_VIEWED_SIZE))
+        except ValueError:
+            return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, ALSO_VIEWED_MAX_SIZE))
+        
+        book_ids, counts = get_also_viewed(pk, limit)
+        serializer = BookCatalogSerializer(
+            fetch_available_books(book_ids),
+            many=True,
+            context={'request': request}
+        )
+        coview_counts = dict(zip(book_ids, counts))
+        results = serializer.data
+        for book in results:
+            book['coview_count'] = coview_counts[book['id']]
+        
+        return Response({'book_id': pk, 'results': results})
+        
+    except Exception as e:
+        print(f"Error getting also viewed books: {str(e)}")
+        return Response(
+            {'error': f'Error getting also viewed books: {str(e)}'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
@@ -1,3 +1,5 @@
 from django.contrib import admin
+from .models import BookSimilarity, UserRecommendation
 
-# Register your models here.
+admin.site.register(BookSimilarity)
+admin.site.register(UserRecommendation)
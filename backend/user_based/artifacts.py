@@ -0,0 +1,182 @@
+"""
+Формат артефакту user-based моделей (без pickle, з підтримкою mmap).
+
+Артефакт - це директорія:
+
+    <model_dir>/
+        manifest.json          # формат, версія, тип моделі, параметри, форми масивів
+        user_ids.npy           # int64 [n_users]  - id користувача для кожного рядка факторів
+        book_ids.npy           # int64 [n_items]  - id книги для кожного рядка факторів
+        user_factors.npy       # float [n_users, k]
+        item_factors.npy       # float [n_items, k]
+        user_mean.npy          # float [n_users]  (тільки SVD)
+        content_projection.npy # float [n_features, k] (SVD, якщо навчено cold-start проєкцію)
+        content_mean.npy       # float [n_features]
+        factor_mean.npy        # float [k]
+        mips_centroids.npy     # float32 [n_clusters, k] (MIPS індекс, якщо каталог великий)
+        mips_item_order.npy    # int64 [n_items]
+        mips_offsets.npy       # int64 [n_clusters + 1]
+
+manifest.json:
+
+    {
+        "format": "user_based_model",
+        "version": 1,
+        "model_type": "svd" | "als",
+        "params": {...},                       # гіперпараметри моделі
+        "mips": {"n_clusters": ..., "n_probe": ..., "top_n": ...},  # індекс, відкалібрований для top_n, або null
+        "arrays": {"item_factors": {"dtype": "float32", "shape": [n_items, k]}, ...}
+    }
+
+Масиви зберігаються як звичайні .npy і відкриваються через np.load(mmap_mode='r'),
+тому завантаження займає мілісекунди, а воркери спільно використовують сторінки
+пам'яті. Версія перевіряється при завантаженні. MIPS індекс будується і
+калібрується при збереженні, тож запити не чекають на k-means; артефакт без
+індексу (старий) отримує його при завантаженні.
+"""
+import json
+import os
+import numpy as np
+from .mips import MIPS_CALIBRATION_TOP_N, MIPSIndex, build_model_index, calibrate_model_index
+from .models import SVDRecommender, ALSRecommender
+
+
+ARTIFACT_FORMAT = 'user_based_model'
+ARTIFACT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+# Масиви та параметри, що зберігаються для кожного типу моделі
+MODEL_ARRAYS = {
+    'svd': ['user_factors', 'item_factors', 'user_mean', 'content_projection', 'content_mean', 'factor_mean'],
+    'als': ['user_factors', 'item_factors'],
+}
+MODEL_PARAMS = {
+    'svd': ['n_components', 'random_state', 'explained_variance'],
+    'als': ['n_factors', 'regularization', 'rating_alpha', 'purchase_alpha',
+            'iterations', 'cg_steps', 'n_threads', 'random_state'],
+}
+MODEL_CLASSES = {'svd': SVDRecommender, 'als': ALSRecommender}
+
+
+class ArtifactError(Exception):
+    """Артефакт відсутній, пошкоджений або має несумісну версію"""
+
+
+def has_model_artifact(path):
+    return os.path.isfile(os.path.join(path, MANIFEST_NAME))
+
+
+def save_model_artifact(path, model_data):
+    """Зберігає model_data (recommender + id maps) як директорію артефакту"""
+    recommender = model_data['recommender']
+    model_type = next(name for name, cls in MODEL_CLASSES.items() if isinstance(recommender, cls))
+
+    os.makedirs(path, exist_ok=True)
+
+    user_to_idx = model_data['user_to_idx']
+    book_to_idx = model_data['book_to_idx']
+    arrays = {
+        'user_ids': np.asarray(sorted(user_to_idx, key=user_to_idx.get)),
+        'book_ids': np.asarray(sorted(book_to_idx, key=book_to_idx.get)),
+    }
+    for name in ('user_ids', 'book_ids'):
+        if arrays[name].dtype.kind not in 'iu':
+            raise ArtifactError(f'{name} must be integer database ids, got {arrays[name].dtype}')
+        arrays[name] = arrays[name].astype(np.int64)
+    for name in MODEL_ARRAYS[model_type]:
+        value = getattr(recommender, name, None)
+        if value is not None:
+            arrays[name] = np.ascontiguousarray(value)
+
+    if 'mips_index' not in model_data:
+        model_data['mips_index'] = build_model_index(recommender.item_factors, recommender.user_factors)
+    index = model_data['mips_index']
+    if index is not None:
+        arrays.update(index.to_arrays())
+
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f'{name}.npy'), array, allow_pickle=False)
+
+    manifest = {
+        'format': ARTIFACT_FORMAT,
+        'version': ARTIFACT_VERSION,
+        'model_type': model_type,
+        'params': {name: getattr(recommender, name, None) for name in MODEL_PARAMS[model_type]},
+        'mips': {
+            'n_clusters': index.n_clusters, 'n_probe': index.n_probe, 'top_n': index.calibrated_top_n
+        } if index is not None else None,
+        'arrays': {
+            name: {'dtype': str(array.dtype), 'shape': list(array.shape)}
+            for name, array in arrays.items()
+        },
+    }
+    # Маніфест пишемо останнім, щоб неповний артефакт не завантажувався
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    return manifest
+
+
+def load_model_artifact(path, mmap=True):
+    """Завантажує артефакт у формат model_data, який використовують views"""
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ArtifactError(f'Cannot read manifest {manifest_path}: {e}')
+
+    if manifest.get('format') != ARTIFACT_FORMAT or manifest.get('version') != ARTIFACT_VERSION:
+        raise ArtifactError(
+            f"Unsupported artifact {manifest.get('format')} v{manifest.get('version')}, "
+            f"expected {ARTIFACT_FORMAT} v{ARTIFACT_VERSION}"
+        )
+
+    model_type = manifest.get('model_type')
+    if model_type not in MODEL_CLASSES:
+        raise ArtifactError(f'Unknown model type: {model_type}')
+
+    arrays = {}
+    for name, meta in manifest['arrays'].items():
+        array = np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r' if mmap else None, allow_pickle=False)
+        if list(array.shape) != meta['shape']:
+            raise ArtifactError(f'Shape mismatch for {name}: {array.shape} != {meta["shape"]}')
+        arrays[name] = array
+
+    params = manifest['params']
+    init_params = {k: v for k, v in params.items() if k != 'explained_variance'}
+    recommender = MODEL_CLASSES[model_type](**init_params)
+    for name in MODEL_ARRAYS[model_type]:
+        setattr(recommender, name, arrays.get(name))
+    if model_type == 'svd':
+        recommender.explained_variance = params.get('explained_variance')
+        recommender.reconstructed = None
+    recommender.is_fitted = True
+
+    mips = manifest.get('mips')
+    if mips is not None:
+        index = MIPSIndex.from_arrays(
+            recommender.item_factors, arrays['mips_centroids'], arrays['mips_item_order'],
+            arrays['mips_offsets'], mips['n_probe'], mips.get('top_n')
+        )
+        # n_probe, підібраний для іншої довжини стрічки, не гарантує recall - калібруємо заново
+        if index.calibrated_top_n != MIPS_CALIBRATION_TOP_N:
+            calibrate_model_index(index, recommender.user_factors)
+    elif 'mips' in manifest:
+        index = None
+    else:
+        index = build_model_index(recommender.item_factors, recommender.user_factors)
+
+    user_ids = arrays['user_ids'].tolist()
+    book_ids = arrays['book_ids'].tolist()
+    return {
+        'recommender': recommender,
+        'user_to_idx': {user_id: idx for idx, user_id in enumerate(user_ids)},
+        'book_to_idx': {book_id: idx for idx, book_id in enumerate(book_ids)},
+        'idx_to_user': dict(enumerate(user_ids)),
+        'idx_to_book': dict(enumerate(book_ids)),
+        'mips_index': index,
+        'manifest': manifest,
+    }
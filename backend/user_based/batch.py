@@ -0,0 +1,40 @@
+"""
+Блочний скоринг для пакетного передобчислення рекомендацій (precompute_user_recommendations).
+
+Модуль не залежить від Django: воркери ProcessPoolExecutor отримують фактори один раз
+через initializer, а кожне завдання - це блок рядків користувачів і їхні взаємодії
+у CSR вигляді (indptr/indices). Блок скориться одним матричним множенням.
+"""
+import numpy as np
+
+
+_worker = {}
+
+
+def init_worker(user_factors, item_factors, user_mean=None):
+    """Зберігає фактори моделі у процесі-воркері"""
+    _worker['user_factors'] = np.asarray(user_factors, dtype=np.float32)
+    _worker['item_factors'] = np.asarray(item_factors, dtype=np.float32)
+    _worker['user_mean'] = None if user_mean is None else np.asarray(user_mean, dtype=np.float32)
+
+
+def score_block(user_rows, exclude_indptr, exclude_indices, top_n):
+    """
+    Повертає (індекси книг, скори) розміру [len(user_rows), top_n] за спаданням скору.
+    Виключені книги (взаємодії користувача) отримують -inf
+    """
+    scores = _worker['user_factors'][user_rows] @ _worker['item_factors'].T
+    if _worker['user_mean'] is not None:
+        scores += _worker['user_mean'][user_rows][:, None]
+
+    rows = np.repeat(np.arange(len(user_rows)), np.diff(exclude_indptr))
+    scores[rows, exclude_indices] = -np.inf
+
+    top_n = min(top_n, scores.shape[1])
+    if top_n <= 0:
+        return np.empty((len(user_rows), 0), dtype=np.int64), np.empty((len(user_rows), 0), dtype=np.float32)
+
+    top = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
@@ -0,0 +1,99 @@
+"""
+Швидке вивантаження взаємодій з БД одразу в NumPy масиви.
+
+На PostgreSQL запит values_list обгортається в COPY (...) TO STDOUT (FORMAT binary):
+колонки приводяться до int4/int2, тому кожен рядок має фіксовану довжину і весь потік
+розбирається одним np.frombuffer без створення Python-об'єктів на рядок.
+На інших БД (SQLite у тестах) використовується values_list().iterator() частинами
+та np.fromiter у заздалегідь відомий розмір.
+"""
+import io
+import itertools
+import numpy as np
+from django.db import connections
+from ratings.models import Rating
+from orders.models import OrderItem
+
+
+CHUNK_SIZE = 20000
+
+# numpy dtype -> тип PostgreSQL для COPY BINARY
+PG_TYPES = {
+    np.dtype(np.int8): ('int2', '>i2'),
+    np.dtype(np.int16): ('int2', '>i2'),
+    np.dtype(np.int32): ('int4', '>i4'),
+    np.dtype(np.int64): ('int8', '>i8'),
+}
+COPY_SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+
+
+def extract_columns(queryset, dtypes):
+    """
+    Виконує values_list queryset і повертає по масиву на колонку
+    з відповідними dtypes (наприклад [np.int32, np.int32, np.int8])
+    """
+    dtypes = [np.dtype(dtype) for dtype in dtypes]
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        return _copy_binary(connection, queryset, dtypes)
+    return _chunked_values_list(queryset, dtypes)
+
+
+def _chunked_values_list(queryset, dtypes):
+    count = queryset.count()
+    if count == 0:
+        return [np.empty(0, dtype=dtype) for dtype in dtypes]
+
+    flat = np.fromiter(
+        itertools.chain.from_iterable(queryset.iterator(chunk_size=CHUNK_SIZE)),
+        dtype=np.int64,
+        count=count * len(dtypes)
+    ).reshape(count, len(dtypes))
+    return [flat[:, i].astype(dtype) for i, dtype in enumerate(dtypes)]
+
+
+def _copy_binary(connection, queryset, dtypes):
+    sql, params = queryset.query.sql_with_params()
+    columns = [f'c{i}' for i in range(len(dtypes))]
+    casts = ', '.join(f'{column}::{PG_TYPES[dtype][0]}' for column, dtype in zip(columns, dtypes))
+
+    buffer = io.BytesIO()
+    with connection.cursor() as cursor:
+        inner_sql = cursor.mogrify(sql, params).decode()
+        copy_sql = f"COPY (SELECT {casts} FROM ({inner_sql}) AS t({', '.join(columns)})) TO STDOUT (FORMAT binary)"
+        cursor.copy_expert(copy_sql, buffer)
+    data = buffer.getbuffer()
+
+    # Заголовок: сигнатура (11 байт), flags (4), довжина розширення (4) + розширення
+    if bytes(data[:11]) != COPY_SIGNATURE:
+        raise ValueError('Unexpected COPY BINARY header')
+    header_size = 19 + int.from_bytes(data[15:19], 'big')
+
+    # Рядок: int16 кількість полів, далі для кожного поля int32 довжина + значення
+    fields = [('n_fields', '>i2')]
+    for i, dtype in enumerate(dtypes):
+        fields += [(f'len{i}', '>i4'), (f'v{i}', PG_TYPES[dtype][1])]
+    row_dtype = np.dtype(fields)
+
+    # Останні 2 байти - трейлер (-1)
+    body = data[header_size:len(data) - 2]
+    rows = np.frombuffer(body, dtype=row_dtype)
+    return [rows[f'v{i}'].astype(dtype) for i, dtype in enumerate(dtypes)]
+
+
+def extract_ratings(queryset=None):
+    """(user_ids int32, book_ids int32, scores int8) з усіх рейтингів"""
+    queryset = queryset if queryset is not None else Rating.objects.all()
+    return extract_columns(
+        queryset.order_by().values_list('user_id', 'book_id', 'score'),
+        [np.int32, np.int32, np.int8]
+    )
+
+
+def extract_purchases(queryset=None):
+    """(user_ids int32, book_ids int32) унікальних пар із завершених замовлень"""
+    queryset = queryset if queryset is not None else OrderItem.objects.filter(order__is_completed=True)
+    return extract_columns(
+        queryset.order_by().values_list('order__user_id', 'book_id').distinct(),
+        [np.int32, np.int32]
+    )
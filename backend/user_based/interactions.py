@@ -0,0 +1,256 @@
+"""
+Довгоживуче сховище взаємодій користувач-книга для user-based рекомендацій.
+
+Замість перебудови матриці з усіх Rating та OrderItem після кожного запису сховище
+отримує дельти з сигналів (upsert/delete однієї клітинки) за O(1). Значення клітинки -
+рейтинг, або IMPLICIT_PURCHASE_RATING для покупки без рейтингу. Індекси користувачів і
+книг тільки ростуть; порожні рядки/стовпці прибирає compact(). Повна перебудова
+виконується при першому зверненні (старт процесу), після invalidate() або коли
+кількість рейтингів/покупок або сума оцінок у БД не збігається зі сховищем (зміни з
+інших процесів, зокрема зміна оцінки без зміни кількості).
+"""
+import threading
+import time
+import numpy as np
+import scipy.sparse as sp
+from django.db.models import Count, Sum
+from ratings.models import Rating
+from orders.models import OrderItem
+from .extraction import extract_ratings, extract_purchases
+
+
+IMPLICIT_PURCHASE_RATING = 4
+# Як часто (секунди) звіряти сховище з БД
+CONSISTENCY_CHECK_INTERVAL = 60
+# Компактизація, коли порожніх індексів більше цієї частки
+COMPACTION_THRESHOLD = 0.2
+
+
+class InteractionStore:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._checked_at = 0.0
+        self.version = 0
+        self.generation = 0     # лічильник повних перебудов
+        self.ratings = {}       # (user_id, book_id) -> score
+        self.score_total = 0    # сума оцінок - для звірки з БД
+        self.purchases = set()  # (user_id, book_id)
+        self.user_books = {}    # user_id -> set(book_id)
+        self.book_users = {}    # book_id -> кількість користувачів з взаємодією
+        self.user_to_idx = {}
+        self.book_to_idx = {}
+
+    # --- Повна перебудова ---
+
+    def rebuild(self):
+        """Повністю перечитує рейтинги та покупки з БД"""
+        with self._lock:
+            print("Rebuilding user-item interaction store...")
+            self.ratings = {}
+            self.score_total = 0
+            self.purchases = set()
+            self.user_books = {}
+            self.book_users = {}
+            self.user_to_idx = {}
+            self.book_to_idx = {}
+
+            user_ids, book_ids, scores = extract_ratings()
+            for user_id, book_id, score in zip(user_ids.tolist(), book_ids.tolist(), scores.tolist()):
+                self._set_rating(user_id, book_id, score)
+
+            user_ids, book_ids = extract_purchases()
+            for user_id, book_id in zip(user_ids.tolist(), book_ids.tolist()):
+                self._set_purchase(user_id, book_id)
+
+            self._loaded = True
+            self._checked_at = time.monotonic()
+            self.version += 1
+            self.generation += 1
+            print(f"Interaction store built: {len(self.user_to_idx)} users x {len(self.book_to_idx)} books")
+
+    def invalidate(self):
+        """Наступне звернення перебудує сховище"""
+        with self._lock:
+            self._loaded = False
+
+    def ensure_loaded(self):
+        """Будує сховище при першому зверненні та періодично звіряє його з БД"""
+        with self._lock:
+            if not self._loaded:
+                self.rebuild()
+            elif time.monotonic() - self._checked_at > CONSISTENCY_CHECK_INTERVAL:
+                self._checked_at = time.monotonic()
+                if self.db_fingerprint() != self.fingerprint():
+                    print("Interaction store is out of sync with the database")
+                    self.rebuild()
+
+    def fingerprint(self):
+        return len(self.ratings), self.score_total, len(self.purchases)
+
+    @staticmethod
+    def db_fingerprint():
+        purchases_count = OrderItem.objects.filter(
+            order__is_completed=True
+        ).values('order__user_id', 'book_id').distinct().count()
+        ratings = Rating.objects.aggregate(count=Count('id'), total=Sum('score'))
+        return ratings['count'], ratings['total'] or 0, purchases_count
+
+    # --- Дельти з сигналів ---
+
+    def upsert_rating(self, user_id, book_id, score):
+        with self._lock:
+            if self._loaded:
+                self._set_rating(user_id, book_id, score)
+                self.version += 1
+
+    def delete_rating(self, user_id, book_id):
+        with self._lock:
+            score = self.ratings.pop((user_id, book_id), None) if self._loaded else None
+            if score is not None:
+                self.score_total -= score
+                self._release(user_id, book_id)
+                self.version += 1
+
+    def add_purchase(self, user_id, book_id):
+        with self._lock:
+            if self._loaded:
+                self._set_purchase(user_id, book_id)
+                self.version += 1
+
+    def delete_purchase(self, user_id, book_id):
+        with self._lock:
+            if self._loaded and (user_id, book_id) in self.purchases:
+                self.purchases.discard((user_id, book_id))
+                self._release(user_id, book_id)
+                self.version += 1
+
+    def _set_rating(self, user_id, book_id, score):
+        self._touch(user_id, book_id)
+        self.score_total += score - self.ratings.get((user_id, book_id), 0)
+        self.ratings[(user_id, book_id)] = score
+
+    def _set_purchase(self, user_id, book_id):
+        self._touch(user_id, book_id)
+        self.purchases.add((user_id, book_id))
+
+    def _touch(self, user_id, book_id):
+        """Реєструє клітинку і, за потреби, нові індекси користувача/книги"""
+        if user_id not in self.user_to_idx:
+            self.user_to_idx[user_id] = len(self.user_to_idx)
+        if book_id not in self.book_to_idx:
+            self.book_to_idx[book_id] = len(self.book_to_idx)
+
+        books = self.user_books.setdefault(user_id, set())
+        if book_id not in books:
+            books.add(book_id)
+            self.book_users[book_id] = self.book_users.get(book_id, 0) + 1
+
+    def _release(self, user_id, book_id):
+        """Прибирає клітинку, якщо для пари не лишилось ні рейтингу, ні покупки"""
+        pair = (user_id, book_id)
+        if pair in self.ratings or pair in self.purchases:
+            return
+
+        self.user_books.get(user_id, set()).discard(book_id)
+        if not self.user_books.get(user_id):
+            self.user_books.pop(user_id, None)
+        self.book_users[book_id] = self.book_users.get(book_id, 1) - 1
+        if self.book_users[book_id] <= 0:
+            self.book_users.pop(book_id, None)
+
+        empty_users = len(self.user_to_idx) - len(self.user_books)
+        empty_books = len(self.book_to_idx) - len(self.book_users)
+        if (empty_users > COMPACTION_THRESHOLD * max(len(self.user_to_idx), 100)
+                or empty_books > COMPACTION_THRESHOLD * max(len(self.book_to_idx), 100)):
+            self.compact()
+
+    def compact(self):
+        """Перенумеровує індекси без порожніх користувачів і книг"""
+        with self._lock:
+            self.user_to_idx = {
+                user_id: idx for idx, user_id in
+                enumerate(u for u in self.user_to_idx if u in self.user_books)
+            }
+            self.book_to_idx = {
+                book_id: idx for idx, book_id in
+                enumerate(b for b in self.book_to_idx if b in self.book_users)
+            }
+            self.version += 1
+
+    # --- Читання ---
+
+    def value(self, user_id, book_id):
+        pair = (user_id, book_id)
+        if pair in self.ratings:
+            return self.ratings[pair]
+        return IMPLICIT_PURCHASE_RATING if pair in self.purchases else 0
+
+    def user_view(self, user_id):
+        """
+        Узгоджений знімок для одного користувача: (user_idx, щільний рядок по всіх
+        книгах, копія book_to_idx). Для користувача без взаємодій user_idx і рядок - None
+        """
+        self.ensure_loaded()
+        with self._lock:
+            book_to_idx = dict(self.book_to_idx)
+            if user_id not in self.user_books:
+                return None, None, book_to_idx
+            row = np.zeros(len(book_to_idx))
+            for book_id in self.user_books[user_id]:
+                row[book_to_idx[book_id]] = self.value(user_id, book_id)
+            return self.user_to_idx[user_id], row, book_to_idx
+
+    def user_interactions(self, user_id):
+        """{book_id: значення клітинки} для користувача (порожній для нового)"""
+        self.ensure_loaded()
+        with self._lock:
+            return {book_id: self.value(user_id, book_id) for book_id in self.user_books.get(user_id, ())}
+
+    def user_book_ids(self, user_id):
+        """Id книг, з якими користувач взаємодіяв"""
+        self.ensure_loaded()
+        with self._lock:
+            return list(self.user_books.get(user_id, ()))
+
+    def is_empty(self):
+        self.ensure_loaded()
+        with self._lock:
+            return not self.user_books
+
+    def to_matrix(self):
+        """Щільна users x books матриця (для навчання моделей)"""
+        self.ensure_loaded()
+        with self._lock:
+            if not self.user_books:
+                return None, {}, {}
+            matrix = np.zeros((len(self.user_to_idx), len(self.book_to_idx)))
+            for user_id, books in self.user_books.items():
+                user_idx = self.user_to_idx[user_id]
+                for book_id in books:
+                    matrix[user_idx, self.book_to_idx[book_id]] = self.value(user_id, book_id)
+            return matrix, dict(self.user_to_idx), dict(self.book_to_idx)
+
+    def to_sparse(self):
+        """Розріджена CSR users x books матриця з тими ж індексами, що й to_matrix"""
+        self.ensure_loaded()
+        with self._lock:
+            rows, cols, values = [], [], []
+            for user_id, books in self.user_books.items():
+                user_idx = self.user_to_idx[user_id]
+                for book_id in books:
+                    rows.append(user_idx)
+                    cols.append(self.book_to_idx[book_id])
+                    values.append(self.value(user_id, book_id))
+            matrix = sp.csr_matrix(
+                (np.array(values, dtype=np.float32), (rows, cols)),
+                shape=(len(self.user_to_idx), len(self.book_to_idx))
+            )
+            return matrix, dict(self.user_to_idx), dict(self.book_to_idx)
+
+
+_store = InteractionStore()
+
+
+def get_interaction_store():
+    return _store
@@ -0,0 +1,46 @@
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from user_based.mips import MIPSIndex
+from user_based.views import load_user_based_model, load_als_model
+
+
+class Command(BaseCommand):
+    help = 'Порівнює MIPS індекс з brute force пошуком по item_factors (час і recall)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=['svd', 'als', 'random'], default='svd')
+        parser.add_argument('--items', type=int, default=100000, help='Кількість книг для --model random')
+        parser.add_argument('--factors', type=int, default=50, help='Розмірність для --model random')
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--top-n', type=int, default=8)
+        parser.add_argument('--recall', type=float, default=0.95)
+        parser.add_argument('--clusters', type=int, default=None)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(42)
+
+        if options['model'] == 'random':
+            item_factors = rng.standard_normal((options['items'], options['factors'])).astype(np.float32)
+            queries = rng.standard_normal((options['queries'], options['factors'])).astype(np.float32)
+        else:
+            model_data = load_user_based_model() if options['model'] == 'svd' else load_als_model()
+            if model_data is None:
+                raise CommandError(f"Model {options['model']} is not available")
+            recommender = model_data['recommender']
+            item_factors = recommender.item_factors
+            users = rng.choice(recommender.user_factors.shape[0],
+                               size=min(options['queries'], recommender.user_factors.shape[0]), replace=False)
+            queries = np.asarray(recommender.user_factors[users])
+
+        self.stdout.write(f"🔧 Побудова індексу: {item_factors.shape[0]} книг x {item_factors.shape[1]} факторів...")
+        index = MIPSIndex(item_factors, n_clusters=options['clusters'])
+
+        # Калібруємо на половині запитів, вимірюємо на іншій
+        half = max(len(queries) // 2, 1)
+        n_probe, recall = index.calibrate(queries[:half], options['top_n'], options['recall'])
+        self.stdout.write(f"🎯 n_probe={n_probe}/{index.n_clusters} (recall на калібруванні {recall:.3f})")
+
+        result = index.benchmark(queries[half:] if len(queries) > 1 else queries, options['top_n'])
+        self.stdout.write(f"📊 brute force: {result['brute_force_ms']:.3f} ms/запит")
+        self.stdout.write(f"📊 MIPS індекс: {result['index_ms']:.3f} ms/запит")
+        self.stdout.write(f"📊 recall@{options['top_n']}: {result['recall']:.3f}, прискорення x{result['speedup']:.1f}")
@@ -0,0 +1,94 @@
+import numpy as np
+import scipy.sparse as sp
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from user_based.models import BookSimilarity
+from user_based.extraction import extract_ratings, extract_purchases
+from user_based.interactions import IMPLICIT_PURCHASE_RATING
+
+
+class Command(BaseCommand):
+    help = 'Обчислює top-K схожих книг (item-item) з рейтингів та покупок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=30)
+        parser.add_argument('--method', choices=['cosine', 'adjusted'], default='cosine')
+        parser.add_argument('--min-score', type=float, default=0.0)
+        parser.add_argument('--block-size', type=int, default=1000)
+
+    def build_interaction_matrix(self, adjusted):
+        """Будує розріджену users x books матрицю (покупка без рейтингу = 4)"""
+        rating_users, rating_books, scores = extract_ratings()
+        purchase_users, purchase_books = extract_purchases()
+        if not len(rating_users) and not len(purchase_users):
+            return None, None
+
+        # Покупки, для яких уже є рейтинг, не дублюємо
+        key_base = int(max(rating_books.max(initial=0), purchase_books.max(initial=0))) + 1
+        rated_keys = rating_users.astype(np.int64) * key_base + rating_books
+        purchase_keys = purchase_users.astype(np.int64) * key_base + purchase_books
+        implicit = ~np.isin(purchase_keys, rated_keys)
+
+        users = np.concatenate([rating_users, purchase_users[implicit]])
+        books = np.concatenate([rating_books, purchase_books[implicit]])
+        values = np.concatenate([
+            scores.astype(np.float32),
+            np.full(implicit.sum(), IMPLICIT_PURCHASE_RATING, dtype=np.float32)
+        ])
+
+        user_ids, rows = np.unique(users, return_inverse=True)
+        book_ids, cols = np.unique(books, return_inverse=True)
+
+        if adjusted:
+            # Adjusted cosine: центруємо оцінки на середнє користувача
+            sums = np.bincount(rows, weights=values, minlength=len(user_ids))
+            counts = np.bincount(rows, minlength=len(user_ids))
+            values = values - (sums / counts)[rows]
+
+        matrix = sp.csr_matrix((values, (rows, cols)), shape=(len(user_ids), len(book_ids)))
+        matrix.eliminate_zeros()
+        return matrix, book_ids
+
+    def handle(self, *args, **options):
+        top_k = options['top_k']
+        self.stdout.write(f"🚀 Обчислення item-item подібностей ({options['method']}, top-{top_k})...")
+
+        matrix, book_ids = self.build_interaction_matrix(options['method'] == 'adjusted')
+        if matrix is None:
+            self.stdout.write("❌ Немає рейтингів або покупок!")
+            return
+
+        # Нормалізуємо стовпці, тоді X^T X дає косинусну подібність
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+        norms[norms == 0] = 1.0
+        normalized = (matrix @ sp.diags(1.0 / norms)).tocsc()
+        normalized_t = normalized.T.tocsr()
+
+        similarities = []
+        n_books = len(book_ids)
+        for start in range(0, n_books, options['block_size']):
+            end = min(start + options['block_size'], n_books)
+            block = (normalized_t[start:end] @ normalized).tocsr()
+
+            for row in range(block.shape[0]):
+                book_idx = start + row
+                row_start, row_end = block.indptr[row], block.indptr[row + 1]
+                neighbors = block.indices[row_start:row_end]
+                scores = block.data[row_start:row_end]
+
+                mask = (neighbors != book_idx) & (scores > options['min_score'])
+                neighbors, scores = neighbors[mask], scores[mask]
+                if len(scores) > top_k:
+                    top = np.argpartition(-scores, top_k - 1)[:top_k]
+                    neighbors, scores = neighbors[top], scores[top]
+
+                similarities.extend(
+                    BookSimilarity(book_id=int(book_ids[book_idx]), neighbor_id=int(book_ids[n]), score=float(s))
+                    for n, s in zip(neighbors, scores)
+                )
+
+        with transaction.atomic():
+            BookSimilarity.objects.all().delete()
+            BookSimilarity.objects.bulk_create(similarities, batch_size=5000)
+
+        self.stdout.write(f"✅ Збережено {len(similarities)} пар подібностей для {n_books} книг")
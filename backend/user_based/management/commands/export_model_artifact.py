@@ -0,0 +1,28 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from user_based.artifacts import save_model_artifact, ArtifactError
+from user_based.views import load_legacy_pickle_model
+
+
+class Command(BaseCommand):
+    help = 'Конвертує pickle user-based моделі у mmap-артефакт (npy + manifest.json)'
+
+    def add_arguments(self, parser):
+        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+        parser.add_argument('--input', default=os.path.join(base_dir, 'svd_recommender_clean.pkl'))
+        parser.add_argument('--output', default=os.path.join(base_dir, 'svd_model'))
+
+    def handle(self, *args, **options):
+        try:
+            model_data = load_legacy_pickle_model(options['input'])
+        except Exception as e:
+            raise CommandError(f"Cannot load {options['input']}: {e}")
+
+        try:
+            manifest = save_model_artifact(options['output'], model_data)
+        except ArtifactError as e:
+            raise CommandError(str(e))
+
+        shapes = ', '.join(f"{name} {meta['shape']}" for name, meta in manifest['arrays'].items())
+        self.stdout.write(f"✅ Артефакт {manifest['model_type']} v{manifest['version']} збережено: {options['output']}")
+        self.stdout.write(f"   {shapes}")
@@ -0,0 +1,209 @@
+import os
+import time
+import numpy as np
+import scipy.sparse as sp
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from books.features import get_feature_store
+from recommender.feeds import FEED_SIZE
+from user_based import batch
+from user_based.models import UserRecommendation
+from user_based.interactions import get_interaction_store
+from user_based.views import USER_BASED_MODELS, get_cold_item_factors, get_model_maps, load_user_based_model, load_als_model
+
+
+def parse_shard(value):
+    """'i/n' -> (i, n), користувачі шарду: user_id % n == i"""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise CommandError(f'Invalid shard "{value}", expected i/n')
+    if count < 1 or not 0 <= index < count:
+        raise CommandError(f'Invalid shard "{value}", expected 0 <= i < n')
+    return index, count
+
+
+class Command(BaseCommand):
+    help = 'Передобчислює top-N user-based рекомендацій для всіх активних користувачів у таблицю UserRecommendation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=USER_BASED_MODELS, default='svd')
+        parser.add_argument('--top-n', type=int, default=FEED_SIZE)
+        parser.add_argument('--block-size', type=int, default=512)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--shard', default='0/1', help='Частина користувачів i/n для запуску на кількох машинах')
+
+    def prepare_svd(self, model_data, shard):
+        """Фактори та виключення для SVD (індекси моделі, взаємодії - зі сховища)"""
+        recommender = model_data['recommender']
+        matrix, user_to_idx, book_to_idx = get_interaction_store().to_sparse()
+        model_users, model_books, idx_to_book = get_model_maps(model_data)
+
+        n_items = recommender.item_factors.shape[0]
+        item_factors = np.asarray(recommender.item_factors)
+        item_book_ids = np.array([idx_to_book[idx] for idx in range(n_items)], dtype=np.int64)
+
+        # Нові книги без взаємодій - через проєкцію контентних векторів
+        cold_book_ids, cold_factors = get_cold_item_factors(model_data)
+        if len(cold_book_ids):
+            available = get_feature_store().available(cold_book_ids).astype(bool)
+            item_factors = np.vstack([item_factors, cold_factors[available]])
+            item_book_ids = np.concatenate([item_book_ids, cold_book_ids[available]])
+        column_of = {book_id: column for column, book_id in enumerate(item_book_ids.tolist())}
+
+        user_ids = np.array(sorted(
+            user_id for user_id, idx in model_users.items()
+            if user_id in user_to_idx and idx < recommender.user_factors.shape[0] and user_id % shard[1] == shard[0]
+        ), dtype=np.int64)
+        interactions = matrix[[user_to_idx[user_id] for user_id in user_ids]]
+
+        # Стовпці сховища -> стовпці факторів (-1 для книг без факторів)
+        column_map = np.full(matrix.shape[1], -1, dtype=np.int64)
+        for book_id, idx in book_to_idx.items():
+            column_map[idx] = column_of.get(book_id, -1)
+        return {
+            'user_ids': user_ids,
+            'user_rows': np.array([model_users[user_id] for user_id in user_ids], dtype=np.int64),
+            'user_factors': recommender.user_factors,
+            'user_mean': recommender.user_mean,
+            'item_factors': item_factors,
+            'item_book_ids': item_book_ids,
+            'exclude': self.select_columns(interactions, column_map >= 0, column_map, len(item_book_ids)),
+            'activities': np.diff(interactions.indptr),
+            'clip': (1, 5),
+        }
+
+    def prepare_als(self, model_data, shard):
+        """
+        Фактори та виключення для ALS (індекси моделі). Використовуються навчені вектори
+        користувачів; користувачі поза моделлю рахуються on-demand через fold-in
+        """
+        recommender = model_data['recommender']
+        matrix, user_to_idx, book_to_idx = get_interaction_store().to_sparse()
+        model_users = model_data['user_to_idx']
+        model_books = model_data['book_to_idx']
+
+        user_ids = np.array(sorted(
+            user_id for user_id in model_users
+            if user_id in user_to_idx and user_id % shard[1] == shard[0]
+        ), dtype=np.int64)
+        interactions = matrix[[user_to_idx[user_id] for user_id in user_ids]]
+
+        # Стовпці сховища -> стовпці моделі (-1 для книг, яких немає в моделі)
+        column_map = np.full(matrix.shape[1], -1, dtype=np.int64)
+        for book_id, idx in book_to_idx.items():
+            column_map[idx] = model_books.get(book_id, -1)
+        n_items = recommender.item_factors.shape[0]
+
+        return {
+            'user_ids': user_ids,
+            'user_rows': np.array([model_users[user_id] for user_id in user_ids], dtype=np.int64),
+            'user_factors': recommender.user_factors,
+            'user_mean': None,
+            'item_factors': recommender.item_factors,
+            'item_book_ids': np.array([model_data['idx_to_book'][idx] for idx in range(n_items)], dtype=np.int64),
+            'exclude': self.select_columns(interactions, column_map >= 0, column_map, n_items),
+            'activities': np.diff(interactions.indptr),
+            'clip': None,
+        }
+
+    @staticmethod
+    def select_columns(matrix, keep_columns, column_map, n_columns):
+        """Переносить CSR матрицю в інший простір стовпців, відкидаючи відсутні"""
+        coo = matrix.tocoo()
+        keep = keep_columns[coo.col]
+        return sp.csr_matrix(
+            (coo.data[keep], (coo.row[keep], column_map[coo.col[keep]])),
+            shape=(matrix.shape[0], n_columns)
+        )
+
+    def handle(self, *args, **options):
+        model_name = options['model']
+        shard = parse_shard(options['shard'])
+        top_n = options['top_n']
+        block_size = options['block_size']
+        started_at = timezone.now()
+        start = time.perf_counter()
+
+        model_data = load_user_based_model() if model_name == 'svd' else load_als_model()
+        if model_data is None:
+            self.stdout.write(f"❌ Модель {model_name} не знайдена!")
+            return
+
+        data = self.prepare_svd(model_data, shard) if model_name == 'svd' else self.prepare_als(model_data, shard)
+        user_ids, exclude = data['user_ids'], data['exclude']
+        self.stdout.write(
+            f"🚀 Передобчислення {model_name} рекомендацій: шард {shard[0]}/{shard[1]}, "
+            f"{len(user_ids)} користувачів x {len(data['item_book_ids'])} книг"
+        )
+
+        blocks = []
+        for block_start in range(0, len(user_ids), block_size):
+            block = slice(block_start, block_start + block_size)
+            rows = exclude[block]
+            blocks.append((block, data['user_rows'][block], rows.indptr, rows.indices))
+
+        init_args = (data['user_factors'], data['item_factors'], data['user_mean'])
+        if options['workers'] > 1 and len(blocks) > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=options['workers'], initializer=batch.init_worker, initargs=init_args
+            )
+            with executor:
+                futures = [
+                    (block, executor.submit(batch.score_block, user_rows, indptr, indices, top_n))
+                    for block, user_rows, indptr, indices in blocks
+                ]
+                results = ((block, future.result()) for block, future in futures)
+                saved = self.save_results(model_name, data, results)
+        else:
+            batch.init_worker(*init_args)
+            results = (
+                (block, batch.score_block(user_rows, indptr, indices, top_n))
+                for block, user_rows, indptr, indices in blocks
+            )
+            saved = self.save_results(model_name, data, results)
+
+        # Користувачі шарду, яких не було в цьому запуску, отримають рекомендації on-demand
+        stale_user_ids = [
+            user_id for user_id in UserRecommendation.objects.filter(
+                model_name=model_name, computed_at__lt=started_at
+            ).values_list('user_id', flat=True)
+            if user_id % shard[1] == shard[0]
+        ]
+        UserRecommendation.objects.filter(model_name=model_name, user_id__in=stale_user_ids).delete()
+
+        self.stdout.write(
+            f"✅ Збережено рекомендації для {saved} користувачів за {time.perf_counter() - start:.1f}s "
+            f"(видалено застарілих: {len(stale_user_ids)})"
+        )
+
+    def save_results(self, model_name, data, results):
+        saved = 0
+        for block, (top_items, top_scores) in results:
+            objects = []
+            for user_id, activities, items, scores in zip(
+                data['user_ids'][block], data['activities'][block], top_items, top_scores
+            ):
+                finite = np.isfinite(scores)
+                items, scores = items[finite], scores[finite]
+                if data['clip'] is not None:
+                    scores = np.clip(scores, *data['clip'])
+                objects.append(UserRecommendation(
+                    user_id=int(user_id),
+                    model_name=model_name,
+                    recommendations=[
+                        {'book_id': int(book_id), 'predicted_rating': float(score)}
+                        for book_id, score in zip(data['item_book_ids'][items], scores)
+                    ],
+                    user_activities=int(activities),
+                ))
+
+            UserRecommendation.objects.bulk_create(
+                objects,
+                update_conflicts=True,
+                unique_fields=['user', 'model_name'],
+                update_fields=['recommendations', 'user_activities', 'computed_at'],
+            )
+            saved += len(objects)
+        return saved
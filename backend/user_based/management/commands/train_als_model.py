@@ -0,0 +1,68 @@
+import os
+import numpy as np
+import scipy.sparse as sp
+from django.core.management.base import BaseCommand
+from user_based.artifacts import save_model_artifact
+from user_based.extraction import extract_ratings, extract_purchases
+from user_based.models import ALSRecommender
+
+
+class Command(BaseCommand):
+    help = 'Навчає implicit ALS модель на рейтингах та покупках'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--factors', type=int, default=50)
+        parser.add_argument('--iterations', type=int, default=15)
+        parser.add_argument('--regularization', type=float, default=0.1)
+        parser.add_argument('--rating-alpha', type=float, default=8.0)
+        parser.add_argument('--purchase-alpha', type=float, default=15.0)
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--output', default=os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'als_model'))
+
+    def handle(self, *args, **options):
+        self.stdout.write("🚀 Початок навчання ALS моделі...")
+
+        rating_users, rating_books, scores = extract_ratings()
+        purchase_users, purchase_books = extract_purchases()
+
+        if not len(rating_users) and not len(purchase_users):
+            self.stdout.write("❌ Немає рейтингів або покупок для навчання!")
+            return
+
+        # Стискаємо id у щільні індекси векторизовано
+        user_ids, user_codes = np.unique(np.concatenate([rating_users, purchase_users]), return_inverse=True)
+        book_ids, book_codes = np.unique(np.concatenate([rating_books, purchase_books]), return_inverse=True)
+        n_ratings = len(rating_users)
+        shape = (len(user_ids), len(book_ids))
+
+        rating_matrix = sp.csr_matrix(
+            (scores.astype(np.float32), (user_codes[:n_ratings], book_codes[:n_ratings])),
+            shape=shape
+        )
+        purchase_matrix = sp.csr_matrix(
+            (np.ones(len(purchase_users), dtype=np.float32), (user_codes[n_ratings:], book_codes[n_ratings:])),
+            shape=shape
+        )
+        user_to_idx = {user_id: idx for idx, user_id in enumerate(user_ids.tolist())}
+        book_to_idx = {book_id: idx for idx, book_id in enumerate(book_ids.tolist())}
+        self.stdout.write(f"📊 {shape[0]} користувачів x {shape[1]} книг, "
+                          f"{n_ratings} рейтингів, {len(purchase_users)} покупок")
+
+        recommender = ALSRecommender(
+            n_factors=options['factors'],
+            regularization=options['regularization'],
+            rating_alpha=options['rating_alpha'],
+            purchase_alpha=options['purchase_alpha'],
+            iterations=options['iterations'],
+            n_threads=options['threads'],
+        )
+        recommender.fit(rating_matrix, purchase_matrix)
+
+        model_data = {
+            'recommender': recommender,
+            'user_to_idx': user_to_idx,
+            'book_to_idx': book_to_idx,
+            'idx_to_book': {idx: book_id for book_id, idx in book_to_idx.items()},
+        }
+        save_model_artifact(options['output'], model_data)
+        self.stdout.write(f"✅ ALS модель збережено: {options['output']}")
@@ -0,0 +1,56 @@
+import os
+import pickle
+import numpy as np
+from django.core.management.base import BaseCommand
+from recommender.models import BookVector
+from user_based.artifacts import save_model_artifact
+from user_based.models import SVDRecommender
+from user_based.views import create_current_user_item_matrix
+
+
+class Command(BaseCommand):
+    help = 'Навчає SVD модель на поточних рейтингах та покупках і проєкцію контент -> фактори'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--components', type=int, default=50)
+        parser.add_argument('--ridge-alpha', type=float, default=1.0)
+        parser.add_argument('--output', default=os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'svd_model'))
+
+    def handle(self, *args, **options):
+        self.stdout.write("🚀 Початок навчання SVD моделі...")
+
+        matrix, user_to_idx, book_to_idx = create_current_user_item_matrix()
+        if matrix is None or min(matrix.shape) < 2:
+            self.stdout.write("❌ Недостатньо рейтингів або покупок для навчання!")
+            return
+
+        n_components = min(options['components'], matrix.shape[1] - 1)
+        recommender = SVDRecommender(n_components=n_components)
+        recommender.fit(matrix)
+
+        # Cold start: ridge-регресія з BookVector у простір item_factors
+        vectors = {
+            bv.book_id: pickle.loads(bv.vector)
+            for bv in BookVector.objects.filter(book_id__in=list(book_to_idx))
+        }
+        if vectors:
+            book_ids = list(vectors)
+            recommender.fit_content_projection(
+                np.array([vectors[book_id] for book_id in book_ids]),
+                [book_to_idx[book_id] for book_id in book_ids],
+                alpha=options['ridge_alpha']
+            )
+            self.stdout.write(f"✅ Проєкцію контенту навчено на {len(book_ids)} книгах")
+        else:
+            self.stdout.write("⚠️  Немає векторів книг, cold-start проєкцію пропущено")
+
+        model_data = {
+            'recommender': recommender,
+            'user_to_idx': user_to_idx,
+            'book_to_idx': book_to_idx,
+            'idx_to_user': {idx: user_id for user_id, idx in user_to_idx.items()},
+            'idx_to_book': {idx: book_id for book_id, idx in book_to_idx.items()},
+            'user_item_matrix': matrix,
+        }
+        save_model_artifact(options['output'], model_data)
+        self.stdout.write(f"✅ SVD модель збережено: {options['output']}")
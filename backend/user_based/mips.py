@@ -0,0 +1,177 @@
+"""
+Maximum-inner-product search (MIPS) по item_factors.
+
+Вектори книг доповнюються одним виміром sqrt(M^2 - ||q||^2), де M - максимальна норма,
+тому всі вони мають однакову норму і максимальний скалярний добуток з запитом
+(доповненим нулем) збігається з максимальною косинусною подібністю. Доповнені вектори
+кластеризуються k-means; при пошуку перевіряються тільки n_probe кластерів з
+найбільшим добутком центроїда на запит, а точний скор рахується лише для їхніх книг.
+n_probe підбирається під цільовий recall відносно brute force (calibrate).
+Індекс моделі будується і калібрується під час навчання, зберігається в артефакті
+(to_arrays) і відновлюється при завантаженні без k-means (from_arrays).
+"""
+import time
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from recommender.feeds import FEED_SIZE
+
+
+# Індекс моделі будується для каталогів від MIPS_MIN_ITEMS книг
+MIPS_MIN_ITEMS = 5000
+MIPS_TARGET_RECALL = 0.95
+MIPS_CALIBRATION_QUERIES = 200
+# recall калібрується на довжині стрічки, яку SVD/ALS кандидати просять у індексу
+MIPS_CALIBRATION_TOP_N = FEED_SIZE
+
+class MIPSIndex:
+    def __init__(self, item_factors, n_clusters=None, random_state=42):
+        factors = np.asarray(item_factors, dtype=np.float32)
+        n_items = factors.shape[0]
+
+        norms = np.linalg.norm(factors, axis=1)
+        max_norm = norms.max() if n_items and norms.max() > 0 else 1.0
+        extra = np.sqrt(np.maximum(max_norm ** 2 - norms ** 2, 0.0))
+        augmented = np.hstack([factors, extra[:, None]]) / max_norm
+
+        self.n_clusters = min(n_clusters or max(1, int(np.sqrt(n_items))), max(n_items, 1))
+        kmeans = MiniBatchKMeans(n_clusters=self.n_clusters, n_init=1, batch_size=4096, random_state=random_state)
+        labels = kmeans.fit_predict(augmented)
+
+        centroids = kmeans.cluster_centers_
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        # Запит доповнюється нулем, тому останній вимір центроїда не потрібен
+        self.centroids = centroids[:, :-1].astype(np.float32)
+
+        # Книги одного кластера лежать поспіль - кандидати збираються зрізами
+        self.item_order = np.argsort(labels, kind='stable')
+        self.offsets = np.searchsorted(labels[self.item_order], np.arange(self.n_clusters + 1))
+        self.sorted_factors = factors[self.item_order]
+        self.item_factors = factors
+        self.n_items = n_items
+        self.n_probe = self.n_clusters
+        self.calibrated_top_n = None
+
+    @classmethod
+    def from_arrays(cls, item_factors, centroids, item_order, offsets, n_probe, calibrated_top_n=None):
+        """Відновлює індекс зі збережених масивів (to_arrays) без кластеризації"""
+        index = cls.__new__(cls)
+        factors = np.asarray(item_factors, dtype=np.float32)
+        index.centroids = np.asarray(centroids, dtype=np.float32)
+        index.item_order = np.asarray(item_order, dtype=np.int64)
+        index.offsets = np.asarray(offsets, dtype=np.int64)
+        index.sorted_factors = factors[index.item_order]
+        index.item_factors = factors
+        index.n_items = factors.shape[0]
+        index.n_clusters = index.centroids.shape[0]
+        index.n_probe = int(n_probe)
+        index.calibrated_top_n = calibrated_top_n
+        return index
+
+    def to_arrays(self):
+        return {
+            'mips_centroids': self.centroids,
+            'mips_item_order': self.item_order.astype(np.int64),
+            'mips_offsets': self.offsets.astype(np.int64),
+        }
+
+    def search(self, query, top_n, exclude=None, n_probe=None):
+        """Повертає (індекси книг, скори) top_n за скалярним добутком"""
+        query = np.asarray(query, dtype=np.float32)
+        n_probe = min(n_probe or self.n_probe, self.n_clusters)
+
+        centroid_scores = self.centroids @ query
+        if n_probe < self.n_clusters:
+            probe = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+        else:
+            probe = np.arange(self.n_clusters)
+
+        # Кластери - суцільні зрізи, тому скоримо їх без копіювання факторів
+        slices = [slice(self.offsets[c], self.offsets[c + 1]) for c in probe]
+        items = np.concatenate([self.item_order[s] for s in slices])
+        scores = np.concatenate([self.sorted_factors[s] @ query for s in slices])
+        return self._top(items, scores, top_n, exclude)
+
+    def brute_force(self, query, top_n, exclude=None):
+        """Точний пошук по всіх книгах (еталон для recall і бенчмарку)"""
+        scores = self.item_factors @ np.asarray(query, dtype=np.float32)
+        return self._top(np.arange(self.n_items), scores, top_n, exclude)
+
+    def _top(self, items, scores, top_n, exclude):
+        if exclude is not None and len(exclude):
+            keep = ~np.isin(items, exclude)
+            items, scores = items[keep], scores[keep]
+
+        top_n = min(top_n, len(items))
+        if top_n <= 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+
+        top = np.argpartition(-scores, top_n - 1)[:top_n]
+        top = top[np.argsort(-scores[top])]
+        return items[top], scores[top]
+
+    def recall(self, queries, top_n=10, n_probe=None):
+        """Середній recall@top_n відносно brute force"""
+        hits = 0
+        for query in queries:
+            exact, _ = self.brute_force(query, top_n)
+            found, _ = self.search(query, top_n, n_probe=n_probe)
+            hits += len(np.intersect1d(exact, found))
+        return hits / max(len(queries) * min(top_n, self.n_items), 1)
+
+    def calibrate(self, queries, top_n=10, target_recall=0.95):
+        """Підбирає найменший n_probe, що дає target_recall на вибірці запитів"""
+        # recall не спадає зі зростанням n_probe, тому достатньо бінарного пошуку
+        low, high = 1, self.n_clusters
+        while low < high:
+            middle = (low + high) // 2
+            if self.recall(queries, top_n, middle) >= target_recall:
+                high = middle
+            else:
+                low = middle + 1
+        self.n_probe = low
+        self.calibrated_top_n = top_n
+        return low, self.recall(queries, top_n, low)
+
+    def benchmark(self, queries, top_n=10):
+        """Порівнює час і recall пошуку по індексу з brute force"""
+        start = time.perf_counter()
+        for query in queries:
+            self.brute_force(query, top_n)
+        brute_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for query in queries:
+            self.search(query, top_n)
+        index_time = time.perf_counter() - start
+
+        n_queries = max(len(queries), 1)
+        return {
+            'n_items': self.n_items,
+            'n_clusters': self.n_clusters,
+            'n_probe': self.n_probe,
+            'recall': self.recall(queries, top_n),
+            'brute_force_ms': brute_time / n_queries * 1000,
+            'index_ms': index_time / n_queries * 1000,
+            'speedup': brute_time / index_time if index_time else float('inf'),
+        }
+
+
+def calibrate_model_index(index, user_factors, top_n=MIPS_CALIBRATION_TOP_N, target_recall=MIPS_TARGET_RECALL):
+    """Підбирає n_probe індексу моделі на факторах користувачів; повертає (n_probe, recall)"""
+    sample = np.asarray(user_factors[:MIPS_CALIBRATION_QUERIES])
+    n_probe, recall = index.calibrate(sample, top_n=top_n, target_recall=target_recall)
+    print(f"MIPS index calibrated: {index.n_clusters} clusters, n_probe={n_probe}, recall@{top_n}={recall:.3f}")
+    return n_probe, recall
+
+
+def build_model_index(item_factors, user_factors, min_items=MIPS_MIN_ITEMS, top_n=MIPS_CALIBRATION_TOP_N,
+                      target_recall=MIPS_TARGET_RECALL):
+    """
+    Калібрований під top_n MIPS індекс по item_factors моделі (запити калібрування -
+    фактори користувачів). Для малих каталогів - None (brute force)
+    """
+    if item_factors.shape[0] < min_items:
+        return None
+    index = MIPSIndex(item_factors)
+    calibrate_model_index(index, user_factors, top_n, target_recall)
+    return index
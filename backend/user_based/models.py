@@ -1,4 +1,9 @@
+from django.db import models
+from django.contrib.auth import get_user_model
+from books.models import Book
 import numpy as np
+import scipy.sparse as sp
+from concurrent.futures import ThreadPoolExecutor
 from sklearn.decomposition import TruncatedSVD
 
 class SVDRecommender:
@@ -7,6 +12,7 @@ class SVDRecommender:
         self.random_state = random_state
         self.svd = TruncatedSVD(n_components=n_components, random_state=random_state)
         self.user_mean = None
+        self.content_projection = None
         self.is_fitted = False
         
     def fit(self, user_item_matrix):
@@ -39,10 +45,54 @@ class SVDRecommender:
         for i in range(len(self.reconstructed)):
             self.reconstructed[i] += self.user_mean[i]
         
+        self.explained_variance = float(self.svd.explained_variance_ratio_.sum())
         self.is_fitted = True
         print(f"Model trained with {self.n_components} components")
-        print(f"Explained variance ratio: {self.svd.explained_variance_ratio_.sum():.4f}")
+        print(f"Explained variance ratio: {self.explained_variance:.4f}")
         
+    def fit_content_projection(self, content_matrix, item_indices, alpha=1.0):
+        """
+        Fit a ridge regression from content vectors to item factors so that
+        books without ratings get estimated factors (cold start)
+        """
+        if not self.is_fitted:
+            raise ValueError("Model must be fitted before fitting the content projection")
+        
+        X = np.asarray(content_matrix, dtype=np.float64)
+        Q = self.item_factors[np.asarray(item_indices)]
+        
+        self.content_mean = X.mean(axis=0)
+        self.factor_mean = Q.mean(axis=0)
+        X = X - self.content_mean
+        Q = Q - self.factor_mean
+        
+        n_items, n_features = X.shape
+        if n_items < n_features:
+            # Dual form: W = X^T (X X^T + alpha I)^-1 Q
+            self.content_projection = X.T @ np.linalg.solve(X @ X.T + alpha * np.eye(n_items), Q)
+        else:
+            self.content_projection = np.linalg.solve(X.T @ X + alpha * np.eye(n_features), X.T @ Q)
+        
+        print(f"Content projection fitted on {n_items} items ({n_features} -> {self.n_components})")
+    
+    def project_content(self, content_matrix):
+        """
+        Estimate item factors from content vectors
+        """
+        if getattr(self, 'content_projection', None) is None:
+            raise ValueError("Content projection is not fitted")
+        
+        X = np.asarray(content_matrix, dtype=np.float64)
+        return (X - self.content_mean) @ self.content_projection + self.factor_mean
+    
+    def predict_from_content(self, user_idx, content_matrix):
+        """
+        Predict ratings of a user for items given only by content vectors
+        """
+        item_factors = self.project_content(content_matrix)
+        predictions = item_factors @ self.user_factors[user_idx] + self.user_mean[user_idx]
+        return np.clip(predictions, 1, 5)
+    
     def predict(self, user_idx, item_idx):
         """
         Predict rating for a user-item pair
@@ -50,9 +100,23 @@ class SVDRecommender:
         if not self.is_fitted:
             raise ValueError("Model must be fitted before making predictions")
         
+        if getattr(self, 'reconstructed', None) is None:
+            return self.predict_items(user_idx, item_idx)
+        
         prediction = self.reconstructed[user_idx, item_idx]
         return np.clip(prediction, 1, 5)  # Ensure prediction is within valid range
     
+    def predict_items(self, user_idx, item_indices):
+        """
+        Predict ratings of a user for many items straight from the factors
+        (no dense reconstructed matrix needed)
+        """
+        if not self.is_fitted:
+            raise ValueError("Model must be fitted before making predictions")
+        
+        predictions = self.item_factors[item_indices] @ self.user_factors[user_idx] + self.user_mean[user_idx]
+        return np.clip(predictions, 1, 5)
+    
     def recommend_items(self, user_idx, user_item_matrix, n_recommendations=10):
         """
         Recommend items for a user
@@ -75,4 +139,164 @@ class SVDRecommender:
         # Sort by predicted rating
         predictions.sort(key=lambda x: x[1], reverse=True)
         
-        return predictions[:n_recommendations]
\ No newline at end of file
+        return predictions[:n_recommendations]
+
+
+class ALSRecommender:
+    """
+    Implicit-feedback matrix factorization (Hu, Koren, Volinsky) trained with
+    alternating least squares and a conjugate-gradient solver.
+
+    Ratings and purchases are separate signals: each contributes its own
+    confidence weight, while the preference for any interaction is 1.
+    """
+    def __init__(self, n_factors=50, regularization=0.1, rating_alpha=8.0,
+                 purchase_alpha=15.0, iterations=15, cg_steps=3, n_threads=4,
+                 random_state=42):
+        self.n_factors = n_factors
+        self.regularization = regularization
+        self.rating_alpha = rating_alpha
+        self.purchase_alpha = purchase_alpha
+        self.iterations = iterations
+        self.cg_steps = cg_steps
+        self.n_threads = n_threads
+        self.random_state = random_state
+        self.user_factors = None
+        self.item_factors = None
+        self.is_fitted = False
+
+    def build_confidence(self, ratings, purchases):
+        """
+        Combine rating (1-5) and purchase (0/1) matrices into a confidence
+        matrix C - 1, stored sparse (users x items)
+        """
+        ratings = sp.csr_matrix(ratings, dtype=np.float32)
+        purchases = sp.csr_matrix(purchases, dtype=np.float32)
+        purchases.data[:] = 1.0
+
+        confidence = ratings * (self.rating_alpha / 5.0) + purchases * self.purchase_alpha
+        confidence = confidence.tocsr()
+        confidence.eliminate_zeros()
+        return confidence
+
+    def fit(self, ratings, purchases):
+        """
+        Train the ALS model on sparse users x items rating and purchase matrices
+        """
+        print("Training ALS model...")
+
+        confidence = self.build_confidence(ratings, purchases)
+        confidence_t = confidence.T.tocsr()
+        n_users, n_items = confidence.shape
+
+        rng = np.random.default_rng(self.random_state)
+        self.user_factors = (rng.standard_normal((n_users, self.n_factors)) * 0.01).astype(np.float32)
+        self.item_factors = (rng.standard_normal((n_items, self.n_factors)) * 0.01).astype(np.float32)
+
+        with ThreadPoolExecutor(max_workers=self.n_threads) as executor:
+            for iteration in range(self.iterations):
+                self._least_squares(executor, confidence, self.user_factors, self.item_factors)
+                self._least_squares(executor, confidence_t, self.item_factors, self.user_factors)
+                print(f"ALS iteration {iteration + 1}/{self.iterations} done")
+
+        self.is_fitted = True
+        print(f"ALS model trained with {self.n_factors} factors on {n_users} users x {n_items} items")
+
+    def _least_squares(self, executor, confidence, X, Y):
+        """
+        Recompute every row of X with Y fixed; rows are split into chunks
+        and solved in parallel (NumPy releases the GIL inside the BLAS calls)
+        """
+        YtY = Y.T @ Y + self.regularization * np.eye(self.n_factors, dtype=Y.dtype)
+        chunks = np.array_split(np.arange(X.shape[0]), max(self.n_threads * 4, 1))
+
+        def solve_chunk(rows):
+            for u in rows:
+                start, end = confidence.indptr[u], confidence.indptr[u + 1]
+                X[u] = self._conjugate_gradient(
+                    YtY, Y[confidence.indices[start:end]], confidence.data[start:end], X[u]
+                )
+
+        list(executor.map(solve_chunk, chunks))
+
+    def _conjugate_gradient(self, YtY, Yu, c, x):
+        """
+        A few CG steps on (YtY + Yu^T (Cu - I) Yu) x = Yu^T Cu p(u), warm-started
+        from the previous factors; c holds Cu - I for the user's items
+        """
+        x = x.copy()
+        r = -YtY @ x
+        if len(c):
+            r += Yu.T @ ((c + 1) - c * (Yu @ x))
+        p = r.copy()
+        rs_old = r @ r
+
+        for _ in range(self.cg_steps):
+            if rs_old < 1e-10:
+                break
+            Ap = YtY @ p
+            if len(c):
+                Ap += Yu.T @ (c * (Yu @ p))
+            step = rs_old / (p @ Ap)
+            x += step * p
+            r -= step * Ap
+            rs_new = r @ r
+            p = r + (rs_new / rs_old) * p
+            rs_old = rs_new
+
+        return x
+
+    def fold_in_user(self, item_indices, ratings, purchased):
+        """
+        Compute factors for a user from their current interactions without
+        retraining (exact k x k solve)
+        """
+        if not self.is_fitted:
+            raise ValueError("Model must be fitted before making recommendations")
+
+        item_indices = np.asarray(item_indices, dtype=np.int64)
+        c = (np.asarray(ratings, dtype=np.float32) * (self.rating_alpha / 5.0)
+             + np.asarray(purchased, dtype=np.float32) * self.purchase_alpha)
+
+        Y = self.item_factors
+        Yu = Y[item_indices]
+        A = Y.T @ Y + self.regularization * np.eye(self.n_factors, dtype=Y.dtype)
+        A += Yu.T @ (Yu * c[:, None])
+        b = Yu.T @ (c + 1)
+        return np.linalg.solve(A, b)
+
+    def score_items(self, user_vector):
+        """
+        Preference scores for all items
+        """
+        return self.item_factors @ user_vector
+
+
+# Зберігає top-K найближчих сусідів книги для item-based рекомендацій
+class BookSimilarity(models.Model):
+    book = models.ForeignKey(Book, related_name='similar_books', on_delete=models.CASCADE)
+    neighbor = models.ForeignKey(Book, related_name='+', on_delete=models.CASCADE)
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('book', 'neighbor')
+        indexes = [models.Index(fields=['book', '-score'])]
+
+    def __str__(self):
+        return f'{self.book_id} ~ {self.neighbor_id} ({self.score:.3f})'
+
+
+# Зберігає передобчислений top-N рекомендацій користувача для user-based моделі
+class UserRecommendation(models.Model):
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='precomputed_recommendations')
+    model_name = models.CharField(max_length=10, default='svd')
+    # [{'book_id': ..., 'predicted_rating': ...}] за спаданням прогнозу
+    recommendations = models.JSONField(default=list)
+    user_activities = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'model_name')
+
+    def __str__(self):
+        return f'{self.user_id} [{self.model_name}] ({len(self.recommendations)})'
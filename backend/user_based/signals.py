@@ -3,48 +3,73 @@ from django.dispatch import receiver
 from ratings.models import Rating
 from orders.models import Order, OrderItem
 from django.core.cache import cache
+from .views import USER_BASED_MODELS, bump_user_feed_generation, get_user_recommendations_cache_key
+from .interactions import get_interaction_store
+from .models import UserRecommendation
+from recommender.bitsets import get_exclusion_index
+
+
+def clear_user_recommendations_cache(user_id):
+    """Очищає кеш і передобчислені рекомендації користувача для всіх моделей"""
+    for model_name in USER_BASED_MODELS:
+        cache.delete(get_user_recommendations_cache_key(user_id, model_name))
+    UserRecommendation.objects.filter(user_id=user_id).delete()
+    # Нове покоління - закешовані гібридні стрічки користувача більше не читаються
+    bump_user_feed_generation(user_id)
 
 @receiver(post_save, sender=Rating)
 def rating_changed(sender, instance, created, **kwargs):
-    cache_key = f'user_recommendations_{instance.user.id}'
-    cache.delete(cache_key)
+    clear_user_recommendations_cache(instance.user.id)
+    get_interaction_store().upsert_rating(instance.user_id, instance.book_id, instance.score)
+    get_exclusion_index().evict_user(instance.user_id)
 
-    for key in list(cache._cache.keys()):
-        if key.startswith('user_item_matrix_'):
-            cache.delete(key)
     action = "created" if created else "updated"
     print(f"Cache cleared for user {instance.user.id} after rating {action}")
 
 @receiver(post_delete, sender=Rating)
 def rating_deleted(sender, instance, **kwargs):
-    cache_key = f'user_recommendations_{instance.user.id}'
-    cache.delete(cache_key)
+    clear_user_recommendations_cache(instance.user.id)
+    get_interaction_store().delete_rating(instance.user_id, instance.book_id)
+    get_exclusion_index().evict_user(instance.user_id)
 
-    for key in list(cache._cache.keys()):
-        if key.startswith('user_item_matrix_'):
-            cache.delete(key)
     print(f"Cache cleared for user {instance.user.id} after rating deleted")
 
 @receiver(post_save, sender=OrderItem)
 def order_item_saved(sender, instance, created, **kwargs):
 
     if instance.order.is_completed:
-        cache_key = f'user_recommendations_{instance.order.user.id}'
-        cache.delete(cache_key)
-     
-        for key in list(cache._cache.keys()):
-            if key.startswith('user_item_matrix_'):
-                cache.delete(key)
+        clear_user_recommendations_cache(instance.order.user.id)
+        get_interaction_store().add_purchase(instance.order.user_id, instance.book_id)
+        get_exclusion_index().evict_user(instance.order.user_id)
+
         print(f"Cache cleared for user {instance.order.user.id} after purchase")
 
+@receiver(post_delete, sender=OrderItem)
+def order_item_deleted(sender, instance, **kwargs):
+    store = get_interaction_store()
+    try:
+        user_id = Order.objects.values_list('user_id', flat=True).get(id=instance.order_id)
+    except Order.DoesNotExist:
+        # Замовлення видаляється каскадно - перебудуємо сховище при наступному читанні
+        store.invalidate()
+        return
+
+    still_purchased = OrderItem.objects.filter(
+        order__user_id=user_id, order__is_completed=True, book_id=instance.book_id
+    ).exists()
+    if not still_purchased:
+        clear_user_recommendations_cache(user_id)
+        store.delete_purchase(user_id, instance.book_id)
+        get_exclusion_index().evict_user(user_id)
+
 @receiver(post_save, sender=Order)
 def order_completed(sender, instance, created, **kwargs):
  
     if instance.is_completed:
-        cache_key = f'user_recommendations_{instance.user.id}'
-        cache.delete(cache_key)
-      
-        for key in list(cache._cache.keys()):
-            if key.startswith('user_item_matrix_'):
-                cache.delete(key)
+        clear_user_recommendations_cache(instance.user.id)
+        store = get_interaction_store()
+        for book_id in instance.items.values_list('book_id', flat=True):
+            store.add_purchase(instance.user_id, book_id)
+        get_exclusion_index().evict_user(instance.user_id)
+
         print(f"Cache cleared for user {instance.user.id} after order completion")
\ No newline at end of file
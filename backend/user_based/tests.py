@@ -4,8 +4,22 @@ from rest_framework import status
 from django.contrib.auth import get_user_model
 from books.models import Book
 from ratings.models import Rating
+from .models import BookSimilarity, SVDRecommender, UserRecommendation
+from recommender.models import BookVector
+from .artifacts import save_model_artifact, load_model_artifact, ArtifactError
+from .mips import MIPS_CALIBRATION_TOP_N, MIPSIndex, build_model_index
+from .interactions import get_interaction_store
+from .extraction import extract_ratings, extract_purchases
+import json
 from orders.models import Order, OrderItem
 from django.urls import reverse
+from django.core.management import call_command
+from io import StringIO
+from . import views
+import numpy as np
+import pickle
+import os
+import tempfile
 
 User = get_user_model()
 
@@ -37,4 +51,367 @@ class UserBasedTests(APITestCase):
     def test_get_user_based_stats_success(self):
         response = self.client.get(reverse('user-based-stats'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIn('ratings_count', response.data)
\ No newline at end of file
+        self.assertIn('ratings_count', response.data)
+
+class ALSRecommenderTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='als@example.com', password='testpass123', name='ALS User')
+        self.other = User.objects.create_user(email='other@example.com', password='testpass123', name='Other User')
+        self.books = [
+            Book.objects.create(title=f'Book {i}', year=2023, description='Description', is_available=True)
+            for i in range(4)
+        ]
+        Rating.objects.create(book=self.books[0], user=self.user, score=5)
+        Rating.objects.create(book=self.books[0], user=self.other, score=5)
+        Rating.objects.create(book=self.books[1], user=self.other, score=4)
+        order = Order.objects.create(
+            user=self.other, contact_name='Other', contact_email='other@example.com',
+            total_amount=10.00, delivery_address='Address', payment_method='cash', is_completed=True
+        )
+        OrderItem.objects.create(order=order, book=self.books[2], quantity=1, unit_price=10.00)
+        self.client.force_authenticate(user=self.user)
+        get_interaction_store().invalidate()
+        # ALS модель, навчена на даних вище, підміняє закешовану модель
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'als_model')
+            call_command('train_als_model', factors=4, iterations=3, output=output, stdout=StringIO())
+            views._cached_als_model = load_model_artifact(output, mmap=False)
+
+    def tearDown(self):
+        views._cached_als_model = None
+        get_interaction_store().invalidate()
+
+    # Навчання ALS та рекомендації через селектор моделі
+    def test_als_recommendations_success(self):
+        response = self.client.get(reverse('user-based-recommendations'), {'model': 'als'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['type'], 'user_based_als')
+        recommended_ids = [book['id'] for book in response.data['recommendations']]
+        self.assertNotIn(self.books[0].id, recommended_ids)
+        self.assertIn(self.books[1].id, recommended_ids)
+
+    # Передобчислення по шардах і читання рекомендацій з таблиці
+    def test_precompute_user_recommendations(self):
+        for shard in ('0/2', '1/2'):
+            call_command('precompute_user_recommendations', model='als', shard=shard,
+                         workers=1, block_size=1, stdout=StringIO())
+
+        self.assertEqual(UserRecommendation.objects.filter(model_name='als').count(), 2)
+        precomputed = UserRecommendation.objects.get(user=self.user, model_name='als')
+        precomputed_ids = [p['book_id'] for p in precomputed.recommendations]
+        self.assertNotIn(self.books[0].id, precomputed_ids)
+        self.assertEqual(precomputed.user_activities, 1)
+
+        response = self.client.get(reverse('user-based-recommendations'), {'model': 'als'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['type'], 'user_based_als')
+        self.assertEqual([book['id'] for book in response.data['recommendations']], precomputed_ids)
+
+        # Нова взаємодія робить передобчислений список застарілим
+        Rating.objects.create(book=self.books[1], user=self.user, score=4)
+        self.assertFalse(UserRecommendation.objects.filter(user=self.user).exists())
+
+    # Користувач без взаємодій отримує популярні книги замість порожнього списку
+    def test_new_user_popular_fallback(self):
+        newcomer = User.objects.create_user(email='new@example.com', password='testpass123', name='New User')
+        self.client.force_authenticate(user=newcomer)
+        response = self.client.get(reverse('user-based-recommendations'), {'model': 'als'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['type'], response.data['fallback']), ('new_user', 'popular'))
+        self.assertEqual(response.data['recommendations'][0]['id'], self.books[0].id)
+        self.assertIn('bayesian_rating', response.data['recommendations'][0])
+
+    # Наступна сторінка - зріз закешованої стрічки
+    def test_recommendations_pagination(self):
+        url = reverse('user-based-recommendations')
+        first = self.client.get(url, {'model': 'als', 'page_size': 1})
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(first.data['recommendations']), 1)
+        self.assertIsNotNone(first.data['next_cursor'])
+
+        views._cached_als_model = None
+        second = self.client.get(url, {'model': 'als', 'page_size': 1, 'cursor': first.data['next_cursor']})
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertIsNone(second.data['next_cursor'])
+        received_ids = [b['id'] for b in first.data['recommendations'] + second.data['recommendations']]
+        self.assertEqual(sorted(received_ids), [self.books[1].id, self.books[2].id])
+
+    # Невідома модель
+    def test_unknown_model(self):
+        response = self.client.get(reverse('user-based-recommendations'), {'model': 'unknown'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ItemBasedTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='item@example.com', password='testpass123', name='Item User')
+        self.other = User.objects.create_user(email='other@example.com', password='testpass123', name='Other User')
+        self.books = [
+            Book.objects.create(title=f'Book {i}', year=2023, description='Description', is_available=True)
+            for i in range(3)
+        ]
+        Rating.objects.create(book=self.books[0], user=self.other, score=5)
+        Rating.objects.create(book=self.books[1], user=self.other, score=4)
+        Rating.objects.create(book=self.books[0], user=self.user, score=5)
+        self.client.force_authenticate(user=self.user)
+
+    # Обчислення top-K сусідів
+    def test_compute_item_similarities(self):
+        call_command('compute_item_similarities', top_k=5, stdout=StringIO())
+        self.assertTrue(BookSimilarity.objects.filter(book=self.books[0], neighbor=self.books[1]).exists())
+        self.assertFalse(BookSimilarity.objects.filter(book=self.books[0], neighbor=self.books[0]).exists())
+
+    # Рекомендації з сусідів і миттєва реакція на нові взаємодії
+    def test_item_based_recommendations(self):
+        call_command('compute_item_similarities', top_k=5, stdout=StringIO())
+        response = self.client.get(reverse('item-based-recommendations'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([b['id'] for b in response.data['recommendations']], [self.books[1].id])
+
+        Rating.objects.create(book=self.books[1], user=self.user, score=3)
+        response = self.client.get(reverse('item-based-recommendations'))
+        self.assertEqual(response.data['recommendations'], [])
+
+
+class ColdStartProjectionTests(APITestCase):
+    def setUp(self):
+        get_interaction_store().invalidate()
+        rng = np.random.default_rng(0)
+        self.users = [
+            User.objects.create_user(email=f'user{i}@example.com', password='testpass123', name=f'User {i}')
+            for i in range(4)
+        ]
+        self.books = [
+            Book.objects.create(title=f'Book {i}', year=2023, description='Description', is_available=True)
+            for i in range(5)
+        ]
+        for book in self.books:
+            BookVector.objects.create(book=book, vector=pickle.dumps(rng.random(20)))
+        for i, user in enumerate(self.users):
+            for j, book in enumerate(self.books[:4]):
+                if (i + j) % 3:
+                    Rating.objects.create(book=book, user=user, score=(i + j) % 5 + 1)
+        self.new_book = self.books[4]
+        self.client.force_authenticate(user=self.users[0])
+
+    def tearDown(self):
+        views._cached_model = None
+        get_interaction_store().invalidate()
+
+    # Проєкція контенту у простір факторів
+    def test_project_content(self):
+        matrix = np.array([[5, 4, 0], [4, 0, 1], [0, 2, 5]], dtype=float)
+        recommender = SVDRecommender(n_components=2)
+        recommender.fit(matrix)
+        content = np.eye(3)
+        recommender.fit_content_projection(content, [0, 1, 2], alpha=1e-6)
+        np.testing.assert_allclose(recommender.project_content(content), recommender.item_factors, atol=1e-4)
+
+    # Нова книга без рейтингів потрапляє в рекомендації без перенавчання
+    def test_cold_start_book_recommended(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'svd_model')
+            call_command('train_svd_model', components=2, output=output, stdout=StringIO())
+            views._cached_model = load_model_artifact(output, mmap=False)
+
+        self.assertIsNotNone(views._cached_model['recommender'].content_projection)
+        response = self.client.get(reverse('user-based-recommendations'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(self.new_book.id, [b['id'] for b in response.data['recommendations']])
+
+        # Фактори нових книг закешовані в моделі - прогнози без запитів до БД
+        user_idx = views._cached_model['user_to_idx'][self.users[0].id]
+        with self.assertNumQueries(0):
+            predictions = views.get_cold_start_predictions(views._cached_model, user_idx)
+        self.assertEqual(list(predictions), [self.new_book.id])
+
+    # Перенумерація індексів сховища (compact, rebuild) не змінює прогнози моделі
+    def test_store_renumbering_keeps_model_indices(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'svd_model')
+            call_command('train_svd_model', components=2, output=output, stdout=StringIO())
+            views._cached_model = load_model_artifact(output, mmap=False)
+        expected = views.get_collaborative_scores(self.users[0].id)
+
+        store = get_interaction_store()
+        with store._lock:
+            store.user_to_idx = {user_id: idx for idx, user_id in enumerate(reversed(list(store.user_to_idx)))}
+            store.book_to_idx = {book_id: idx for idx, book_id in enumerate(reversed(list(store.book_to_idx)))}
+        self.assertEqual(views.get_collaborative_scores(self.users[0].id), expected)
+
+
+
+class ModelArtifactTests(TestCase):
+    def setUp(self):
+        matrix = np.array([[5, 4, 0, 1], [4, 0, 1, 2], [0, 2, 5, 4]], dtype=float)
+        self.recommender = SVDRecommender(n_components=2)
+        self.recommender.fit(matrix)
+        self.model_data = {
+            'recommender': self.recommender,
+            'user_to_idx': {10: 0, 11: 1, 12: 2},
+            'book_to_idx': {100: 0, 101: 1, 102: 2, 103: 3},
+        }
+
+    # Збереження і mmap-завантаження без pickle
+    def test_roundtrip_mmap(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            save_model_artifact(tmp, self.model_data)
+            loaded = load_model_artifact(tmp)
+            recommender = loaded['recommender']
+
+            self.assertIsInstance(recommender.item_factors, np.memmap)
+            self.assertEqual(loaded['book_to_idx'], self.model_data['book_to_idx'])
+            self.assertEqual(loaded['manifest']['arrays']['item_factors']['shape'], [4, 2])
+            np.testing.assert_allclose(
+                recommender.predict_items(1, np.arange(4)),
+                self.recommender.predict_items(1, np.arange(4))
+            )
+            self.assertAlmostEqual(float(recommender.predict(0, 1)), float(self.recommender.predict(0, 1)))
+            del loaded, recommender
+
+    # MIPS індекс калібрується при збереженні і відновлюється з артефакту без k-means
+    def test_mips_index_saved_with_n_probe(self):
+        index = build_model_index(self.recommender.item_factors, self.recommender.user_factors, min_items=1)
+        with tempfile.TemporaryDirectory() as tmp:
+            save_model_artifact(tmp, dict(self.model_data, mips_index=index))
+            loaded = load_model_artifact(tmp)
+            self.assertEqual(
+                loaded['manifest']['mips'],
+                {'n_clusters': index.n_clusters, 'n_probe': index.n_probe, 'top_n': MIPS_CALIBRATION_TOP_N}
+            )
+            self.assertEqual(loaded['mips_index'].n_probe, index.n_probe)
+            query = self.recommender.user_factors[0]
+            np.testing.assert_array_equal(loaded['mips_index'].search(query, 3)[0], index.search(query, 3)[0])
+
+            # Малий каталог - без індексу (brute force)
+            save_model_artifact(tmp, self.model_data)
+            loaded = load_model_artifact(tmp)
+            self.assertIsNone(loaded['manifest']['mips'])
+            self.assertIsNone(loaded['mips_index'])
+            del loaded
+
+    # Несумісна версія маніфесту
+    def test_version_mismatch(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            save_model_artifact(tmp, self.model_data)
+            manifest_path = os.path.join(tmp, 'manifest.json')
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            manifest['version'] = 99
+            with open(manifest_path, 'w') as f:
+                json.dump(manifest, f)
+            with self.assertRaises(ArtifactError):
+                load_model_artifact(tmp)
+
+
+class MIPSIndexTests(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        centers = rng.standard_normal((20, 8))
+        self.items = (centers[rng.integers(0, 20, 2000)] + 0.2 * rng.standard_normal((2000, 8))).astype(np.float32)
+        self.queries = (centers[rng.integers(0, 20, 50)] + 0.2 * rng.standard_normal((50, 8))).astype(np.float32)
+        self.index = MIPSIndex(self.items)
+
+    # Калібрування під цільовий recall
+    def test_calibrate_reaches_target_recall(self):
+        n_probe, recall = self.index.calibrate(self.queries, top_n=8, target_recall=0.9)
+        self.assertGreaterEqual(recall, 0.9)
+        self.assertLessEqual(n_probe, self.index.n_clusters)
+
+    # Повний перебір кластерів збігається з brute force і враховує виключення
+    def test_search_matches_brute_force(self):
+        query = self.queries[0]
+        exact, _ = self.index.brute_force(query, 8, exclude=[0, 1, 2])
+        found, _ = self.index.search(query, 8, exclude=[0, 1, 2], n_probe=self.index.n_clusters)
+        np.testing.assert_array_equal(found, exact)
+
+
+class InteractionStoreTests(TestCase):
+    def setUp(self):
+        self.store = get_interaction_store()
+        self.store.invalidate()
+        self.user = User.objects.create_user(email='store@example.com', password='testpass123', name='Store User')
+        self.books = [
+            Book.objects.create(title=f'Book {i}', year=2023, description='Description', is_available=True)
+            for i in range(2)
+        ]
+        Rating.objects.create(book=self.books[0], user=self.user, score=5)
+
+    def tearDown(self):
+        self.store.invalidate()
+
+    def get_value(self, book):
+        user_idx, row, book_to_idx = self.store.user_view(self.user.id)
+        if user_idx is None or book.id not in book_to_idx:
+            return 0
+        return row[book_to_idx[book.id]]
+
+    # Дельти з сигналів без повної перебудови
+    def test_signals_apply_deltas(self):
+        self.assertEqual(self.get_value(self.books[0]), 5)
+        version = self.store.version
+
+        rating = Rating.objects.create(book=self.books[1], user=self.user, score=2)
+        self.assertEqual(self.get_value(self.books[1]), 2)
+
+        order = Order.objects.create(
+            user=self.user, contact_name='Store', contact_email='store@example.com',
+            total_amount=10.00, delivery_address='Address', payment_method='cash'
+        )
+        OrderItem.objects.create(order=order, book=self.books[1], quantity=1, unit_price=10.00)
+        order.is_completed = True
+        order.save()
+
+        rating.delete()
+        self.assertEqual(self.get_value(self.books[1]), 4)
+        self.assertGreater(self.store.version, version)
+        self.assertEqual(self.store.fingerprint(), self.store.db_fingerprint())
+
+    # Зміна оцінки з іншого процесу (кількість та сама) виявляється звіркою
+    def test_score_change_detected(self):
+        self.store.ensure_loaded()
+        self.assertEqual(self.store.fingerprint(), self.store.db_fingerprint())
+        Rating.objects.filter(book=self.books[0], user=self.user).update(score=1)
+        self.assertNotEqual(self.store.fingerprint(), self.store.db_fingerprint())
+
+    # Компактизація прибирає порожні індекси
+    def test_compact(self):
+        self.store.ensure_loaded()
+        Rating.objects.filter(book=self.books[0]).delete()
+        self.store.delete_rating(self.user.id, self.books[0].id)
+        self.store.compact()
+        self.assertEqual(self.store.user_to_idx, {})
+        self.assertEqual(self.store.book_to_idx, {})
+
+
+class ExtractionTests(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(email=f'extract{i}@example.com', password='testpass123', name=f'User {i}')
+            for i in range(2)
+        ]
+        self.books = [
+            Book.objects.create(title=f'Book {i}', year=2023, description='Description', is_available=True)
+            for i in range(2)
+        ]
+        Rating.objects.create(book=self.books[0], user=self.users[0], score=5)
+        Rating.objects.create(book=self.books[1], user=self.users[1], score=2)
+        order = Order.objects.create(
+            user=self.users[0], contact_name='User', contact_email='extract0@example.com',
+            total_amount=20.00, delivery_address='Address', payment_method='cash', is_completed=True
+        )
+        for _ in range(2):
+            OrderItem.objects.create(order=order, book=self.books[1], quantity=1, unit_price=10.00)
+
+    # Вивантаження у масиви з потрібними dtypes
+    def test_extract_ratings_and_purchases(self):
+        user_ids, book_ids, scores = extract_ratings()
+        self.assertEqual(scores.dtype, np.int8)
+        self.assertEqual(user_ids.dtype, np.int32)
+        self.assertEqual(
+            sorted(zip(user_ids.tolist(), book_ids.tolist(), scores.tolist())),
+            sorted(Rating.objects.values_list('user_id', 'book_id', 'score'))
+        )
+
+        user_ids, book_ids = extract_purchases()
+        self.assertEqual(list(zip(user_ids.tolist(), book_ids.tolist())), [(self.users[0].id, self.books[1].id)])
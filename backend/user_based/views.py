@@ -6,6 +6,7 @@ from rest_framework import status
 from books.models import Book
 from books.serializers import BookCatalogSerializer
 from ratings.models import Rating
+from ratings.leaderboards import get_leaderboard
 from orders.models import OrderItem
 from django.db.models import Avg
 from django.core.cache import cache
@@ -16,17 +17,38 @@ from django.db.models import Q
 import os
 import sys
 from django.conf import settings
-from .models import SVDRecommender
-import hashlib
+from .models import SVDRecommender, BookSimilarity, UserRecommendation
+from .artifacts import has_model_artifact, load_model_artifact
+from .mips import build_model_index
+from .interactions import get_interaction_store
+from recommender.feeds import (
+    FEED_SIZE, InvalidCursor, build_feed, decode_cursor, parse_page_size, get_feed_page
+)
+from recommender.bitsets import get_exclusion_index
+from recommender.pipeline import (
+    Pipeline, PipelineContext, PipelineAbort, Candidates, CandidateGenerator, ExclusionFilter, TopN
+)
+from recommender.content_index import get_content_index
+from books.features import get_feature_store
 import json
 import threading
+import time
 
-import __main__
-__main__.SVDRecommender = SVDRecommender
+# Доступні моделі для user-based рекомендацій
+USER_BASED_MODELS = ('svd', 'als')
 
 # Глобальні змінні для thread-safe кешування моделі
 _model_lock = threading.Lock()
 _cached_model = None
+_als_model_lock = threading.Lock()
+_cached_als_model = None
+_cold_lock = threading.Lock()
+
+def load_legacy_pickle_model(model_path):
+    """Завантажує старий pickle з ноутбука (клас збережено як __main__.SVDRecommender)"""
+    import __main__
+    __main__.SVDRecommender = SVDRecommender
+    return joblib.load(model_path)
 
 def load_user_based_model():
     """Завантажує навчену user-based модель з файлу з thread-safe кешуванням"""
@@ -34,211 +56,532 @@ def load_user_based_model():
     if _cached_model is None:
         with _model_lock:
             if _cached_model is None:  # Double-check locking
+                model_dir = os.path.join(os.path.dirname(__file__), 'svd_model')
                 model_path = os.path.join(os.path.dirname(__file__), 'svd_recommender_clean.pkl')
                 try:
-                    print(f"Loading model from: {model_path}")
-                    _cached_model = joblib.load(model_path)
+                    if has_model_artifact(model_dir):
+                        print(f"Loading model artifact from: {model_dir}")
+                        _cached_model = load_model_artifact(model_dir)
+                    else:
+                        print(f"Loading model from: {model_path}")
+                        _cached_model = load_legacy_pickle_model(model_path)
+                        recommender = _cached_model['recommender']
+                        _cached_model['mips_index'] = build_model_index(recommender.item_factors, recommender.user_factors)
                     print("User-based model loaded and cached in memory!")
                 except Exception as e:
                     print(f"Error loading user-based model: {e}")
                     return None
     return _cached_model
 
-def get_matrix_cache_key():
-    """Генерує ключ кешу для user-item матриці на основі поточних даних"""
-    ratings_count = Rating.objects.count()
-    orders_count = OrderItem.objects.filter(order__is_completed=True).count()
+def load_als_model():
+    """Завантажує навчену ALS модель (implicit feedback) з thread-safe кешуванням"""
+    global _cached_als_model
+    if _cached_als_model is None:
+        with _als_model_lock:
+            if _cached_als_model is None:
+                model_dir = os.path.join(os.path.dirname(__file__), 'als_model')
+                try:
+                    print(f"Loading ALS model artifact from: {model_dir}")
+                    _cached_als_model = load_model_artifact(model_dir)
+                    print("ALS model loaded and cached in memory!")
+                except Exception as e:
+                    print(f"Error loading ALS model: {e}")
+                    return None
+    return _cached_als_model
+
+def get_mips_index(model_data):
+    """
+    MIPS індекс моделі, побудований і відкалібрований при навчанні або завантаженні.
+    None - brute force (малий каталог або модель без індексу)
+    """
+    return model_data.get('mips_index')
+
+def search_top_items(model_data, user_vector, top_n, exclude=None):
+    """Top-N книг за скалярним добутком з вектором користувача (індекс або brute force)"""
+    index = get_mips_index(model_data)
+    if index is not None:
+        return index.search(user_vector, top_n, exclude=exclude)
     
-    data_hash = hashlib.md5(f"{ratings_count}_{orders_count}".encode()).hexdigest()
-    return f'user_item_matrix_{data_hash}'
+    scores = model_data['recommender'].item_factors @ user_vector
+    items = np.arange(len(scores))
+    if exclude is not None and len(exclude):
+        exclude = np.asarray(exclude)
+        keep = np.ones(len(scores), dtype=bool)
+        keep[exclude[exclude < len(scores)]] = False
+        items, scores = items[keep], scores[keep]
+    
+    top_n = min(top_n, len(items))
+    if top_n <= 0:
+        return np.array([], dtype=np.int64), np.array([])
+    top = np.argpartition(-scores, top_n - 1)[:top_n]
+    top = top[np.argsort(-scores[top])]
+    return items[top], scores[top]
+
+def get_user_recommendations_cache_key(user_id, model_name='svd'):
+    """Ключ кешу рекомендацій користувача для вибраної моделі"""
+    if model_name == 'svd':
+        return f'user_recommendations_{user_id}'
+    return f'user_recommendations_{model_name}_{user_id}'
+
+def get_user_feed_generation(user_id):
+    """
+    Покоління стрічок користувача для ключів кешу (гібридні рекомендації); стартує з
+    поточного часу, щоб після витіснення з кешу не повернутись до старих ключів
+    """
+    key = f'user_feed_generation_{user_id}'
+    cache.add(key, time.time_ns() // 1000, timeout=None)
+    return cache.get(key, 0)
+
+def bump_user_feed_generation(user_id):
+    key = f'user_feed_generation_{user_id}'
+    cache.add(key, time.time_ns() // 1000, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Ключ витіснено між add та incr
+        cache.set(key, time.time_ns() // 1000, timeout=None)
 
 def create_current_user_item_matrix():
-    """Створює поточну user-item матрицю з кешуванням та оптимізованими запитами"""
-    cache_key = get_matrix_cache_key()
-    cached_data = cache.get(cache_key)
+    """Поточна user-item матриця зі сховища взаємодій (для навчання моделей)"""
+    return get_interaction_store().to_matrix()
+
+def build_user_based_response(request, top_predictions, user_activities, recommendation_type,
+                              score_field='predicted_rating'):
+    """Завантажує та серіалізує рекомендовані книги у порядку прогнозу"""
+    recommended_book_ids = [p['book_id'] for p in top_predictions]
     
-    if cached_data:
-        print("Using cached user-item matrix")
-        return cached_data['matrix'], cached_data['user_to_idx'], cached_data['book_to_idx']
+    # Книги з анотаціями каталогу - без запитів на кожну книгу при серіалізації
+    books = Book.objects.for_catalog().filter(id__in=recommended_book_ids, is_available=True)
+    books_dict = {book.id: book for book in books}
     
-    print("Creating new user-item matrix for user-based...")
+    ordered_books = []
+    for pred in top_predictions:
+        if pred['book_id'] in books_dict:
+            book = books_dict[pred['book_id']]
+            book.predicted_rating = round(pred['predicted_rating'], 2)
+            ordered_books.append(book)
     
-    all_ratings_data = []
+    if not ordered_books:
+        return None
+    
+    serializer = BookCatalogSerializer(ordered_books, many=True, context={'request': request})
+    
+    results = serializer.data
+    for i, book_data in enumerate(results):
+        if i < len(ordered_books):
+            book_data[score_field] = ordered_books[i].predicted_rating
+    
+    return {
+        'recommendations': results,
+        'type': recommendation_type,
+        'total_recommendations': len(results),
+        'user_activities': user_activities,
+        'message': f'Персональні рекомендації на основі {user_activities} ваших активностей'
+    }
+
+def build_popular_fallback(request, payload, page_size):
+    """Користувачу без взаємодій - книги із загального байєсівського рейтингу популярності"""
+    top = get_leaderboard(limit=page_size)
+    response_data = build_user_based_response(
+        request, [{'book_id': book_id, 'predicted_rating': score} for book_id, score in top],
+        0, payload['type'], score_field='bayesian_rating'
+    )
+    if response_data is None:
+        return payload
+    response_data['message'] = payload['message']
+    response_data['fallback'] = 'popular'
+    return response_data
+
+def get_recommendation_type(model_name):
+    return 'user_based_collaborative' if model_name == 'svd' else f'user_based_{model_name}'
+
+def get_precomputed_feed(user, model_name):
+    """Стрічка з таблиці UserRecommendation (precompute_user_recommendations) або None"""
+    precomputed = UserRecommendation.objects.filter(user=user, model_name=model_name).first()
+    if precomputed is None or not precomputed.recommendations:
+        return None
     
-    # Оптимізований запит для рейтингів з values() для швидшості
-    ratings_data = Rating.objects.select_related('user', 'book').values(
-        'user_id', 'book_id', 'score'
+    return build_feed(
+        [p['book_id'] for p in precomputed.recommendations],
+        [p['predicted_rating'] for p in precomputed.recommendations],
+        type=get_recommendation_type(model_name),
+        user_activities=precomputed.user_activities
     )
+
+def get_model_maps(model_data):
+    """
+    (user_to_idx, book_to_idx, idx_to_book) моделі. Індекси факторів - це індекси
+    матриці на момент навчання; сховище взаємодій нумерує інакше (compact, rebuild)
+    """
+    if 'idx_to_book' not in model_data:
+        model_data['idx_to_book'] = {idx: book_id for book_id, idx in model_data['book_to_idx'].items()}
+    return model_data['user_to_idx'], model_data['book_to_idx'], model_data['idx_to_book']
+
+def get_cold_item_factors(model_data):
+    """
+    (id книг, фактори) для книг з контентним вектором, яких немає в моделі, - проєкція
+    векторів ContentIndex. Рахується раз на версію індексу і зберігається в model_data
+    """
+    recommender = model_data['recommender']
+    if getattr(recommender, 'content_projection', None) is None:
+        return np.empty(0, dtype=np.int64), None
     
-    for rating in ratings_data:
-        all_ratings_data.append({
-            'user_id': rating['user_id'],
-            'book_id': rating['book_id'],
-            'rating': rating['score'],
-            'is_implicit': False
-        })
+    index = get_content_index()
+    index.ensure_loaded()
+    cached = model_data.get('cold_item_factors')
+    if cached is None or cached[0] != index.version:
+        with _cold_lock:
+            index_version, book_ids, vectors = index.raw_vectors()
+            cold = ~np.isin(book_ids, np.fromiter(model_data['book_to_idx'], dtype=np.int64))
+            factors = recommender.project_content(vectors[cold]) if cold.any() else None
+            cached = (index_version, book_ids[cold], factors)
+            model_data['cold_item_factors'] = cached
+    return cached[1], cached[2]
+
+def get_cold_start_predictions(model_data, user_idx):
+    """Прогнози для доступних книг без взаємодій через проєкцію контентних векторів у фактори SVD"""
+    recommender = model_data['recommender']
+    if user_idx is None or user_idx >= recommender.user_factors.shape[0]:
+        return {}
     
-    # Створюємо set для швидкого пошуку існуючих пар рейтингів
-    rated_user_book_pairs = {(r['user_id'], r['book_id']) for r in all_ratings_data}
+    book_ids, factors = get_cold_item_factors(model_data)
+    if not len(book_ids):
+        return {}
     
-    # Оптимізований запит для покупок з values() та distinct()
-    purchases_data = OrderItem.objects.filter(
-        order__is_completed=True
-    ).select_related('order__user', 'book').values(
-        'order__user_id', 'book_id'
-    ).distinct()
+    available = get_feature_store().available(book_ids).astype(bool)
+    predictions = np.clip(
+        factors[available] @ recommender.user_factors[user_idx] + recommender.user_mean[user_idx], 1, 5
+    )
+    return dict(zip(book_ids[available].tolist(), predictions.tolist()))
+
+def get_collaborative_scores(user_id):
+    """SVD прогнози для всіх неоцінених книг користувача: {book_id: predicted_rating}"""
+    model_data = load_user_based_model()
+    if model_data is None:
+        return {}
     
-    purchased_user_book_pairs = set()
-    for purchase in purchases_data:
-        user_book_pair = (purchase['order__user_id'], purchase['book_id'])
-        
-        if user_book_pair not in rated_user_book_pairs and user_book_pair not in purchased_user_book_pairs:
-            purchased_user_book_pairs.add(user_book_pair)
-            all_ratings_data.append({
-                'user_id': purchase['order__user_id'],
-                'book_id': purchase['book_id'],
-                'rating': 4,
-                'is_implicit': True
-            })
+    interactions = get_interaction_store().user_interactions(user_id)
+    if not interactions:
+        return {}
     
-    if not all_ratings_data:
-        return None, {}, {}
+    recommender = model_data['recommender']
+    user_to_idx, book_to_idx, idx_to_book = get_model_maps(model_data)
+    user_idx = user_to_idx.get(user_id)
+    if user_idx is None or user_idx >= recommender.user_factors.shape[0]:
+        return {}
     
-    # Використовуємо set comprehension для унікальних значень
-    unique_users = list(set(d['user_id'] for d in all_ratings_data))
-    unique_books = list(set(d['book_id'] for d in all_ratings_data))
+    n_items = recommender.item_factors.shape[0]
+    known = np.zeros(n_items, dtype=bool)
+    known[[idx for book_id in interactions if (idx := book_to_idx.get(book_id)) is not None and idx < n_items]] = True
+    unrated_book_indices = np.where(~known)[0]
+    predictions = recommender.predict_items(user_idx, unrated_book_indices)
     
-    user_to_idx = {user: idx for idx, user in enumerate(unique_users)}
-    book_to_idx = {book: idx for idx, book in enumerate(unique_books)}
+    scores = get_cold_start_predictions(model_data, user_idx)
+    scores.update(
+        (idx_to_book[book_idx], float(prediction))
+        for book_idx, prediction in zip(unrated_book_indices.tolist(), predictions)
+    )
+    return scores
+
+def get_als_predictions(user, model_data, n_recommendations=FEED_SIZE):
+    """Рахує ALS рекомендації: fold-in вектора користувача з його поточних рейтингів і покупок"""
+    recommender = model_data['recommender']
+    book_to_idx = model_data['book_to_idx']
+    idx_to_book = model_data['idx_to_book']
     
-    matrix = np.zeros((len(unique_users), len(unique_books)))
+    interactions = {}
+    for book_id, score in Rating.objects.filter(user=user).values_list('book_id', 'score'):
+        interactions[book_id] = [score, 0]
+    purchased_ids = OrderItem.objects.filter(
+        order__user=user, order__is_completed=True
+    ).values_list('book_id', flat=True).distinct()
+    for book_id in purchased_ids:
+        interactions.setdefault(book_id, [0, 0])[1] = 1
     
-    # Векторизоване заповнення матриці
-    for data in all_ratings_data:
-        user_idx = user_to_idx[data['user_id']]
-        book_idx = book_to_idx[data['book_id']]
-        matrix[user_idx, book_idx] = data['rating']
+    known = [(book_to_idx[book_id], values) for book_id, values in interactions.items() if book_id in book_to_idx]
+    if not known:
+        return None, len(interactions)
     
-    cache_data = {
-        'matrix': matrix,
-        'user_to_idx': user_to_idx,
-        'book_to_idx': book_to_idx
-    }
-    cache.set(cache_key, cache_data, timeout=3600)
+    item_indices = np.array([idx for idx, _ in known])
+    ratings = np.array([values[0] for _, values in known])
+    purchased = np.array([values[1] for _, values in known])
     
-    print(f"User-based matrix created and cached: {len(unique_users)} users x {len(unique_books)} books")
+    user_vector = recommender.fold_in_user(item_indices, ratings, purchased)
+    top_indices, scores = search_top_items(model_data, user_vector, n_recommendations, exclude=item_indices)
     
-    return matrix, user_to_idx, book_to_idx
+    predictions = [
+        {'book_id': idx_to_book[idx], 'predicted_rating': float(score)}
+        for idx, score in zip(top_indices, scores)
+    ]
+    return predictions, len(interactions)
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def get_user_based_recommendations(request):
-    """Генерує user-based collaborative filtering рекомендації з кешуванням"""
-    try:
-        user_cache_key = f'user_recommendations_{request.user.id}'
-        cached_recommendations = cache.get(user_cache_key)
-        
-        if cached_recommendations:
-            print(f"Using cached recommendations for user {request.user.id}")
-            return Response(cached_recommendations)
+class SVDCandidates(CandidateGenerator):
+    """Top кандидати SVD через MIPS по item_factors з поточних взаємодій користувача"""
+    name = 'svd_mips'
+
+    def __init__(self, model_data):
+        self.model_data = model_data
+
+    def generate(self, context):
+        recommender = self.model_data['recommender']
+        store = get_interaction_store()
         
-        model_data = load_user_based_model()
-        if model_data is None:
-            return Response({
-                'error': 'User-based model not found',
+        if store.is_empty():
+            raise PipelineAbort({
                 'recommendations': [],
-                'type': 'error'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                'type': 'no_data',
+                'message': 'No data available for user-based recommendations'
+            })
         
-        recommender = model_data['recommender']
+        interactions = store.user_interactions(context.params['user_id'])
         
-        current_matrix, user_to_idx, book_to_idx = create_current_user_item_matrix()
+        if not interactions:
+            raise PipelineAbort({
+                'recommendations': [],
+                'type': 'new_user',
+                'message': 'Поставте рейтинги або зробіть покупки для отримання персональних рекомендацій'
+            })
         
-        if current_matrix is None:
-            return Response({
+        # Індекси моделі, а не сховища: сховище перенумеровує користувачів і книги
+        user_to_idx, book_to_idx, idx_to_book = get_model_maps(self.model_data)
+        interacted = [book_to_idx[book_id] for book_id in interactions if book_id in book_to_idx]
+        
+        if len(interacted) >= len(book_to_idx):
+            raise PipelineAbort({
                 'recommendations': [],
-                'type': 'no_data',
-                'message': 'No data available for user-based recommendations'
+                'type': 'no_new_books',
+                'message': 'Ви оцінили всі доступні книги! Додайте нові книги для рекомендацій'
             })
         
-        if request.user.id not in user_to_idx:
-            return Response({
+        user_idx = user_to_idx.get(context.params['user_id'])
+        context.state['user_idx'] = user_idx
+        context.meta['user_activities'] = len(interactions)
+        
+        if user_idx is None or user_idx >= recommender.user_factors.shape[0]:
+            return Candidates()
+        
+        # Ранжування = MIPS по item_factors (середнє користувача не змінює порядок)
+        top_indices, _ = search_top_items(
+            self.model_data, recommender.user_factors[user_idx], FEED_SIZE,
+            exclude=np.array(interacted, dtype=np.int64)
+        )
+        return Candidates(
+            [idx_to_book[book_idx] for book_idx in top_indices.tolist()],
+            recommender.predict_items(user_idx, top_indices)
+        )
+
+
+class ColdStartCandidates(CandidateGenerator):
+    """Нові книги без взаємодій через проєкцію контентних векторів у фактори SVD"""
+    name = 'svd_cold_start'
+
+    def __init__(self, model_data):
+        self.model_data = model_data
+
+    def generate(self, context):
+        predictions = get_cold_start_predictions(self.model_data, context.state['user_idx'])
+        return Candidates(list(predictions), list(predictions.values()))
+
+
+class ALSCandidates(CandidateGenerator):
+    """Top кандидати implicit ALS: fold-in вектора користувача + MIPS"""
+    name = 'als_fold_in'
+
+    def __init__(self, model_data):
+        self.model_data = model_data
+
+    def generate(self, context):
+        top_predictions, user_activities = get_als_predictions(context.params['user'], self.model_data)
+        
+        if top_predictions is None:
+            raise PipelineAbort({
                 'recommendations': [],
                 'type': 'new_user',
                 'message': 'Поставте рейтинги або зробіть покупки для отримання персональних рекомендацій'
             })
         
-        user_idx = user_to_idx[request.user.id]
-        user_ratings = current_matrix[user_idx]
-        unrated_book_indices = np.where(user_ratings == 0)[0]
-        
-        if len(unrated_book_indices) == 0:
-            return Response({
+        if not top_predictions:
+            raise PipelineAbort({
                 'recommendations': [],
                 'type': 'no_new_books',
                 'message': 'Ви оцінили всі доступні книги! Додайте нові книги для рекомендацій'
             })
         
-        predictions = []
-        idx_to_book = {idx: book_id for book_id, idx in book_to_idx.items()}
+        context.meta['user_activities'] = user_activities
+        return Candidates(
+            [p['book_id'] for p in top_predictions],
+            [p['predicted_rating'] for p in top_predictions]
+        )
+
+
+def build_user_based_pipeline(model_name):
+    """Пайплайн для вибраної моделі або None, якщо модель не завантажена"""
+    if model_name == 'als':
+        model_data = load_als_model()
+        generators = [ALSCandidates(model_data)]
+    else:
+        model_data = load_user_based_model()
+        generators = [SVDCandidates(model_data), ColdStartCandidates(model_data)]
+    
+    if model_data is None:
+        return None
+    return Pipeline(f'user_based_{model_name}', generators + [ExclusionFilter(), TopN(FEED_SIZE)])
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_user_based_recommendations(request):
+    """Генерує user-based collaborative filtering рекомендації з кешуванням"""
+    try:
+        model_name = request.query_params.get('model', 'svd')
+        if model_name not in USER_BASED_MODELS:
+            return Response({
+                'error': f'Unknown model "{model_name}". Available: {", ".join(USER_BASED_MODELS)}',
+                'recommendations': [],
+                'type': 'error'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            offset = decode_cursor(request.query_params.get('cursor'))
+            page_size = parse_page_size(request.query_params.get('page_size'))
+        except InvalidCursor as e:
+            return Response({
+                'error': str(e),
+                'recommendations': [],
+                'type': 'error'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # У кеші - компактна стрічка top FEED_SIZE, сторінки - її зрізи
+        user_cache_key = get_user_recommendations_cache_key(request.user.id, model_name)
+        feed = cache.get(user_cache_key)
         
-        for book_idx in unrated_book_indices:
-            try:
-                predicted_rating = recommender.predict(user_idx, book_idx)
-                book_id = idx_to_book[book_idx]
+        if feed is not None:
+            print(f"Using cached recommendations for user {request.user.id}")
+        else:
+            # Спочатку передобчислені рекомендації, on-demand - тільки для користувачів поза таблицею
+            feed = get_precomputed_feed(request.user, model_name)
+            if feed is not None:
+                print(f"Using precomputed recommendations for user {request.user.id}")
+            else:
+                pipeline = build_user_based_pipeline(model_name)
+                if pipeline is None:
+                    return Response({
+                        'error': 'ALS model not found' if model_name == 'als' else 'User-based model not found',
+                        'recommendations': [],
+                        'type': 'error'
+                    }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
                 
-                predictions.append({
-                    'book_id': book_id,
-                    'predicted_rating': predicted_rating
+                context = PipelineContext(user=request.user, user_id=request.user.id)
+                context.meta['type'] = get_recommendation_type(model_name)
+                try:
+                    feed = pipeline.run(context)
+                except PipelineAbort as e:
+                    if e.payload.get('type') in ('new_user', 'no_data'):
+                        return Response(build_popular_fallback(request, e.payload, page_size))
+                    return Response(e.payload, status=e.status_code)
+            
+            cache.set(user_cache_key, feed, timeout=3600)
+        
+        page_ids, page_scores, next_cursor = get_feed_page(feed, offset, page_size)
+        top_predictions = [
+            {'book_id': book_id, 'predicted_rating': score}
+            for book_id, score in zip(page_ids, page_scores)
+        ]
+        
+        response_data = build_user_based_response(
+            request, top_predictions, feed['user_activities'], feed['type']
+        )
+        
+        if response_data is None:
+            if offset == 0:
+                return Response({
+                    'recommendations': [],
+                    'type': 'no_available_books',
+                    'message': 'Рекомендовані книги тимчасово недоступні'
                 })
-            except Exception as e:
-                print(f"Error predicting for book {book_idx}: {e}")
-                continue
+            response_data = {'recommendations': [], 'type': feed['type']}
+        
+        response_data['next_cursor'] = next_cursor
         
-        predictions.sort(key=lambda x: x['predicted_rating'], reverse=True)
+        return Response(response_data)
+        
+    except Exception as e:
+        print(f"Error in user-based recommendations: {str(e)}")
+        return Response({
+            'error': str(e),
+            'recommendations': [],
+            'type': 'error'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def get_user_interaction_weights(user):
+    """Ваги взаємодій користувача: рейтинг / 5, покупка без рейтингу = 0.8"""
+    weights = {
+        book_id: score / 5.0
+        for book_id, score in Rating.objects.filter(user=user).values_list('book_id', 'score')
+    }
+    purchased_ids = OrderItem.objects.filter(
+        order__user=user, order__is_completed=True
+    ).values_list('book_id', flat=True).distinct()
+    for book_id in purchased_ids:
+        weights.setdefault(book_id, 0.8)
+    return weights
 
-        top_predictions = predictions[:8]
-        recommended_book_ids = [p['book_id'] for p in top_predictions]
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_item_based_recommendations(request):
+    """Item-based рекомендації: сума попередньо обчислених списків сусідів книг користувача"""
+    try:
+        weights = get_user_interaction_weights(request.user)
+        
+        if not weights:
+            return Response({
+                'recommendations': [],
+                'type': 'new_user',
+                'message': 'Поставте рейтинги або зробіть покупки для отримання персональних рекомендацій'
+            })
         
-        # Оптимізований запит книг з filter та select_related
-        books = Book.objects.filter(id__in=recommended_book_ids, is_available=True)
-        books_dict = {book.id: book for book in books}
+        neighbors = np.array(list(BookSimilarity.objects.filter(
+            book_id__in=list(weights)
+        ).values_list('book_id', 'neighbor_id', 'score')), dtype=np.float64).reshape(-1, 3)
         
-        ordered_books = []
-        for pred in top_predictions:
-            if pred['book_id'] in books_dict:
-                book = books_dict[pred['book_id']]
-                book.predicted_rating = round(pred['predicted_rating'], 2)
-                ordered_books.append(book)
+        # Сума сусідів з вагами взаємодій, потім одна маска доступності/взаємодій
+        neighbor_ids, inverse = np.unique(neighbors[:, 1].astype(np.int64), return_inverse=True)
+        book_weights = np.array([weights[int(book_id)] for book_id in neighbors[:, 0]])
+        scores = np.bincount(inverse, weights=book_weights * neighbors[:, 2], minlength=len(neighbor_ids))
+        keep = get_exclusion_index().mask(neighbor_ids, exclude=list(weights))
+        neighbor_ids, scores = neighbor_ids[keep], scores[keep]
         
-        if not ordered_books:
+        if not len(neighbor_ids):
             return Response({
                 'recommendations': [],
-                'type': 'no_available_books',
-                'message': 'Рекомендовані книги тимчасово недоступні'
+                'type': 'no_neighbors',
+                'message': 'Недостатньо даних для рекомендацій схожих книг'
             })
         
-        serializer = BookCatalogSerializer(ordered_books, many=True, context={'request': request})
+        # Беремо з запасом, бо частина книг може бути недоступна
+        order = np.argsort(-scores, kind='stable')[:16]
+        top_predictions = [
+            {'book_id': int(neighbor_ids[i]), 'predicted_rating': float(scores[i])}
+            for i in order
+        ]
         
-        results = serializer.data
-        for i, book_data in enumerate(results):
-            if i < len(ordered_books):
-                book_data['predicted_rating'] = ordered_books[i].predicted_rating
+        response_data = build_user_based_response(
+            request, top_predictions, len(weights), 'item_based_collaborative', score_field='similarity_score'
+        )
         
-        response_data = {
-            'recommendations': results,
-            'type': 'user_based_collaborative',
-            'total_recommendations': len(results),
-            'user_activities': len(np.where(user_ratings > 0)[0]),
-            'message': f'Персональні рекомендації на основі {len(np.where(user_ratings > 0)[0])} ваших активностей'
-        }
+        if response_data is None:
+            return Response({
+                'recommendations': [],
+                'type': 'no_available_books',
+                'message': 'Рекомендовані книги тимчасово недоступні'
+            })
         
-        cache.set(user_cache_key, response_data, timeout=3600)
+        response_data['recommendations'] = response_data['recommendations'][:8]
+        response_data['total_recommendations'] = len(response_data['recommendations'])
         
         return Response(response_data)
         
     except Exception as e:
-        print(f"Error in user-based recommendations: {str(e)}")
+        print(f"Error in item-based recommendations: {str(e)}")
         return Response({
             'error': str(e),
             'recommendations': [],
@@ -288,9 +631,9 @@ def get_user_based_stats(request):
 def refresh_user_based_recommendations(request):
     """Очищає кеш та оновлює рекомендації"""
     try:
-        user_cache_key = f'user_recommendations_{request.user.id}'
-        cache.delete(user_cache_key)
-        cache.delete('user_item_matrix_data')
+        for model_name in USER_BASED_MODELS:
+            cache.delete(get_user_recommendations_cache_key(request.user.id, model_name))
+        UserRecommendation.objects.filter(user=request.user).delete()
         
         return Response({
             'message': 'Recommendations cache cleared successfully',
@@ -306,6 +649,27 @@ def refresh_user_based_recommendations(request):
 def get_user_based_model_info(request):
     """Інформація про user-based модель"""
     try:
+        if request.query_params.get('model') == 'als':
+            model_data = load_als_model()
+            if model_data is None:
+                return Response({
+                    'error': 'ALS model not available'
+                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            
+            recommender = model_data['recommender']
+            
+            return Response({
+                'model_type': 'Implicit ALS Collaborative Filtering',
+                'n_factors': recommender.n_factors,
+                'is_fitted': recommender.is_fitted,
+                'algorithm': 'Alternating Least Squares (conjugate gradient)',
+                'rating_alpha': recommender.rating_alpha,
+                'purchase_alpha': recommender.purchase_alpha,
+                'regularization': recommender.regularization,
+                'users': len(model_data['user_to_idx']),
+                'books': len(model_data['book_to_idx'])
+            })
+        
         model_data = load_user_based_model()
         if model_data is None:
             return Response({
@@ -314,12 +678,17 @@ def get_user_based_model_info(request):
         
         recommender = model_data['recommender']
         
+        explained_variance = getattr(recommender, 'explained_variance', None)
+        if explained_variance is None and hasattr(recommender.svd, 'explained_variance_ratio_'):
+            explained_variance = recommender.svd.explained_variance_ratio_.sum()
+        
         return Response({
             'model_type': 'SVD User-Based Collaborative Filtering',
             'n_components': recommender.n_components,
             'is_fitted': recommender.is_fitted,
-            'explained_variance': round(recommender.svd.explained_variance_ratio_.sum(), 4) if hasattr(recommender.svd, 'explained_variance_ratio_') else 'Unknown',
+            'explained_variance': round(explained_variance, 4) if explained_variance is not None else 'Unknown',
             'algorithm': 'Truncated SVD',
+            'cold_start_projection': getattr(recommender, 'content_projection', None) is not None,
             'implicit_rating_value': 4,
             'rating_scale': '1-5'
         })